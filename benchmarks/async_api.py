@@ -0,0 +1,117 @@
+"""
+Requests/sec and latency of the JSON API: sync views under WSGI versus
+async views under ASGI.
+
+    python -m benchmarks.async_api --requests 2000 --concurrency 1 8 32
+
+The WSGI path runs one thread per concurrent client, as a threaded WSGI
+server would. The ASGI path runs every client as a task on one event loop,
+as a single ASGI worker would. Each client toggles its own availability and
+accepts requests from a shared pending pool.
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import enable_test_clients, seed_profiles, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='API calls per run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    enable_test_clients()
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from django.test import AsyncClient, Client
+    from django.test.utils import override_settings
+    from bloodshare.models import DonationRequest
+
+    max_clients = max(args.concurrency)
+    seed_profiles(max_clients + 1)
+    users = list(User.objects.order_by('id'))
+    requester, donors = users[0], users[1:]
+
+    def plan(run):
+        """Paths for one run: three toggles for every accept"""
+        pending = DonationRequest.objects.bulk_create([
+            DonationRequest(requester=requester, name=f'Run {run} #{i}', blood_group_needed='O+', city='Delhi')
+            for i in range(args.requests // 4 + 1)
+        ])
+        paths = []
+        for i in range(args.requests):
+            if i % 4 == 3:
+                paths.append(f'/api/requests/{pending[i // 4].id}/accept/')
+            else:
+                paths.append('/api/profile/toggle-availability/')
+        return paths
+
+    def report(label, concurrency, samples, statuses, elapsed):
+        result = summarize(samples)
+        result.update({
+            'server': label,
+            'concurrency': concurrency,
+            'requests_per_sec': round(len(samples) / elapsed, 1),
+            'errors': sum(1 for status in statuses if status >= 500),
+        })
+        print(f"{label:>4} c={concurrency:<3} {result['requests_per_sec']:9.1f} req/s"
+              f"  p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms  errors {result['errors']}")
+        return result
+
+    def run_wsgi(concurrency, paths):
+        clients = []
+        for donor in donors[:concurrency]:
+            client = Client(raise_request_exception=False)
+            client.force_login(donor)
+            clients.append(client)
+        samples, statuses = [], []
+
+        def worker(index):
+            for path in paths[index::concurrency]:
+                start = time.perf_counter()
+                statuses.append(clients[index].post(path).status_code)
+                samples.append(time.perf_counter() - start)
+            connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        return report('wsgi', concurrency, samples, statuses, time.perf_counter() - start)
+
+    def run_asgi(concurrency, paths):
+        clients = []
+        for donor in donors[:concurrency]:
+            client = AsyncClient(raise_request_exception=False)
+            client.force_login(donor)
+            clients.append(client)
+        samples, statuses = [], []
+
+        async def worker(index):
+            for path in paths[index::concurrency]:
+                start = time.perf_counter()
+                statuses.append((await clients[index].post(path)).status_code)
+                samples.append(time.perf_counter() - start)
+
+        async def run_all():
+            await asyncio.gather(*(worker(index) for index in range(concurrency)))
+
+        start = time.perf_counter()
+        with override_settings(ROOT_URLCONF='bloodshare_project.asgi_urls'):
+            asyncio.run(run_all())
+        return report('asgi', concurrency, samples, statuses, time.perf_counter() - start)
+
+    results = []
+    for run, concurrency in enumerate(args.concurrency):
+        results.append(run_wsgi(concurrency, plan(f'w{run}')))
+        results.append(run_asgi(concurrency, plan(f'a{run}')))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Avatar upload latency and avatar bytes served per dashboard view.
+
+    python -m benchmarks.avatars --iterations 20 --width 4000 --height 3000
+
+A camera-sized JPEG is uploaded through the profile form, first with
+thumbnails made before the response returns (AVATAR_PROCESSING_INLINE)
+and then with the background worker pool. Background mode also reports
+how long the thumbnails take to become ready. Finally the dashboard is
+rendered and the avatar bytes a browser would fetch are compared with
+the size of the original upload.
+"""
+import argparse
+import io
+import json
+import tempfile
+import time
+
+from .common import enable_test_clients, setup_django, summarize
+
+
+def camera_photo(width, height):
+    """A detailed JPEG with EXIF that compresses like a photo rather than a flat test card"""
+    from PIL import Image
+
+    red = Image.linear_gradient('L').resize((width, height))
+    green = Image.effect_mandelbrot((width, height), (-2.0, -1.2, 1.0, 1.2), 120)
+    blue = Image.effect_noise((width, height), 48)
+    exif = Image.Exif()
+    exif[0x010F] = 'BenchCamera'
+    buffer = io.BytesIO()
+    Image.merge('RGB', (red, green, blue)).save(buffer, 'JPEG', quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+def wait_until_processed(profile_id, timeout=60):
+    from bloodshare.models import Profile
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if Profile.objects.filter(id=profile_id).exclude(avatar_status='pending').exists():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    enable_test_clients()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.files.storage import default_storage
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client
+    from bloodshare.avatars import pick_variant
+    from bloodshare.models import Profile
+
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='bloodshare-bench-media-')
+
+    user = User.objects.create_user(username='avatars@example.com', email='avatars@example.com', first_name='Bench')
+    profile = Profile.objects.create(user=user, blood_group='O+', city='Mumbai')
+    client = Client()
+    client.force_login(user)
+    photo = camera_photo(args.width, args.height)
+
+    def upload():
+        response = client.post('/profile/edit/', {
+            'blood_group': 'O+', 'city': 'Mumbai', 'avatar': SimpleUploadedFile('photo.jpg', photo, 'image/jpeg'),
+        })
+        assert response.status_code == 302, response.status_code
+
+    results = {'upload_bytes': len(photo)}
+    for mode, inline in (('inline', True), ('background', False)):
+        settings.AVATAR_PROCESSING_INLINE = inline
+        latencies, ready = [], []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            upload()
+            latencies.append(time.perf_counter() - start)
+            if not wait_until_processed(profile.id):
+                raise SystemExit('Avatar was not processed within 60s')
+            ready.append(time.perf_counter() - start)
+        results[mode] = {'upload': summarize(latencies), 'until_ready': summarize(ready)}
+        print(f"{mode:>10}  upload p50 {results[mode]['upload']['p50_ms']:9.3f} ms"
+              f"  p99 {results[mode]['upload']['p99_ms']:9.3f} ms"
+              f"  thumbnails ready p50 {results[mode]['until_ready']['p50_ms']:9.3f} ms")
+
+    profile.refresh_from_db()
+    html = client.get('/dashboard/').content.decode()
+    # A WebP-capable browser on a 1x screen fetches the 80px WebP thumbnail
+    variant = pick_variant(profile.avatar_variants, 80)['webp']
+    assert default_storage.url(variant) in html
+    served = default_storage.size(variant)
+    results['dashboard_avatar_bytes'] = {
+        'original_upload': len(photo),
+        'sanitized_source': default_storage.size(profile.avatar.name),
+        'served_variant': served,
+    }
+    print(f"dashboard avatar: {served:,} bytes served vs {len(photo):,} uploaded"
+          f" ({len(photo) / served:,.0f}x less)")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Shared helpers for the BloodShare benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database so they never touch
+db.sqlite3. Run them from the project root, e.g.:
+
+    python -m benchmarks.donor_search --sizes 10000 100000
+"""
+import os
+import tempfile
+import time
+
+
+def setup_django(db_path=None):
+    """Point Django at a benchmark SQLite database and migrate it"""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='bloodshare-bench-'), 'bench.sqlite3')
+    os.environ['BLOODSHARE_DB_PATH'] = str(db_path)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodshare_project.settings')
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def enable_test_clients():
+    """Allow django.test.Client/AsyncClient to drive the app in-process"""
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    settings.DEBUG = False
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples):
+    """Summarize latency samples (seconds) as milliseconds"""
+    return {
+        'count': len(samples),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def timed(fn, iterations):
+    """Call ``fn`` repeatedly and return the latency of each call in seconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def seed_profiles(count, start=0, requests=0, password='!'):
+    """
+    Grow the synthetic dataset to ``count`` users, each with a profile.
+
+    ``password`` is stored as-is, so pass an already hashed value.
+    """
+    from bloodshare.synthetic import generate
+
+    generate(count, requests, start=start, password_hash=password)
@@ -0,0 +1,66 @@
+"""
+Donor search latency as the Profile table grows.
+
+    python -m benchmarks.donor_search --sizes 10000 100000 1000000
+
+For each size the table is grown in place, ANALYZE is run, and random
+searches (first page and a few pages deep) are timed. A healthy index keeps
+p99 roughly flat across sizes.
+"""
+import argparse
+import json
+import random
+
+from .common import setup_django, seed_profiles, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--depth', type=int, default=5, help='Pages to follow for the deep-page measurement')
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection
+    from bloodshare.search import search_donors
+    from bloodshare.synthetic import BLOOD_GROUP_WEIGHTS, CITIES
+
+    rng = random.Random(42)
+    groups = list(BLOOD_GROUP_WEIGHTS)
+
+    def first_page():
+        search_donors(blood_group=rng.choice(groups), city=rng.choice(CITIES))
+
+    def deep_page():
+        cursor = None
+        query = {'blood_group': rng.choice(groups), 'city': rng.choice(CITIES)}
+        for _ in range(args.depth):
+            _, cursor = search_donors(cursor=cursor, **query)
+            if cursor is None:
+                break
+
+    results = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed_profiles(size, start=seeded)
+        seeded = size
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        timed(first_page, 20)  # warm the page cache
+        result = {
+            'profiles': size,
+            'first_page': summarize(timed(first_page, args.iterations)),
+            'deep_page': summarize(timed(deep_page, max(args.iterations // args.depth, 1))),
+        }
+        results.append(result)
+        print(f"{size:>10,} profiles  first page p99 {result['first_page']['p99_ms']:8.3f} ms"
+              f"  {args.depth} pages p99 {result['deep_page']['p99_ms']:8.3f} ms")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
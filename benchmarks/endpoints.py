@@ -0,0 +1,259 @@
+"""
+Per-endpoint throughput and latency of the whole application, driven
+in-process through the real WSGI and ASGI request handlers.
+
+    python -m benchmarks.endpoints --users 10000 --iterations 200 --output before.json
+    python -m benchmarks.endpoints --users 10000 --iterations 200 --compare before.json
+    BLOODSHARE_DB_PROFILE=production python -m benchmarks.endpoints --concurrency 1 8 32
+
+Each endpoint is called by ``--concurrency`` clients at once, each with
+its own session. Like benchmarks.async_api, the WSGI path runs one
+thread per client, as a threaded WSGI server would, and the ASGI path
+runs every client as a task on one event loop, as a single ASGI worker
+would. Latency includes middleware, sessions and template rendering, but
+not network or server overhead. With one client, throughput is just the
+inverse of latency; more clients show how each server copes with load.
+Concurrent writes need the production database profile; under the
+development one they fail with "database is locked" and count as errors
+(benchmarks.sqlite_concurrency compares the two). Results are written as
+JSON tagged with the git commit, so runs can be compared across commits.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sqlite3
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .common import enable_test_clients, seed_profiles, setup_django, summarize
+
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVERS = ('wsgi', 'asgi')
+PASSWORD = 'BenchPass123!'
+
+
+def git_revision():
+    """Current commit, with a ``-dirty`` suffix if tracked files are modified"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+
+def scenarios(pending, users):
+    """
+    ``(name, method, path, data, expected_status, needs_login)`` per endpoint.
+
+    ``path`` and ``data`` are callables taking the iteration number so
+    state-changing endpoints never act on the same row twice.
+    """
+    from bloodshare.synthetic import synthetic_email
+
+    return [
+        ('landing', 'get', lambda i: '/', None, 200, False),
+        ('login_page', 'get', lambda i: '/login/', None, 200, False),
+        ('login', 'post', lambda i: '/login/',
+         lambda i: {'email': synthetic_email(i % users), 'password': PASSWORD}, 302, False),
+        ('dashboard', 'get', lambda i: '/dashboard/', None, 200, True),
+        ('dashboard_create_request', 'post', lambda i: '/dashboard/',
+         lambda i: {'name': f'Bench patient {i}', 'blood_group_needed': 'O+', 'city': 'Mumbai', 'details': ''},
+         302, True),
+        ('accept_request', 'post', lambda i: f'/api/requests/{pending[2 * i]}/accept/', None, 200, True),
+        ('reject_request', 'post', lambda i: f'/api/requests/{pending[2 * i + 1]}/reject/', None, 200, True),
+        ('toggle_availability', 'post', lambda i: '/api/profile/toggle-availability/', None, 200, True),
+        ('donor_search', 'get', lambda i: '/api/donors/search/',
+         lambda i: {'blood_group': ('O+', 'A+', 'B+', 'AB-')[i % 4], 'city': ('Mumbai', 'Delhi', 'Pune')[i % 3]},
+         200, True),
+        ('request_feed', 'get', lambda i: '/api/requests/feed/', None, 200, True),
+    ]
+
+
+def report(server, concurrency, name, samples, statuses, expected, elapsed):
+    result = summarize(samples)
+    result.update({
+        'server': server,
+        'concurrency': concurrency,
+        'endpoint': name,
+        'requests_per_sec': round(len(samples) / elapsed, 1),
+        'errors': sum(1 for status in statuses if status != expected),
+    })
+    print(f"{server:>4} c={concurrency:<3} {name:<26} {result['requests_per_sec']:9.1f} req/s"
+          f"  p50 {result['p50_ms']:8.3f} ms  p95 {result['p95_ms']:8.3f} ms"
+          f"  p99 {result['p99_ms']:8.3f} ms  errors {result['errors']}")
+    return result
+
+
+def compare(results, baseline_path):
+    """Print the change in p50/p99 and throughput against an earlier run"""
+    baseline = json.loads(Path(baseline_path).read_text())
+    # Runs from before --concurrency existed used a single client
+    before = {(row['server'], row.get('concurrency', 1), row['endpoint']): row for row in baseline['results']}
+    print(f"\nCompared with {baseline['meta'].get('commit') or baseline_path}:")
+    for row in results:
+        old = before.get((row['server'], row['concurrency'], row['endpoint']))
+        if old is None:
+            continue
+
+        def change(key):
+            return (row[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+
+        print(f"{row['server']:>4} c={row['concurrency']:<3} {row['endpoint']:<26}"
+              f" req/s {change('requests_per_sec'):+7.1f}%"
+              f"  p50 {change('p50_ms'):+7.1f}%  p99 {change('p99_ms'):+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000, help='synthetic users to seed')
+    parser.add_argument('--requests', type=int, help='synthetic donation requests to seed (default: users // 5)')
+    parser.add_argument('--iterations', type=int, default=200, help='timed calls per endpoint')
+    parser.add_argument('--logins', type=int, default=20, help='timed login POSTs; each one hashes a password')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed calls per endpoint')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1], help='concurrent clients per run')
+    parser.add_argument('--server', choices=SERVERS + ('both',), default='both')
+    parser.add_argument('--only', nargs='+', metavar='ENDPOINT', help='run only these endpoints')
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+    if args.requests is None:
+        args.requests = args.users // 5
+    if min(args.concurrency) <= 0:
+        parser.error('--concurrency must be positive')
+
+    setup_django(args.db)
+    enable_test_clients()
+    import django
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.db import connection, connections
+    from django.test import AsyncClient, Client
+    from django.test.utils import override_settings
+    from bloodshare.models import DonationRequest
+
+    seed_profiles(args.users, requests=args.requests, password=make_password(PASSWORD))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    requester, actor = User.objects.order_by('id')[:2]
+
+    def run_wsgi(concurrency, method, path, data, needs_login, iterations):
+        clients = []
+        for _ in range(concurrency):
+            client = Client(raise_request_exception=False)
+            if needs_login:
+                client.force_login(actor)
+            clients.append(client)
+
+        def call(index, i):
+            # Login must start from an anonymous session every time
+            active = clients[index] if needs_login else Client(raise_request_exception=False)
+            payload = data(i) if data else None
+            return getattr(active, method)(path(i), payload).status_code
+
+        for i in range(args.warmup):
+            call(i % concurrency, i)
+        samples, statuses = [], []
+
+        def worker(index):
+            for i in range(args.warmup + index, args.warmup + iterations, concurrency):
+                began = time.perf_counter()
+                statuses.append(call(index, i))
+                samples.append(time.perf_counter() - began)
+            connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        return samples, statuses, time.perf_counter() - start
+
+    def run_asgi(concurrency, method, path, data, needs_login, iterations):
+        clients = []
+        for _ in range(concurrency):
+            client = AsyncClient(raise_request_exception=False)
+            if needs_login:
+                client.force_login(actor)
+            clients.append(client)
+
+        async def call(index, i):
+            active = clients[index] if needs_login else AsyncClient(raise_request_exception=False)
+            payload = data(i) if data else None
+            return (await getattr(active, method)(path(i), payload)).status_code
+
+        async def run_all():
+            for i in range(args.warmup):
+                await call(i % concurrency, i)
+            samples, statuses = [], []
+
+            async def worker(index):
+                for i in range(args.warmup + index, args.warmup + iterations, concurrency):
+                    began = time.perf_counter()
+                    statuses.append(await call(index, i))
+                    samples.append(time.perf_counter() - began)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(index) for index in range(concurrency)))
+            return samples, statuses, time.perf_counter() - start
+
+        with override_settings(ROOT_URLCONF='bloodshare_project.asgi_urls'):
+            return asyncio.run(run_all())
+
+    servers = SERVERS if args.server == 'both' else (args.server,)
+    runners = {'wsgi': run_wsgi, 'asgi': run_asgi}
+    results = []
+    for server in servers:
+        for concurrency in args.concurrency:
+            # Fresh pending requests for accept/reject, two per call
+            calls = args.warmup + args.iterations
+            pending = [row.id for row in DonationRequest.objects.bulk_create([
+                DonationRequest(requester=requester, name=f'{server} c{concurrency} #{i}',
+                                blood_group_needed='O+', city='Mumbai')
+                for i in range(2 * calls)
+            ])]
+
+            for name, method, path, data, expected, needs_login in scenarios(pending, args.users):
+                if args.only and name not in args.only:
+                    continue
+                iterations = args.logins if name == 'login' else args.iterations
+                samples, statuses, elapsed = runners[server](
+                    concurrency, method, path, data, needs_login, iterations,
+                )
+                results.append(report(server, concurrency, name, samples, statuses, expected, elapsed))
+
+    output = {
+        'meta': {
+            'commit': git_revision(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'profile': settings.DB_PROFILE,
+            'users': args.users,
+            'requests': args.requests,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+        },
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(output, indent=2) + '\n')
+        print(f'\nWrote {args.output}')
+    else:
+        print(json.dumps(output, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Expiry throughput and how long it keeps other writers waiting.
+
+    python -m benchmarks.expiry --requests 200000 --chunk-sizes 100 500 2000 1000000
+
+Seeds synthetic requests spread over the last year, all pending, then
+expires those older than 30 days once per chunk size. A chunk size
+larger than the backlog is the single big UPDATE the chunking avoids.
+While each run goes, a writer thread keeps toggling a donor's
+availability; its p99 and worst latency show how long the expiry held
+SQLite's write lock. Like the expire_requests command, the run sleeps
+--pause seconds between chunks, which counts towards its rows/sec.
+Expired rows are put back to pending between runs. Set
+BLOODSHARE_DB_PROFILE=production to run with WAL.
+"""
+import argparse
+import json
+import threading
+import time
+
+from .common import seed_profiles, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200_000)
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[100, 500, 2000, 1_000_000])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--pause', type=float, default=0.01, help='Seconds between chunks, as in expire_requests')
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection, connections
+    from bloodshare.expiry import expire_stale_requests, expiry_cutoff
+    from bloodshare.models import DonationRequest, Profile
+
+    seed_profiles(1000, requests=args.requests)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE bloodshare_donationrequest SET status = 'pending', "
+            "created_at = datetime('now', '-' || (id % 365) || ' days')"
+        )
+        cursor.execute('ANALYZE')
+    profile_id = Profile.objects.order_by('id').values_list('id', flat=True).first()
+
+    def run(chunk_size):
+        done = threading.Event()
+        latencies = []
+
+        def write():
+            while not done.is_set():
+                start = time.perf_counter()
+                Profile.objects.filter(id=profile_id).update(is_available=True)
+                latencies.append(time.perf_counter() - start)
+                time.sleep(0.005)
+            connections.close_all()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        start = time.perf_counter()
+        chunks = []
+        for expired in expire_stale_requests(expiry_cutoff(args.days), chunk_size):
+            chunks.append(expired)
+            time.sleep(args.pause)
+        elapsed = time.perf_counter() - start
+        done.set()
+        writer.join()
+
+        result = {
+            'chunk_size': chunk_size,
+            'expired': sum(chunks),
+            'chunks': len(chunks),
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(sum(chunks) / elapsed) if elapsed else 0,
+            'writer': summarize(latencies),
+            'writer_max_ms': round(max(latencies, default=0) * 1000, 3),
+        }
+        print(f"chunk {chunk_size:>9,}  {result['expired']:,} rows in {result['seconds']:.3f}s"
+              f" ({result['rows_per_sec']:,}/s)  writer p99 {result['writer']['p99_ms']:8.3f} ms"
+              f"  max {result['writer_max_ms']:8.3f} ms")
+        DonationRequest.objects.filter(status='expired').update(status='pending')
+        return result
+
+    results = [run(chunk_size) for chunk_size in args.chunk_sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Export throughput and peak memory, streamed versus loaded all at once.
+
+    python -m benchmarks.exports --rows 10000 100000 1000000 --formats csv jsonl
+
+Seeds one database with the largest row count of users and requests,
+then exports the first N requests (or donors, with --model donors) once
+per row count and format. Each export runs in a fresh process so its
+peak RSS is its own. "stream" is the admin action's
+StreamingHttpResponse, consumed to /dev/null. "naive" loads the rows
+with one query and builds the whole file in memory first, which is what
+the streaming export avoids. The report gives rows/sec, peak RSS and how
+much the export added on top of the peak after Django start-up.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import seed_profiles, setup_django
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_export(args):
+    setup_django(args.db)
+    from bloodshare import exports
+    from bloodshare.models import DonationRequest, Profile
+
+    model = {'requests': DonationRequest, 'donors': Profile}[args.model]
+    queryset = model.objects.filter(pk__lte=args.rows)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as out:
+        if args.naive:
+            # Every row in one query, and the whole file in one string
+            out.write(''.join(exports.stream(queryset, args.format, chunk_size=args.rows)))
+        else:
+            for part in exports.streaming_response(queryset, args.format).streaming_content:
+                out.write(part.decode())
+    elapsed = time.perf_counter() - start
+    return {
+        'model': args.model,
+        'rows': args.rows,
+        'format': args.format,
+        'mode': 'naive' if args.naive else 'stream',
+        'rows_per_sec': round(args.rows / elapsed) if elapsed else 0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'added_rss_mb': round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'])
+    parser.add_argument('--model', choices=['requests', 'donors'], default='requests')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--naive', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--format', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    if args.child:
+        # Child process: run one export and hand the result back as JSON
+        args.rows = args.rows[0]
+        print(json.dumps(run_export(args)))
+        return
+
+    db = args.db or os.path.join(tempfile.mkdtemp(prefix='bloodshare-bench-'), 'bench.sqlite3')
+    setup_django(db)
+    largest = max(args.rows)
+    seed_profiles(largest, requests=largest)
+
+    results = []
+    for rows in sorted(args.rows):
+        for fmt in args.formats:
+            for naive in (False, True):
+                command = [sys.executable, '-m', 'benchmarks.exports', '--child', '--db', db,
+                           '--model', args.model, '--rows', str(rows), '--format', fmt]
+                if naive:
+                    command.append('--naive')
+                output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{rows:>9,} {fmt:<5} {result['mode']:<6}  {result['rows_per_sec']:>9,} rows/s"
+                      f"  peak RSS {result['peak_rss_mb']:8.1f} MB  (+{result['added_rss_mb']:.1f} MB)")
+                results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
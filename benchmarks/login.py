@@ -0,0 +1,73 @@
+"""
+Login throughput and the cost of the email lookup.
+
+    python -m benchmarks.login --users 100000
+
+Reports the email lookup on its own (indexed ``LOWER(email)`` versus the
+old ``LIKE`` scan), then full ``authenticate()`` calls for a correct
+password, a wrong password and an unknown email. The last two should take
+about as long as each other, so timing does not reveal whether an account
+exists.
+"""
+import argparse
+import json
+import random
+
+from .common import setup_django, seed_profiles, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--logins', type=int, default=20, help='authenticate() calls per case; each one hashes a password')
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.contrib.auth import authenticate
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from bloodshare.backends import users_with_email
+    from bloodshare.synthetic import synthetic_email
+
+    password = 'BenchPass123!'
+    seed_profiles(args.users, password=make_password(password))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    rng = random.Random(7)
+
+    def known_email():
+        return synthetic_email(rng.randrange(args.users)).upper()
+
+    def unknown_email():
+        return f'nobody{rng.randrange(args.users)}@example.com'
+
+    lookups = {
+        'indexed_lookup': lambda: users_with_email(known_email()).first(),
+        'iexact_scan': lambda: User.objects.filter(email__iexact=known_email()).first(),
+    }
+    logins = {
+        'valid_login': lambda: authenticate(email=known_email(), password=password),
+        'wrong_password': lambda: authenticate(email=known_email(), password='wrong'),
+        'unknown_email': lambda: authenticate(email=unknown_email(), password=password),
+    }
+
+    results = {'users': args.users}
+    for name, fn in lookups.items():
+        iterations = args.lookups if name == 'indexed_lookup' else max(args.lookups // 100, 5)
+        results[name] = summarize(timed(fn, iterations))
+    for name, fn in logins.items():
+        samples = timed(fn, args.logins)
+        results[name] = summarize(samples)
+        results[name]['logins_per_sec'] = round(len(samples) / sum(samples), 2)
+
+    for name in list(lookups) + list(logins):
+        print(f"{name:>16}  p50 {results[name]['p50_ms']:10.3f} ms  p99 {results[name]['p99_ms']:10.3f} ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+k-nearest donor search latency as the Profile table grows.
+
+    python -m benchmarks.nearest_donors --sizes 10000 100000 1000000 --k 10
+
+For each size the table is grown in place, ANALYZE is run, and k-NN and
+fixed-radius searches around random points near the synthetic cities are
+timed. The geohash index keeps every query to a handful of cell ranges, so
+p99 should stay roughly flat across sizes.
+"""
+import argparse
+import json
+import random
+
+from .common import setup_django, seed_profiles, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10, help='Donors to return per query')
+    parser.add_argument('--radius', type=float, default=5, help='Radius in km for the radius measurement')
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection
+    from bloodshare.search import nearby_donors
+    from bloodshare.synthetic import BLOOD_GROUP_WEIGHTS, CITY_COORDINATES, synthetic_location
+
+    rng = random.Random(42)
+    groups = list(BLOOD_GROUP_WEIGHTS)
+    cities = list(CITY_COORDINATES)
+
+    def random_point():
+        location = {}
+        while not location:
+            location = synthetic_location(rng, rng.choice(cities))
+        return location['latitude'], location['longitude']
+
+    def knn():
+        nearby_donors(*random_point(), blood_group=rng.choice(groups), limit=args.k)
+
+    def radius():
+        nearby_donors(*random_point(), blood_group=rng.choice(groups), radius_km=args.radius, limit=args.k)
+
+    results = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed_profiles(size, start=seeded)
+        seeded = size
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        timed(knn, 20)  # warm the page cache
+        result = {
+            'profiles': size,
+            'k': args.k,
+            'knn': summarize(timed(knn, args.iterations)),
+            'radius': summarize(timed(radius, args.iterations)),
+        }
+        results.append(result)
+        print(f"{size:>10,} profiles  {args.k}-NN p99 {result['knn']['p99_ms']:8.3f} ms"
+              f"  {args.radius:g} km radius p99 {result['radius']['p99_ms']:8.3f} ms")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
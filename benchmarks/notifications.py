@@ -0,0 +1,69 @@
+"""
+Donor notification fan-out throughput.
+
+    python -m benchmarks.notifications --users 200000 --requests 5
+
+Seeds synthetic users, creates requests in the largest synthetic city for
+O- blood (only O- donors qualify) and AB+ blood (every available donor in
+the city qualifies), then drains the outbox with the locmem email
+backend. It reports the cost of creating a request in the web process,
+which only writes the outbox row, and the worker's recipients per second
+for each request.
+"""
+import argparse
+import json
+import time
+
+from .common import seed_profiles, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--requests', type=int, default=5, help='Requests per blood group')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core import mail
+    from django.db import connection, transaction
+    from bloodshare.models import DonationRequest, DonorNotification
+    from bloodshare.notifications import drain_outbox
+    from bloodshare.synthetic import CITIES
+
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    mail.outbox = []
+    seed_profiles(args.users)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    requester = User.objects.create_user(username='requester@example.com')
+
+    def create(blood_group):
+        with transaction.atomic():
+            DonationRequest.objects.create(requester=requester, name='Bench', blood_group_needed=blood_group, city=CITIES[0])
+
+    results = {'users': args.users, 'city': CITIES[0]}
+    for blood_group in ('O-', 'AB+'):
+        create_latency = timed(lambda: create(blood_group), args.requests)
+        fan_outs = []
+        for _ in range(args.requests):
+            # Every request goes to the same donors, so lift the rate cap between them
+            DonorNotification.objects.all().delete()
+            mail.outbox = []
+            start = time.perf_counter()
+            entries, emails = drain_outbox(limit=1, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - start
+            fan_outs.append({'emails': emails, 'seconds': round(elapsed, 3), 'emails_per_sec': round(emails / elapsed)})
+        results[blood_group] = {'create_request': summarize(create_latency), 'fan_out': fan_outs}
+        best = max(fan_outs, key=lambda run: run['emails_per_sec'])
+        print(f"{blood_group:>4}  create p50 {results[blood_group]['create_request']['p50_ms']:8.3f} ms"
+              f"  fan-out {best['emails']:,} emails in {best['seconds']:.3f} s ({best['emails_per_sec']:,}/s)")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
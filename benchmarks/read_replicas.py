@@ -0,0 +1,130 @@
+"""
+Read throughput with 0, 1 and 2 SQLite read replicas.
+
+    python -m benchmarks.read_replicas --requests 3000 --threads 16 --replicas 0 1 2
+
+Each replica count runs in its own process, since replicas are read from
+settings (BLOODSHARE_REPLICA_PATHS). After seeding, the primary is copied
+into the replicas with sync_replicas. The reader threads then page
+through donor search and the request feed while one writer thread keeps
+toggling availability on the primary. The report gives the readers'
+requests/sec and latency, the writer's requests/sec and any response
+that wasn't a 200. Set BLOODSHARE_DB_PROFILE to compare the database
+profiles as well.
+
+All clients share one process, so past the first replica the GIL rather
+than SQLite sets the ceiling. Replicas on other machines, each with its
+own web workers, scale further.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import enable_test_clients, seed_profiles, setup_django, summarize
+
+
+READS = ('/api/donors/search/?blood_group=O%2B&city=Delhi', '/api/requests/feed/', '/api/donors/search/?city=Mumbai')
+
+
+def run_replicas(args):
+    setup_django(args.db)
+    enable_test_clients()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connections
+    from django.test import Client
+
+    seed_profiles(args.users, requests=args.users // 10)
+    users = list(User.objects.order_by('id')[:args.threads + 1])
+    clients = []
+    for user in users:
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        clients.append(client)
+    # After the logins, so the replicas have the sessions
+    if settings.DATABASE_REPLICAS:
+        call_command('sync_replicas', verbosity=0)
+    writer, readers = clients[0], clients[1:]
+
+    done = threading.Event()
+    writes = []
+
+    def write():
+        while not done.is_set():
+            writes.append(writer.post('/api/profile/toggle-availability/').status_code)
+        connections.close_all()
+
+    samples, statuses = [], []
+
+    def read(index):
+        client = readers[index]
+        for i in range(index, args.requests, args.threads):
+            start = time.perf_counter()
+            statuses.append(client.get(READS[i % len(READS)]).status_code)
+            samples.append(time.perf_counter() - start)
+        connections.close_all()
+
+    writer_thread = threading.Thread(target=write)
+    start = time.perf_counter()
+    writer_thread.start()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(read, range(args.threads)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    writer_thread.join()
+
+    result = summarize(samples)
+    result.update({
+        'replicas': len(settings.DATABASE_REPLICAS),
+        'profile': settings.DB_PROFILE,
+        'threads': args.threads,
+        'reads_per_sec': round(len(samples) / elapsed, 1),
+        'writes_per_sec': round(len(writes) / elapsed, 1),
+        'errors': sum(1 for status in statuses + writes if status != 200),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=3000, help='Reads per run')
+    parser.add_argument('--threads', type=int, default=16, help='Reader threads')
+    parser.add_argument('--replicas', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Child process: run and hand the result back as JSON
+        print(json.dumps(run_replicas(args)))
+        return
+
+    results = []
+    for count in args.replicas:
+        directory = tempfile.mkdtemp(prefix='bloodshare-bench-')
+        replicas = ','.join(os.path.join(directory, f'replica-{index}.sqlite3') for index in range(1, count + 1))
+        command = [sys.executable, '-m', 'benchmarks.read_replicas', '--child',
+                   '--db', os.path.join(directory, 'bench.sqlite3'), '--requests', str(args.requests),
+                   '--threads', str(args.threads), '--users', str(args.users)]
+        output = subprocess.run(
+            command, env={**os.environ, 'BLOODSHARE_REPLICA_PATHS': replicas},
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"replicas={result['replicas']}  {result['reads_per_sec']:9.1f} reads/s"
+              f"  p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms"
+              f"  writes {result['writes_per_sec']:7.1f}/s  errors {result['errors']}")
+        results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
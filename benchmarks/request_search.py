@@ -0,0 +1,87 @@
+"""
+Request search latency: FTS5 index versus LIKE '%term%'.
+
+    python -m benchmarks.request_search --sizes 10000 100000 1000000
+
+For each size the request table is grown in place and three kinds of
+search are timed, both through the full-text index (what the API and admin
+use) and through the icontains filters Django's admin search would
+otherwise build:
+
+  common   one or two words that appear in a large share of requests
+  name     a patient's first and last name, matching a few rows
+  missing  a word no request contains
+
+LIKE has to scan rows until it has a page of matches, so selective and
+missing terms cost a full table scan that grows with the table; the FTS
+lookup reads only the matching postings. For very common words LIKE can
+stop early while FTS still ranks every match.
+"""
+import argparse
+import json
+import random
+
+from .common import setup_django, seed_profiles, summarize, timed
+
+
+COMMON_TERMS = ['urgent', 'surgery', 'thalassemia', 'accident', 'delivery', 'icu', 'mumbai', 'pune']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help='Donation requests')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection
+    from django.db.models import Q
+    from bloodshare.feeds import request_cards
+    from bloodshare.fulltext import search_requests
+    from bloodshare.models import DonationRequest
+    from bloodshare.synthetic import FIRST_NAMES, LAST_NAMES
+
+    rng = random.Random(42)
+    queries = {
+        'common': lambda: ' '.join(rng.sample(COMMON_TERMS, rng.choice([1, 2]))),
+        'name': lambda: f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'missing': lambda: ''.join(rng.choice('qxzjv') for _ in range(8)),
+    }
+
+    def fts(query):
+        return lambda: search_requests(query(), status='pending')
+
+    def like(query):
+        def run():
+            q = Q()
+            for term in query().split():
+                q &= Q(name__icontains=term) | Q(city__icontains=term) | Q(details__icontains=term)
+            list(request_cards(DonationRequest.objects.filter(q, status='pending')).order_by('-created_at', '-id')[:20])
+        return run
+
+    results = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        # One user per request; requests are spread over the users
+        seed_profiles(size, start=seeded, requests=size)
+        seeded = size
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        timed(fts(queries['common']), 20)  # warm the page cache
+        result = {'requests': size}
+        for kind, query in queries.items():
+            result[kind] = {
+                'fts': summarize(timed(fts(query), args.iterations)),
+                'like': summarize(timed(like(query), max(args.iterations // 10, 1))),
+            }
+            print(f"{size:>10,} requests  {kind:<8} FTS p99 {result[kind]['fts']['p99_ms']:8.3f} ms"
+                  f"  LIKE p99 {result[kind]['like']['p99_ms']:9.3f} ms")
+        results.append(result)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Mixed read/write throughput of the development and production SQLite
+profiles (BLOODSHARE_DB_PROFILE).
+
+    python -m benchmarks.sqlite_concurrency --requests 4000 --threads 1 8 32
+
+Each profile runs in its own process against a fresh database, since the
+profile is read when settings load. Every thread is a logged-in client of
+a threaded WSGI server. One call in --write-every is a write (a toggle,
+an accept or a new request, in turn); the rest read the dashboard, the
+request feed and donor search. The report gives requests/sec, latency and
+the number of requests that failed, which under the development profile
+are mostly "database is locked".
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import enable_test_clients, seed_profiles, setup_django, summarize
+
+
+PROFILES = ('development', 'production')
+
+READS = ('/dashboard/', '/api/requests/feed/', '/api/donors/search/?blood_group=O%2B&city=Delhi')
+
+
+def run_profile(args):
+    setup_django(args.db)
+    enable_test_clients()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from django.test import Client
+    from bloodshare.models import DonationRequest
+
+    max_threads = max(args.threads)
+    seed_profiles(max(args.users, max_threads + 1))
+    users = list(User.objects.order_by('id')[:max_threads + 1])
+    requester, donors = users[0], users[1:]
+
+    def plan(run):
+        """(method, path, data) per call: reads, with every --write-every'th call a write"""
+        accepts = iter(DonationRequest.objects.bulk_create([
+            DonationRequest(requester=requester, name=f'Run {run} #{i}', blood_group_needed='O+', city='Delhi')
+            for i in range(args.requests // args.write_every // 3 + 1)
+        ]))
+        writes = 0
+        calls = []
+        for i in range(args.requests):
+            if i % args.write_every:
+                calls.append(('get', READS[i % len(READS)], None))
+                continue
+            kind = writes % 3
+            writes += 1
+            if kind == 0:
+                calls.append(('post', '/api/profile/toggle-availability/', None))
+            elif kind == 1:
+                calls.append(('post', f'/api/requests/{next(accepts).id}/accept/', None))
+            else:
+                calls.append(('post', '/dashboard/', {
+                    'name': f'Run {run} new #{i}', 'blood_group_needed': 'A+', 'city': 'Delhi', 'details': '',
+                }))
+        return calls
+
+    def run(threads, calls):
+        clients = []
+        for donor in donors[:threads]:
+            client = Client(raise_request_exception=False)
+            client.force_login(donor)
+            clients.append(client)
+        samples, statuses = [], []
+
+        def worker(index):
+            client = clients[index]
+            for method, path, data in calls[index::threads]:
+                start = time.perf_counter()
+                statuses.append(getattr(client, method)(path, data).status_code)
+                samples.append(time.perf_counter() - start)
+            connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(worker, range(threads)))
+        elapsed = time.perf_counter() - start
+
+        result = summarize(samples)
+        result.update({
+            'profile': settings.DB_PROFILE,
+            'threads': threads,
+            'requests_per_sec': round(len(samples) / elapsed, 1),
+            'errors': sum(1 for status in statuses if status >= 500),
+        })
+        return result
+
+    return [run(threads, plan(index)) for index, threads in enumerate(args.threads)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=4000, help='Calls per run')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--write-every', type=int, default=5, help='One call in this many is a write')
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file per profile)')
+    args = parser.parse_args()
+
+    if os.environ.get('BLOODSHARE_DB_PROFILE') in PROFILES and len(args.profiles) == 1:
+        # Child process: run and hand the results back as JSON
+        print(json.dumps(run_profile(args)))
+        return
+
+    results = []
+    for profile in args.profiles:
+        command = [sys.executable, '-m', 'benchmarks.sqlite_concurrency', '--profiles', profile,
+                   '--requests', str(args.requests), '--write-every', str(args.write_every),
+                   '--users', str(args.users), '--threads', *map(str, args.threads)]
+        if args.db:
+            command += ['--db', f'{args.db}.{profile}']
+        output = subprocess.run(
+            command, env={**os.environ, 'BLOODSHARE_DB_PROFILE': profile},
+            check=True, capture_output=True, text=True,
+        ).stdout
+        for result in json.loads(output.strip().splitlines()[-1]):
+            print(f"{profile:>11} t={result['threads']:<3} {result['requests_per_sec']:9.1f} req/s"
+                  f"  p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms  errors {result['errors']}")
+            results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Status report latency from the rollups versus the raw event log.
+
+    python -m benchmarks.status_rollups --events 1000000 --iterations 20
+
+Seeds synthetic status events spread over the last year. It times
+roll_up() folding them into the hourly and daily buckets, then times the
+same report both ways: a time-to-status summary per day for the last 90
+days, read once from DailyStatusRollup with events.summary() and once by
+aggregating RequestStatusEvent directly. The report gives the events
+folded per second and each report's latency, and checks that both give
+the same counts.
+"""
+import argparse
+import json
+import time
+
+from .common import seed_profiles, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--days', type=int, default=90, help='Days covered by the report')
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from datetime import timedelta, timezone as dt_timezone
+    from django.db import connection
+    from django.db.models import Avg, Count, Max
+    from django.db.models.functions import TruncDay
+    from django.utils import timezone
+    from bloodshare.events import roll_up, summary
+    from bloodshare.models import RequestStatusEvent
+
+    seed_profiles(1000, requests=1000)
+    with connection.cursor() as cursor:
+        # Statuses and blood groups cycle with the id; created_at spreads over a year
+        cursor.execute(
+            'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s) '
+            'INSERT INTO bloodshare_requeststatusevent '
+            '(donation_request_id, from_status, to_status, actor_id, blood_group, elapsed_seconds, created_at) '
+            "SELECT i %% 1000 + 1, 'pending', "
+            "CASE i %% 4 WHEN 0 THEN 'accepted' WHEN 1 THEN 'cancelled' WHEN 2 THEN 'fulfilled' ELSE 'expired' END, "
+            "NULL, CASE i %% 8 WHEN 0 THEN 'A+' WHEN 1 THEN 'A-' WHEN 2 THEN 'B+' WHEN 3 THEN 'B-' "
+            "WHEN 4 THEN 'AB+' WHEN 5 THEN 'AB-' WHEN 6 THEN 'O+' ELSE 'O-' END, "
+            "i %% 86400, datetime('now', '-' || (i * 31536000 / %s) || ' seconds') FROM n",
+            [args.events, args.events],
+        )
+        cursor.execute('ANALYZE')
+
+    start = time.perf_counter()
+    folded = 0
+    while batch := roll_up():
+        folded += batch
+    rollup_seconds = time.perf_counter() - start
+    print(f'roll_up: {folded:,} events in {rollup_seconds:.2f}s ({folded / rollup_seconds:,.0f}/s)')
+
+    # Whole UTC days, so both reports cover the same buckets
+    since = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=args.days)
+
+    def from_rollups():
+        return summary('day', since=since)
+
+    def from_events():
+        return list(
+            RequestStatusEvent.objects.filter(created_at__gte=since)
+            .annotate(bucket=TruncDay('created_at', tzinfo=dt_timezone.utc)).values('bucket', 'to_status')
+            .annotate(count=Count('id'), mean_seconds=Avg('elapsed_seconds'), max_seconds=Max('elapsed_seconds'))
+            .order_by('bucket', 'to_status')
+        )
+
+    assert sum(row['count'] for row in from_rollups()) == sum(row['count'] for row in from_events())
+    results = {'events': folded, 'rollup_events_per_sec': round(folded / rollup_seconds)}
+    for name, report in (('rollups', from_rollups), ('raw_events', from_events)):
+        results[name] = summarize(timed(report, args.iterations))
+        print(f"{name:<10}  p50 {results[name]['p50_ms']:9.3f} ms  p99 {results[name]['p99_ms']:9.3f} ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
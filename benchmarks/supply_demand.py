@@ -0,0 +1,58 @@
+"""
+Supply/demand report latency from the cells versus grouping the tables.
+
+    python -m benchmarks.supply_demand --sizes 10000 100000 1000000 --iterations 20
+
+For each size, grows the synthetic dataset (one request per ten users),
+rebuilds the cells, then times supply.report() against compute_cells(),
+the two GROUP BY queries over Profile and DonationRequest the cells
+replace. It also times the full rebuild the periodic job runs.
+"""
+import argparse
+import json
+import time
+
+from .common import seed_profiles, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection
+    from bloodshare import supply
+    from bloodshare.models import SupplyDemandCell
+
+    results = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed_profiles(size, start=seeded, requests=(size - seeded) // 10)
+        seeded = size
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        start = time.perf_counter()
+        supply.rebuild()
+        rebuild_seconds = time.perf_counter() - start
+
+        result = {
+            'users': size,
+            'cells': SupplyDemandCell.objects.count(),
+            'rebuild_seconds': round(rebuild_seconds, 3),
+            'cells_report': summarize(timed(supply.report, args.iterations)),
+            'group_by': summarize(timed(supply.compute_cells, args.iterations)),
+        }
+        print(f"{size:>9,} users  {result['cells']:,} cells"
+              f"  report p50 {result['cells_report']['p50_ms']:8.3f} ms"
+              f"  GROUP BY p50 {result['group_by']['p50_ms']:9.3f} ms"
+              f"  rebuild {result['rebuild_seconds']:.3f}s")
+        results.append(result)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
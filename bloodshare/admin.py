@@ -1,19 +1,199 @@
-from django.contrib import admin
-from .models import Profile, DonationRequest
-
-
-@admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'blood_group', 'city', 'is_available', 'last_donation_date', 'created_at')
-    list_filter = ('blood_group', 'is_available', 'city', 'created_at')
-    search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name', 'city', 'phone')
-    readonly_fields = ('created_at', 'updated_at')
-
-
-@admin.register(DonationRequest)
-class DonationRequestAdmin(admin.ModelAdmin):
-    list_display = ('name', 'requester', 'blood_group_needed', 'city', 'status', 'created_at')
-    list_filter = ('status', 'blood_group_needed', 'city', 'created_at')
-    search_fields = ('name', 'requester__username', 'requester__email', 'city', 'details')
-    readonly_fields = ('created_at', 'updated_at')
-    date_hierarchy = 'created_at'
+from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.auth.models import User
+from django.db.models import F, OuterRef, Q, Subquery
+from django.urls import reverse_lazy
+from . import exports
+from .backends import users_with_email
+from .cities import city_key_filter
+from .fulltext import matching_requests_q
+from .models import City, CityAlias, Profile, DonationRequest, RequestStatusEvent, SiteCounter, SupplyDemandCell
+from .pagination import EstimatedCountPaginator
+
+
+class InputListFilter(admin.SimpleListFilter):
+    """
+    Free-text list filter for high-cardinality columns.
+
+    The stock filters list every distinct value, which means a DISTINCT
+    scan on each changelist load and a sidebar with thousands of links.
+    This renders a text box instead, with optional suggestions fetched
+    from ``suggest_url`` as the admin types.
+    """
+    template = 'admin/bloodshare/input_filter.html'
+    suggest_url = None
+
+    def lookups(self, request, model_admin):
+        # Never empty, so the filter is always shown
+        return ((None, None),)
+
+    def choices(self, changelist):
+        # Only "All"; the form resubmits every other active parameter
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'query_parts': [
+                (name, value) for name, value in changelist.params.items()
+                if name not in (self.parameter_name, PAGE_VAR)
+            ],
+        }
+
+
+class CityListFilter(InputListFilter):
+    """Any spelling of a city, matched as an indexed equality on ``city_key``"""
+    title = 'city'
+    parameter_name = 'city'
+    suggest_url = reverse_lazy('city_suggestions')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**city_key_filter(self.value()))
+        return queryset
+
+
+class RequesterEmailFilter(InputListFilter):
+    """Requests made by the user with this email, via the email index"""
+    title = 'requester email'
+    parameter_name = 'requester_email'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(requester__in=users_with_email(self.value()))
+        return queryset
+
+
+@admin.action(description='Export selected %(verbose_name_plural)s as CSV')
+def export_csv(modeladmin, request, queryset):
+    return exports.streaming_response(queryset, 'csv', request)
+
+
+@admin.action(description='Export selected %(verbose_name_plural)s as JSON lines')
+def export_jsonl(modeladmin, request, queryset):
+    return exports.streaming_response(queryset, 'jsonl', request)
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows.
+
+    Pages are counted with EstimatedCountPaginator, and the unfiltered
+    total next to the search box is not counted at all.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # "Select all" exports every row matching the changelist's filters and search
+    actions = [export_csv, export_jsonl]
+
+
+@admin.register(Profile)
+class ProfileAdmin(ScalableAdmin):
+    list_display = ('user', 'blood_group', 'city', 'is_available', 'last_donation_date', 'created_at')
+    list_filter = ('blood_group', 'is_available', CityListFilter, 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name', 'city', 'phone')
+    readonly_fields = ('city_key', 'created_at', 'updated_at')
+    autocomplete_fields = ('user',)
+    date_hierarchy = 'created_at'
+
+
+class RequestStatusEventInline(admin.TabularInline):
+    """A request's status history, read-only since the log is append-only"""
+    model = RequestStatusEvent
+    fields = ('created_at', 'from_status', 'to_status', 'actor', 'elapsed_seconds')
+    readonly_fields = fields
+    ordering = ('id',)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('actor')
+
+
+@admin.register(DonationRequest)
+class DonationRequestAdmin(ScalableAdmin):
+    list_display = ('name', 'requester', 'blood_group_needed', 'city', 'status', 'created_at')
+    list_filter = ('status', 'blood_group_needed', CityListFilter, RequesterEmailFilter, 'created_at')
+    list_select_related = ('requester',)
+    search_fields = ('name', 'requester__username', 'requester__email', 'city', 'details')
+    readonly_fields = ('city_key', 'created_at', 'updated_at')
+    autocomplete_fields = ('requester', 'accepted_by')
+    date_hierarchy = 'created_at'
+    inlines = [RequestStatusEventInline]
+
+    def save_model(self, request, obj, form, change):
+        # Credited on the status event the save logs
+        obj._status_actor = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search name, city and details through the full-text index, plus an
+        exact requester username or email, instead of LIKE '%term%' over
+        every column. Both requester lookups are single index seeks.
+        """
+        if not search_term.strip():
+            return queryset, False
+        q = matching_requests_q(search_term)
+        q |= Q(requester__in=User.objects.filter(username=search_term.strip()))
+        if '@' in search_term:
+            q |= Q(requester__in=users_with_email(search_term))
+        return queryset.filter(q), False
+
+
+class CityAliasInline(admin.TabularInline):
+    """Point a spelling at another city to confirm it is a typo of that city"""
+    model = CityAlias
+    extra = 0
+    autocomplete_fields = ('city',)
+
+
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key')
+    search_fields = ('=key', 'name')
+    readonly_fields = ('key', 'trigram_count')
+    inlines = [CityAliasInline]
+
+
+@admin.register(SiteCounter)
+class SiteCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at')
+    readonly_fields = ('name', 'value', 'updated_at')
+
+
+@admin.register(SupplyDemandCell)
+class SupplyDemandCellAdmin(admin.ModelAdmin):
+    """The supply/demand report; cells are maintained by signals and rebuild_supply_demand"""
+    list_display = ('city', 'blood_group', 'available_donors', 'pending_requests', 'shortfall', 'updated_at')
+    list_filter = ('blood_group', CityListFilter)
+
+    def get_ordering(self, request):
+        # Most unmet demand first; shortfall is annotated, so it can't be in ``ordering``
+        return ('-shortfall', 'city_key', 'blood_group')
+
+    def get_queryset(self, request):
+        names = City.objects.filter(key=OuterRef('city_key')).values('name')[:1]
+        # Not super(), which orders by get_ordering() before shortfall exists; the changelist orders it
+        return self.model._default_manager.annotate(
+            city_name=Subquery(names), shortfall=F('pending_requests') - F('available_donors'),
+        )
+
+    @admin.display(ordering='city_name')
+    def city(self, obj):
+        return obj.city_name or obj.city_key
+
+    @admin.display(ordering='shortfall')
+    def shortfall(self, obj):
+        return obj.shortfall
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,9 @@
-from django.apps import AppConfig
-
-
-class BloodshareConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'bloodshare'
+from django.apps import AppConfig
+
+
+class BloodshareConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'bloodshare'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,128 @@
+"""
+Async implementations of the dashboard's JSON API endpoints.
+
+These are routed by bloodshare_project.asgi_urls when the site is served
+through ASGI, so one worker can keep many API calls in flight while each
+waits on the database. Under WSGI the sync versions in views.py are used.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+
+from .live import Subscription, event_stream, parse_event_id
+from .models import DonationRequest, Profile
+from .transitions import atransition_request
+
+
+def async_login_required(view):
+    """login_required for async views; the user is loaded off the event loop"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await sync_to_async(get_user)(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_POST(view):
+    """require_POST for async views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_GET(view):
+    """require_GET for async views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _transition_failed(request, request_id, action):
+    """Explain why a conditional status update did not match any row"""
+    current = await DonationRequest.objects.filter(id=request_id).values('requester_id', 'status').afirst()
+    if current is None:
+        return JsonResponse({'success': False, 'error': 'Request not found'}, status=404)
+    if current['requester_id'] == request.user.id:
+        return JsonResponse({'success': False, 'error': f'Cannot {action} your own request'}, status=400)
+    return JsonResponse({'success': False, 'error': 'Request is no longer pending'}, status=409)
+
+
+@async_login_required
+@async_require_POST
+async def accept_request(request, request_id):
+    """Accept a donation request"""
+    accepted = await atransition_request(
+        request_id, 'pending', 'accepted',
+        actor=request.user,
+        exclude_requester=request.user,
+        accepted_by=request.user,
+    )
+    if not accepted:
+        return await _transition_failed(request, request_id, 'accept')
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Request accepted successfully'
+    })
+
+
+@async_login_required
+@async_require_POST
+async def reject_request(request, request_id):
+    """Reject a donation request"""
+    rejected = await atransition_request(
+        request_id, 'pending', 'cancelled',
+        actor=request.user,
+        exclude_requester=request.user,
+    )
+    if not rejected:
+        return await _transition_failed(request, request_id, 'reject')
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Request rejected'
+    })
+
+
+@async_login_required
+@async_require_POST
+async def toggle_availability(request):
+    """API endpoint to toggle donor availability"""
+    try:
+        profile = await Profile.objects.aget(user=request.user)
+    except Profile.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Profile not found'}, status=404)
+
+    profile.is_available = not profile.is_available
+    await profile.asave(update_fields=['is_available', 'updated_at'])
+    return JsonResponse({
+        'success': True,
+        'is_available': profile.is_available,
+        'message': 'Availability updated successfully'
+    })
+
+
+@async_login_required
+@async_require_GET
+async def request_events(request):
+    """Server-Sent Events stream of request changes relevant to the dashboard"""
+    profile = await Profile.objects.filter(user=request.user).values('blood_group', 'city_key').afirst() or {}
+    subscription = Subscription(request.user.id, profile.get('blood_group', ''), profile.get('city_key', ''))
+    last_event_id = parse_event_id(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+    response = StreamingHttpResponse(event_stream(subscription, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
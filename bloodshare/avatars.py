@@ -0,0 +1,207 @@
+"""
+Background processing of uploaded avatars.
+
+An upload is saved as-is and the request returns; once the transaction
+commits, a worker thread validates the image with Pillow, re-encodes it
+without metadata (EXIF, GPS, ICC comments), and writes square thumbnails
+in WebP and JPEG at each of THUMBNAIL_SIZES. Pillow releases the GIL
+while decoding, resizing and encoding, so a small thread pool runs
+uploads in parallel without a separate task queue.
+
+Results are written with a conditional UPDATE on the avatar name, so a
+newer upload that arrived in the meantime is never overwritten.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Profile
+
+
+logger = logging.getLogger(__name__)
+
+# Square thumbnail edges in pixels: 1x and 2x of the 80px dashboard avatar,
+# and 2x of the 100px preview on the profile form
+THUMBNAIL_SIZES = (80, 160, 320)
+
+# Longest edge of the re-encoded original kept in Profile.avatar
+MAX_SOURCE_EDGE = 1024
+
+# Reject images that would decode to more pixels than this
+MAX_PIXELS = 40_000_000
+
+ACCEPTED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+_executor = None
+
+
+class InvalidAvatar(ValueError):
+    """Raised when an upload is not an image the pipeline accepts"""
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'AVATAR_WORKERS', 2),
+            thread_name_prefix='avatar',
+        )
+    return _executor
+
+
+def schedule(profile_id, stale_files=()):
+    """
+    Process ``profile_id``'s avatar once the current transaction commits.
+
+    ``stale_files`` (the avatar it replaces and its thumbnails) are deleted
+    once the new one is ready. With ``AVATAR_PROCESSING_INLINE`` the work runs in
+    the committing thread instead, which tests and scripts rely on.
+    """
+    def submit():
+        if getattr(settings, 'AVATAR_PROCESSING_INLINE', False):
+            process_avatar(profile_id, stale_files)
+        else:
+            _pool().submit(_run_in_worker, profile_id, stale_files)
+
+    transaction.on_commit(submit)
+
+
+def _run_in_worker(profile_id, stale_files):
+    close_old_connections()
+    try:
+        process_avatar(profile_id, stale_files)
+    except Exception:
+        logger.exception('Processing avatar of profile %s failed', profile_id)
+    finally:
+        # Worker threads must not keep connections open between jobs
+        connections.close_all()
+
+
+def open_image(data):
+    """Decode and validate uploaded bytes; returns an upright, fully loaded image"""
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            if probe.format not in ACCEPTED_FORMATS:
+                raise InvalidAvatar(f'Unsupported image format {probe.format}')
+            if probe.width * probe.height > MAX_PIXELS:
+                raise InvalidAvatar('Image is too large')
+            probe.verify()
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise InvalidAvatar('Not a valid image') from exc
+    return ImageOps.exif_transpose(image)
+
+
+def _flatten(image):
+    """RGB copy of ``image``, with any transparency composited onto white"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render_variants(data):
+    """
+    ``{name: bytes}`` for the sanitized source and every thumbnail.
+
+    Names are ``'source'`` and ``'<size>.webp'`` / ``'<size>.jpeg'``. Nothing
+    from the upload's metadata is carried over.
+    """
+    image = _flatten(open_image(data))
+    source = image.copy()
+    source.thumbnail((MAX_SOURCE_EDGE, MAX_SOURCE_EDGE), Image.LANCZOS)
+    rendered = {'source': _encode(source, 'jpeg')}
+
+    square = ImageOps.fit(source, (max(THUMBNAIL_SIZES),) * 2, Image.LANCZOS)
+    for size in THUMBNAIL_SIZES:
+        thumbnail = square.resize((size, size), Image.LANCZOS)
+        for fmt in ('webp', 'jpeg'):
+            rendered[f'{size}.{fmt}'] = _encode(thumbnail, fmt)
+    return rendered
+
+
+def variant_files(variants):
+    """Every storage path recorded in a Profile.avatar_variants value"""
+    return [path for formats in variants.get('sizes', {}).values() for path in formats.values()]
+
+
+def process_avatar(profile_id, stale_files=()):
+    """
+    Validate, sanitize and thumbnail the current avatar of ``profile_id``.
+
+    Returns the new status, or None if the profile no longer has the avatar
+    this job was started for.
+    """
+    profile = Profile.objects.filter(id=profile_id).only('id', 'avatar').first()
+    if profile is None or not profile.avatar:
+        return None
+    upload_name = profile.avatar.name
+
+    try:
+        try:
+            with default_storage.open(upload_name, 'rb') as upload:
+                data = upload.read()
+        except OSError as exc:
+            raise InvalidAvatar('Uploaded file is missing') from exc
+        rendered = render_variants(data)
+    except InvalidAvatar as exc:
+        logger.info('Rejected avatar %s: %s', upload_name, exc)
+        updated = Profile.objects.filter(id=profile_id, avatar=upload_name).update(
+            avatar='', avatar_status='failed', avatar_variants={},
+        )
+        if updated:
+            for path in [upload_name, *stale_files]:
+                default_storage.delete(path)
+        return 'failed' if updated else None
+
+    stem = os.path.splitext(os.path.basename(upload_name))[0]
+    source_name = default_storage.save(f'avatars/{stem}.jpg', ContentFile(rendered.pop('source')))
+    sizes = {}
+    for name, content in rendered.items():
+        size, fmt = name.split('.')
+        path = default_storage.save(f'avatars/variants/{stem}-{size}.{fmt}', ContentFile(content))
+        sizes.setdefault(size, {})[fmt] = path
+
+    updated = Profile.objects.filter(id=profile_id, avatar=upload_name).update(
+        avatar=source_name, avatar_status='ready', avatar_variants={'sizes': sizes},
+    )
+    if not updated:
+        # Replaced by a newer upload while we worked; ours is the stale one now
+        stale_files = [source_name, *variant_files({'sizes': sizes})]
+    elif source_name != upload_name:
+        stale_files = [upload_name, *stale_files]
+    for path in stale_files:
+        default_storage.delete(path)
+    return 'ready' if updated else None
+
+
+def pick_variant(variants, display_size, density=1):
+    """Smallest thumbnail at least ``display_size * density`` pixels wide, else the largest"""
+    sizes = sorted(int(size) for size in variants.get('sizes', {}))
+    if not sizes:
+        return None
+    wanted = display_size * density
+    size = next((size for size in sizes if size >= wanted), sizes[-1])
+    return variants['sizes'][str(size)]
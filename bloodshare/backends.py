@@ -0,0 +1,54 @@
+import string
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+
+
+UserModel = get_user_model()
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def fold_email(email):
+    """
+    ``email`` folded the way SQLite's ``LOWER()`` folds the stored column.
+
+    LOWER() only changes ASCII letters, so str.lower() would turn "É" into
+    "é" on one side of the comparison but not the other. Folding both
+    sides alike keeps the lookup in step with the unique index: addresses
+    differing in ASCII case are the same account, and non-ASCII letters
+    match as stored.
+    """
+    return email.strip().translate(_ASCII_LOWER)
+
+
+def users_with_email(email):
+    """
+    Users whose email matches ``email`` case-insensitively.
+
+    ``email__iexact`` compiles to ``LIKE`` on SQLite, which cannot use the
+    ``LOWER(email)`` index; comparing ``LOWER(email)`` for equality can. The
+    ``email > ''`` term repeats the partial index's condition so the planner
+    is allowed to use it.
+    """
+    return UserModel._default_manager.filter(Exact(Lower('email'), fold_email(email)), email__gt='')
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate users by email address with a single indexed lookup"""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        try:
+            user = users_with_email(email).get()
+        except (UserModel.DoesNotExist, UserModel.MultipleObjectsReturned):
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
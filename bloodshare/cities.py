@@ -0,0 +1,173 @@
+"""
+Canonical cities for the free-text ``city`` fields.
+
+Typed city names are reduced to a key (case, accents, punctuation and
+spacing removed) and resolved through CityAlias to a canonical City. The
+canonical key is stored in ``city_key`` on Profile and DonationRequest, so
+city filters are indexed equality lookups.
+
+A spelling never seen before is only merged into an existing city through
+KNOWN_ALIASES; otherwise it becomes a City of its own. Similar names are
+often different places (Jaipur, Raipur, Rampur), so similarity alone never
+merges anything. The trigram index of known cities only powers
+suggestions such as "Hyderabad" for "Hydrabad". Staff confirm that a
+spelling is a typo by pointing its CityAlias at the right city in the
+admin, then running ``normalize_cities --all`` to re-key existing rows.
+"""
+import difflib
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Subquery
+
+from .models import City, CityAlias, CityTrigram
+
+
+# Well-known alternative names, keyed by normalized spelling
+KNOWN_ALIASES = {
+    'new delhi': 'Delhi',
+    'bombay': 'Mumbai',
+    'bangalore': 'Bengaluru',
+    'madras': 'Chennai',
+    'calcutta': 'Kolkata',
+    'poona': 'Pune',
+    'allahabad': 'Prayagraj',
+    'gurgaon': 'Gurugram',
+    'baroda': 'Vadodara',
+    'benares': 'Varanasi',
+}
+
+# Trigram similarity a known city needs to be considered at all
+TRIGRAM_THRESHOLD = 0.2
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_city_key(text):
+    """Lower-case ASCII key for a typed city name; ``' New  Délhi.'`` -> ``'new delhi'``"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub(' ', text.casefold()).strip()
+
+
+def trigrams(key):
+    """Trigrams of each word of ``key``, padded like PostgreSQL's pg_trgm"""
+    grams = set()
+    for word in key.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similar_cities(text, limit=5):
+    """
+    Known cities resembling ``text``, best first, as ``[(score, city), ...]``.
+
+    The trigram index narrows the candidates in one grouped query; they are
+    then ranked by edit similarity of the keys.
+    """
+    key = normalize_city_key(text)
+    grams = trigrams(key)
+    if not grams:
+        return []
+    shared = (
+        CityTrigram.objects.filter(trigram__in=grams)
+        .values('city_id', 'city__trigram_count')
+        .annotate(shared=Count('id'))
+    )
+    candidate_ids = [
+        row['city_id'] for row in shared
+        if row['shared'] / (len(grams) + row['city__trigram_count'] - row['shared']) >= TRIGRAM_THRESHOLD
+    ]
+    ranked = [
+        (difflib.SequenceMatcher(None, key, city.key).ratio(), city)
+        for city in City.objects.filter(id__in=candidate_ids)
+    ]
+    ranked.sort(key=lambda pair: (-pair[0], pair[1].name))
+    return ranked[:limit]
+
+
+def _create_city(name, key):
+    city = City.objects.create(name=name, key=key, trigram_count=len(trigrams(key)))
+    CityTrigram.objects.bulk_create([CityTrigram(trigram=gram, city=city) for gram in trigrams(key)])
+    return city
+
+
+def _canonical_city(text, key):
+    """The City an unseen ``key`` belongs to: a known alias's city, or its own"""
+    if key in KNOWN_ALIASES:
+        return resolve_city(KNOWN_ALIASES[key])
+    city = City.objects.filter(key=key).first()
+    return city or _create_city(' '.join(text.split()), key)
+
+
+def resolve_city(text):
+    """
+    The canonical City for a typed name, or None for a blank one.
+
+    A known spelling costs one indexed lookup. An unseen spelling is
+    resolved once and remembered as a CityAlias.
+    """
+    key = normalize_city_key(text)
+    if not key:
+        return None
+    alias = CityAlias.objects.select_related('city').filter(key=key).first()
+    if alias:
+        return alias.city
+    try:
+        with transaction.atomic():
+            city = _canonical_city(text, key)
+            CityAlias.objects.create(key=key, city=city)
+    except IntegrityError:
+        # Another request registered the same spelling first
+        return CityAlias.objects.select_related('city').get(key=key).city
+    return city
+
+
+def city_key_for(text):
+    """Canonical key for ``text``; empty for a blank name"""
+    city = resolve_city(text)
+    return city.key if city else ''
+
+
+def city_key_filter(text, field='city_key'):
+    """
+    Filter kwargs matching rows in the same canonical city as ``text``.
+
+    The alias lookup is a subquery, so filtering stays a single indexed
+    query and never creates cities for spellings nobody has stored.
+    """
+    canonical = CityAlias.objects.filter(key=normalize_city_key(text)).values('city__key')
+    return {f'{field}__in': Subquery(canonical)}
+
+
+def backfill_city_keys(model, batch_size=1000, recompute=False, progress=None):
+    """
+    Set ``city_key`` on existing ``model`` rows, one batch per transaction.
+
+    Batches walk the primary key, so each one is an index range scan no
+    matter how far the backfill has got. Every distinct spelling is
+    resolved once. Rows that already have a key are skipped unless
+    ``recompute`` is set. Returns the number of rows changed.
+    """
+    queryset = model.objects.all() if recompute else model.objects.filter(city_key='')
+    keys = {}
+    last_id = 0
+    changed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'city')[:batch_size])
+            if not rows:
+                break
+            ids_by_key = defaultdict(list)
+            for row_id, city in rows:
+                if city not in keys:
+                    keys[city] = city_key_for(city)
+                ids_by_key[keys[city]].append(row_id)
+            for key, ids in ids_by_key.items():
+                changed += model.objects.filter(id__in=ids).exclude(city_key=key).update(city_key=key)
+        last_id = rows[-1][0]
+        if progress:
+            progress(last_id, changed)
+    return changed
@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+
+TOTAL_DONORS = 'total_donors'
+LIVES_SAVED = 'lives_saved'
+ACTIVE_REQUESTS = 'active_requests'
+COUNTER_NAMES = (TOTAL_DONORS, LIVES_SAVED, ACTIVE_REQUESTS)
+
+STATS_CACHE_KEY = 'bloodshare:landing_stats'
+STATS_CACHE_TIMEOUT = 60 * 5
+
+# Request statuses that count towards "lives saved"
+SAVED_STATUSES = ('accepted', 'fulfilled')
+
+
+def profile_contribution(is_available):
+    """What a single profile adds to each counter"""
+    return {TOTAL_DONORS: 1 if is_available else 0}
+
+
+def request_contribution(status):
+    """What a single donation request adds to each counter"""
+    return {
+        ACTIVE_REQUESTS: 1 if status == 'pending' else 0,
+        LIVES_SAVED: 1 if status in SAVED_STATUSES else 0,
+    }
+
+
+def diff(old, new):
+    """Per-counter delta between two contributions"""
+    return {name: new.get(name, 0) - old.get(name, 0) for name in set(old) | set(new)}
+
+
+def apply_deltas(deltas):
+    """
+    Add ``deltas`` to the stored counters with ``UPDATE ... SET value = value + n``.
+
+    The cached landing stats are dropped once the surrounding transaction
+    commits so the next render picks up the new values.
+    """
+    from .models import SiteCounter
+
+    changed = False
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        changed = True
+        if not SiteCounter.objects.filter(name=name).update(value=F('value') + delta):
+            SiteCounter.objects.get_or_create(name=name)
+            SiteCounter.objects.filter(name=name).update(value=F('value') + delta)
+    if changed:
+        transaction.on_commit(lambda: cache.delete(STATS_CACHE_KEY))
+
+
+def get_landing_stats():
+    """Landing page statistics, served from cache or the counters table"""
+    from .models import SiteCounter
+
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = dict.fromkeys(COUNTER_NAMES, 0)
+        stats.update(SiteCounter.objects.filter(name__in=COUNTER_NAMES).values_list('name', 'value'))
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def compute_counts():
+    """Count every counter from scratch; used to reconcile drift"""
+    from .models import DonationRequest, Profile
+
+    return {
+        TOTAL_DONORS: Profile.objects.filter(is_available=True).count(),
+        LIVES_SAVED: DonationRequest.objects.filter(status__in=SAVED_STATUSES).count(),
+        ACTIVE_REQUESTS: DonationRequest.objects.filter(status='pending').count(),
+    }
+
+
+def reconcile():
+    """
+    Overwrite the stored counters with exact counts.
+
+    Returns ``{name: drift}`` where drift is how far the stored value was off.
+    """
+    from .models import SiteCounter
+
+    with transaction.atomic():
+        actual = compute_counts()
+        stored = dict(SiteCounter.objects.select_for_update().values_list('name', 'value'))
+        for name, value in actual.items():
+            SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+    cache.delete(STATS_CACHE_KEY)
+    return {name: actual[name] - stored.get(name, 0) for name in actual}
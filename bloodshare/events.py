@@ -0,0 +1,154 @@
+"""
+Donation request status history and its hourly and daily rollups.
+
+Every status change appends a RequestStatusEvent. That includes a request
+being created, an accept or reject in the views, an expiry, or an edit
+in the admin. The event records who made the change and how long after
+creation it happened, so time-to-accept or time-to-fulfil is a property
+of the event rather than something worked out from ``updated_at``.
+Changes made through a conditional UPDATE are recorded with one
+``INSERT ... SELECT`` from the changed rows, in the same transaction.
+
+roll_up() folds new events into HourlyStatusRollup and DailyStatusRollup
+buckets, keyed on (bucket, to_status, blood_group), a batch at a time,
+with one grouped ``INSERT ... ON CONFLICT DO UPDATE`` per table. The batch's increments and the advanced watermark are committed
+together, so every event is counted exactly once even if the job dies
+between batches. Reports read the buckets instead of aggregating the log.
+
+SQLite commits writers one at a time, so events become visible in id
+order and the watermark never skips one that is committed later.
+"""
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import DailyStatusRollup, DonationRequest, HourlyStatusRollup, RequestStatusEvent, RollupWatermark
+
+
+# Events folded into the rollups per transaction
+BATCH_SIZE = 10_000
+
+WATERMARK = 'status_rollups'
+
+# strftime() formats matching how Django stores the truncated datetimes
+ROLLUPS = (
+    (HourlyStatusRollup, '%Y-%m-%d %H:00:00'),
+    (DailyStatusRollup, '%Y-%m-%d 00:00:00'),
+)
+
+PERIODS = {'hour': HourlyStatusRollup, 'day': DailyStatusRollup}
+
+
+def record_created(donation_request):
+    """Log a new request's initial status"""
+    return RequestStatusEvent.objects.create(
+        donation_request=donation_request,
+        from_status='',
+        to_status=donation_request.status,
+        actor_id=donation_request.requester_id,
+        blood_group=donation_request.blood_group_needed,
+        elapsed_seconds=0,
+        created_at=donation_request.created_at,
+    )
+
+
+def record_change(donation_request, from_status, actor=None):
+    """Log a status change made through ``donation_request.save()``"""
+    now = timezone.now()
+    return RequestStatusEvent.objects.create(
+        donation_request=donation_request,
+        from_status=from_status,
+        to_status=donation_request.status,
+        actor=actor,
+        blood_group=donation_request.blood_group_needed,
+        elapsed_seconds=max(int((now - donation_request.created_at).total_seconds()), 0),
+        created_at=now,
+    )
+
+
+def record_transitions(request_ids, from_status, to_status, actor=None):
+    """Log a status change of ``request_ids`` made by a conditional UPDATE, in one query"""
+    if not request_ids:
+        return
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    placeholders = ', '.join(['%s'] * len(request_ids))
+    with connection.cursor() as cursor:
+        # julianday() reads the stored datetimes, so the request row never
+        # has to be loaded to work out the elapsed time
+        cursor.execute(
+            f'INSERT INTO {RequestStatusEvent._meta.db_table} '
+            '(donation_request_id, from_status, to_status, actor_id, blood_group, elapsed_seconds, created_at) '
+            'SELECT id, %s, %s, %s, blood_group_needed, '
+            'MAX(CAST((julianday(%s) - julianday(created_at)) * 86400 AS INTEGER), 0), %s '
+            f'FROM {DonationRequest._meta.db_table} WHERE id IN ({placeholders})',
+            [from_status, to_status, actor.pk if actor else None, now, now, *request_ids],
+        )
+
+
+def roll_up(batch_size=BATCH_SIZE):
+    """Fold the next ``batch_size`` events into the rollups; returns how many were folded"""
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK)
+        pending = RequestStatusEvent.objects.filter(id__gt=watermark.last_event_id)
+        nth = list(pending.order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size])
+        last_id = nth[0] if nth else pending.aggregate(last=Max('id'))['last']
+        if last_id is None:
+            return 0
+
+        with connection.cursor() as cursor:
+            for model, bucket_format in ROLLUPS:
+                # One upsert per rollup: the batch is grouped into buckets and
+                # added onto the existing rows, which the unique constraint finds
+                table = model._meta.db_table
+                cursor.execute(
+                    f'INSERT INTO {table} (bucket, to_status, blood_group, count, total_seconds, max_seconds) '
+                    'SELECT strftime(%s, created_at), to_status, blood_group, '
+                    'COUNT(*), SUM(elapsed_seconds), MAX(elapsed_seconds) '
+                    f'FROM {RequestStatusEvent._meta.db_table} WHERE id > %s AND id <= %s '
+                    # GROUP BY, not WHERE, ends the SELECT, so ON CONFLICT parses as the upsert clause
+                    'GROUP BY 1, 2, 3 '
+                    'ON CONFLICT (bucket, to_status, blood_group) DO UPDATE SET '
+                    '"count" = "count" + excluded."count", '
+                    'total_seconds = total_seconds + excluded.total_seconds, '
+                    'max_seconds = MAX(max_seconds, excluded.max_seconds)',
+                    [bucket_format, watermark.last_event_id, last_id],
+                )
+            folded = pending.filter(id__lte=last_id).count()
+
+        # Conditional, so a second job that read the same watermark rolls back instead of counting twice
+        if not RollupWatermark.objects.filter(
+            name=WATERMARK, last_event_id=watermark.last_event_id,
+        ).update(last_event_id=last_id, updated_at=timezone.now()):
+            raise RuntimeError('Another roll_up() advanced the watermark first')
+    return folded
+
+
+def summary(period='day', since=None, until=None, to_status=None, blood_group=None):
+    """
+    ``[{'bucket', 'to_status', 'count', 'mean_seconds', 'max_seconds'}, ...]`` from the rollups.
+
+    Blood groups are summed together unless ``blood_group`` is given.
+    Events newer than the last roll_up() are not included.
+    """
+    queryset = PERIODS[period].objects.all()
+    if since is not None:
+        queryset = queryset.filter(bucket__gte=since)
+    if until is not None:
+        queryset = queryset.filter(bucket__lt=until)
+    if to_status:
+        queryset = queryset.filter(to_status=to_status)
+    if blood_group:
+        queryset = queryset.filter(blood_group=blood_group)
+    rows = queryset.values('bucket', 'to_status').annotate(
+        n=Sum('count'), total=Sum('total_seconds'), longest=Max('max_seconds'),
+    ).order_by('bucket', 'to_status')
+    return [
+        {
+            'bucket': row['bucket'],
+            'to_status': row['to_status'],
+            'count': row['n'],
+            'mean_seconds': row['total'] / row['n'] if row['n'] else 0,
+            'max_seconds': row['longest'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,75 @@
+"""
+Expiry of stale pending donation requests.
+
+A request still pending REQUEST_EXPIRY_DAYS after it was created is moved
+to ``expired``, so it drops out of the browse lists, the feed and donor
+matching. The work is split into chunks of CHUNK_SIZE. Each chunk finds
+its ids with a range scan on request_feed_idx (status, created_at, id)
+and expires them in one short transaction, so SQLite's write lock is
+never held for more than one chunk. Inside it the ids still pending are
+read and exactly those are updated and reported, so requests accepted or
+cancelled in the meantime are left alone. No other writer can commit
+between that read and the UPDATE: under the production profile the
+transaction takes the write lock at BEGIN, and otherwise SQLite fails
+the UPDATE with "database is locked" rather than let it overwrite a
+newer row.
+
+Expired rows leave the scanned range, so every chunk starts from the
+front of it again at the same cost, and an interrupted run simply picks
+up where it stopped.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DonationRequest
+from .signals import request_status_changed
+
+
+# Requests expired per transaction. Every request in a chunk gets the same
+# updated_at; the live poller pages through such runs by id
+CHUNK_SIZE = 500
+
+
+def expiry_cutoff(days=None, now=None):
+    """Requests created before this are stale"""
+    days = settings.REQUEST_EXPIRY_DAYS if days is None else days
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def stale_ids(cutoff, chunk_size=CHUNK_SIZE):
+    """Ids of up to ``chunk_size`` of the oldest requests still pending from before ``cutoff``"""
+    return list(
+        DonationRequest.objects.filter(status='pending', created_at__lt=cutoff)
+        .order_by('created_at', 'id').values_list('id', flat=True)[:chunk_size]
+    )
+
+
+def expire_requests(ids):
+    """Expire those of ``ids`` that are still pending; returns how many were"""
+    with transaction.atomic():
+        # Some may have been accepted or cancelled since they were read
+        expired = list(DonationRequest.objects.filter(id__in=ids, status='pending').values_list('id', 'requester_id'))
+        ids = [request_id for request_id, _ in expired]
+        if ids:
+            DonationRequest.objects.filter(id__in=ids, status='pending').update(status='expired', updated_at=timezone.now())
+            request_status_changed.send(
+                sender=DonationRequest,
+                request_ids=ids,
+                requester_ids=[requester_id for _, requester_id in expired],
+                old_status='pending',
+                new_status='expired',
+                actor=None,
+            )
+    return len(ids)
+
+
+def expire_stale_requests(cutoff, chunk_size=CHUNK_SIZE):
+    """Expire every request stale at ``cutoff``, yielding how many each chunk expired"""
+    while True:
+        ids = stale_ids(cutoff, chunk_size)
+        if not ids:
+            return
+        yield expire_requests(ids)
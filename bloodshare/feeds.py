@@ -0,0 +1,57 @@
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django.utils.dateformat import format as format_date
+
+from .cities import city_key_filter
+from .models import DonationRequest
+from .pagination import keyset_page
+
+
+# Columns rendered by a request card on the dashboard
+REQUEST_CARD_FIELDS = ('id', 'name', 'blood_group_needed', 'city', 'status', 'created_at')
+
+# Cards only show the start of ``details``; never load the full TextField
+DETAILS_PREVIEW_LENGTH = 160
+
+MAX_PAGE_SIZE = 50
+
+
+def request_cards(queryset):
+    """Limit a DonationRequest queryset to the columns a card renders"""
+    return queryset.only(*REQUEST_CARD_FIELDS).annotate(
+        details_preview=Substr('details', 1, DETAILS_PREVIEW_LENGTH + 1),
+    )
+
+
+def request_card(donation_request):
+    """JSON payload for one card, matching what dashboard.html renders"""
+    preview = donation_request.details_preview or ''
+    if len(preview) > DETAILS_PREVIEW_LENGTH:
+        preview = preview[:DETAILS_PREVIEW_LENGTH - 1] + '…'
+    return {
+        'id': donation_request.id,
+        'name': donation_request.name,
+        'blood_group_needed': donation_request.blood_group_needed,
+        'city': donation_request.city,
+        'status': donation_request.status,
+        'status_display': donation_request.get_status_display(),
+        'created_at': donation_request.created_at.isoformat(),
+        'created_display': format_date(timezone.localtime(donation_request.created_at), 'M d, Y'),
+        'details': preview,
+    }
+
+
+def browse_requests(user, status='pending', blood_group=None, city=None, cursor=None, limit=20):
+    """
+    One page of other users' requests, newest first.
+
+    Pages are keyed on ``(created_at, id)`` and served from the
+    (status, created_at, id) index, so deep pages cost the same as the
+    first one. Returns ``(requests, next_cursor)``.
+    """
+    queryset = DonationRequest.objects.filter(status=status).exclude(requester=user)
+    if blood_group:
+        queryset = queryset.filter(blood_group_needed=blood_group)
+    if city:
+        queryset = queryset.filter(**city_key_filter(city))
+    return keyset_page(request_cards(queryset), ('created_at', 'id'), cursor=cursor, limit=min(limit, MAX_PAGE_SIZE))
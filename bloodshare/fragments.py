@@ -0,0 +1,151 @@
+"""
+Versioned cache of the dashboard's request list fragments.
+
+A fragment's cache key includes the generation counters of everything it
+depends on. Writes bump the counters once their transaction commits.
+Stale entries are never found again and expire on their own, so
+invalidation is a single cache increment with no key scans or
+deletes. This works with any cache backend, including LocMemCache and
+FileBasedCache.
+
+"Your requests" depends on the user's own requests, tracked by the user
+generation. Saves and deletes bump it for the requester, and status
+transitions bump it for the requesters of the requests they moved, read
+in the transaction that moved them. "Active requests" shows every user's
+pending requests and depends on the browse generation, which any request
+write bumps.
+
+Misses render from the primary database, never a read replica.
+
+Writes that skip signals (bulk_create, queryset.update) do not bump
+anything; their effect shows once FRAGMENT_TIMEOUT passes.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+from .routers import primary
+
+
+FRAGMENT_TIMEOUT = 60 * 5
+
+# Hit/miss counts are kept per process and added to the shared totals
+# in the cache every STATS_FLUSH_EVERY lookups
+STATS_FLUSH_EVERY = 50
+
+KEY_PREFIX = 'bloodshare:fragment'
+BROWSE_GENERATION = f'{KEY_PREFIX}:gen:browse'
+STATS_NAMES = f'{KEY_PREFIX}:stats:names'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def user_generation_key(user_id):
+    return f'{KEY_PREFIX}:gen:user:{user_id}'
+
+
+def generations(*keys):
+    """Current value of each generation counter, starting missing ones afresh"""
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # A clock-based start never repeats a generation that was evicted
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def bump(*keys):
+    """Advance generation counters once the current transaction commits"""
+    def advance():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), None)
+
+    transaction.on_commit(advance)
+
+
+def bump_for_request(requester_id):
+    """A donation request of ``requester_id`` was created, saved or deleted"""
+    bump(user_generation_key(requester_id), BROWSE_GENERATION)
+
+
+def bump_for_status_change(requester_ids):
+    """Requests of ``requester_ids`` changed status without going through save()"""
+    bump(*(user_generation_key(requester_id) for requester_id in set(requester_ids)), BROWSE_GENERATION)
+
+
+def cached_fragment(name, generation_keys, render, vary_on=()):
+    """
+    The HTML of fragment ``name``, rendering it with ``render()`` on a miss.
+
+    The entry is keyed on ``vary_on`` and the current value of every
+    counter in ``generation_keys``.
+    """
+    parts = [*map(str, vary_on), *map(str, generations(*generation_keys))]
+    key = ':'.join([KEY_PREFIX, name, *parts])
+    html = cache.get(key)
+    _record(name, html is not None)
+    if html is None:
+        # A replica that hasn't caught up would be cached under the new generation
+        with primary():
+            html = render()
+        cache.set(key, str(html), FRAGMENT_TIMEOUT)
+    return mark_safe(html)
+
+
+def _stats_key(name, outcome):
+    return f'{KEY_PREFIX}:stats:{name}:{outcome}'
+
+
+def _record(name, hit):
+    with _stats_lock:
+        _stats[(name, 'hits' if hit else 'misses')] += 1
+        due = sum(_stats.values()) >= STATS_FLUSH_EVERY
+    if due:
+        flush_stats()
+
+
+def flush_stats():
+    """Add this process's hit/miss counts to the totals in the cache"""
+    with _stats_lock:
+        pending = dict(_stats)
+        _stats.clear()
+    for (name, outcome), count in pending.items():
+        key = _stats_key(name, outcome)
+        if not cache.add(key, count, None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.add(key, count, None)
+    if pending:
+        names = set(cache.get(STATS_NAMES) or ()) | {name for name, _ in pending}
+        cache.set(STATS_NAMES, sorted(names), None)
+
+
+def fragment_stats():
+    """``{name: {'hits', 'misses', 'hit_rate'}}`` across every process that has flushed"""
+    flush_stats()
+    stats = {}
+    for name in cache.get(STATS_NAMES) or ():
+        hits = cache.get(_stats_key(name, 'hits'), 0)
+        misses = cache.get(_stats_key(name, 'misses'), 0)
+        total = hits + misses
+        stats[name] = {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 4) if total else 0.0}
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+    names = cache.get(STATS_NAMES) or ()
+    cache.delete_many([_stats_key(name, outcome) for name in names for outcome in ('hits', 'misses')])
+    cache.delete(STATS_NAMES)
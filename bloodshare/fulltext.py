@@ -0,0 +1,116 @@
+"""
+Full-text search over donation requests.
+
+``name``, ``city`` and ``details`` are indexed by the FTS5 table created in
+migration 0009 and kept in sync by triggers. Queries are ranked with bm25,
+weighting a hit in the patient's name above the city and the city above
+the free-text details.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .feeds import request_cards
+from .models import DonationRequest
+
+
+FTS_TABLE = 'bloodshare_donationrequest_fts'
+
+# bm25() weights for the name, city and details columns
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+
+MAX_PAGE_SIZE = 50
+
+_TOKEN = re.compile(r'\w+')
+
+
+def fts_available():
+    """The FTS5 index only exists on SQLite"""
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(text):
+    """
+    FTS5 query for free text typed by a user, or '' if it has no words.
+
+    Every word must match. Words are quoted so FTS5 operators in the input
+    are taken literally, and the last word matches as a prefix so partial
+    input already finds results.
+    """
+    tokens = _TOKEN.findall(text or '')
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _like_q(text):
+    q = Q()
+    for token in _TOKEN.findall(text or ''):
+        q &= Q(name__icontains=token) | Q(city__icontains=token) | Q(details__icontains=token)
+    return q
+
+
+def matching_requests_q(text):
+    """
+    Predicate selecting requests that match ``text``.
+
+    On SQLite this is ``id IN (SELECT rowid FROM <fts> WHERE ... MATCH ...)``,
+    one lookup in the full-text index; elsewhere it falls back to LIKE.
+    """
+    if not fts_available():
+        return _like_q(text)
+    expression = match_expression(text)
+    if not expression:
+        return Q(pk__in=[])
+    return Q(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression]))
+
+
+def search_requests(text, status=None, blood_group=None, offset=0, limit=20):
+    """
+    Requests matching ``text``, most relevant first.
+
+    Returns ``(requests, next_offset)``; ``next_offset`` is None on the last
+    page. Requests come back as card rows (see feeds.request_cards).
+    """
+    limit = min(limit, MAX_PAGE_SIZE)
+    if not fts_available():
+        queryset = DonationRequest.objects.filter(_like_q(text))
+        if status:
+            queryset = queryset.filter(status=status)
+        if blood_group:
+            queryset = queryset.filter(blood_group_needed=blood_group)
+        rows = list(request_cards(queryset).order_by('-created_at', '-id')[offset:offset + limit + 1])
+        return rows[:limit], offset + limit if len(rows) > limit else None
+
+    expression = match_expression(text)
+    if not expression:
+        return [], None
+    filters, params = [], [expression]
+    if status:
+        filters.append('AND r.status = %s')
+        params.append(status)
+    if blood_group:
+        filters.append('AND r.blood_group_needed = %s')
+        params.append(blood_group)
+    params += [limit + 1, offset]
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    with connection.cursor() as cursor:
+        # ``rank MATCH`` sets the weights for this query; FTS5 sorts on its
+        # built-in rank column itself, faster than ORDER BY bm25(...).
+        cursor.execute(
+            f'SELECT r.id FROM {FTS_TABLE} '
+            f'JOIN {DonationRequest._meta.db_table} r ON r.id = {FTS_TABLE}.rowid '
+            f"WHERE {FTS_TABLE} MATCH %s AND rank MATCH 'bm25({weights})' {' '.join(filters)} "
+            f'ORDER BY rank, r.id DESC LIMIT %s OFFSET %s',
+            params,
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    next_offset = offset + limit if len(ids) > limit else None
+    ids = ids[:limit]
+    by_id = {request.id: request for request in request_cards(DonationRequest.objects.filter(id__in=ids))}
+    return [by_id[request_id] for request_id in ids if request_id in by_id], next_offset
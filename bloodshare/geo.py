@@ -0,0 +1,245 @@
+"""
+Proximity search on plain SQLite, without a GIS extension.
+
+Coordinates are stored alongside a geohash: a base32 string in which every
+extra character narrows the cell, so all points inside a cell share its
+prefix and a cell becomes a single ``geohash >= cell AND geohash < cell~``
+range on an ordinary B-tree index. A query covers the target with the 3x3
+block of cells around it, reads each cell as its own index range, and
+computes exact distances in Python for the few rows that come back.
+A latitude/longitude bounding box around the search circle is added to
+every query, so rows in the corners of a block are dropped in SQL, and
+searches never reach past MAX_RADIUS_KM.
+"""
+import math
+from bisect import bisect_left
+
+from django.db.models import Q
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Stored precision; 12 characters is a cell of a few centimetres
+GEOHASH_PRECISION = 12
+
+# k-NN starts at ~1.2 x 0.6 km cells and widens until it has k results
+KNN_START_PRECISION = 6
+
+# Farthest any proximity search reaches, whatever radius is asked for
+MAX_RADIUS_KM = 100
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Sorts after every base32 character, closing the range of a prefix
+_PREFIX_END = '~'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, ``precision`` characters long"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    value = bits = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value, lon_lo = value * 2 + 1, mid
+            else:
+                value, lon_hi = value * 2, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value, lat_lo = value * 2 + 1, mid
+            else:
+                value, lat_hi = value * 2, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            value = bits = 0
+    return ''.join(chars)
+
+
+def point_geohash(latitude, longitude):
+    """Stored geohash for optional coordinates; empty unless both are set"""
+    if latitude is None or longitude is None:
+        return ''
+    return encode_geohash(latitude, longitude)
+
+
+def cell_size(precision):
+    """``(height, width)`` of a geohash cell in degrees"""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def covering_cells(latitude, longitude, precision):
+    """The cell containing a point and its (up to) eight neighbours"""
+    height, width = cell_size(precision)
+    # Centre of the cell containing the point
+    mid_lat = (math.floor((latitude + 90) / height) + 0.5) * height - 90
+    mid_lon = (math.floor((longitude + 180) / width) + 0.5) * width - 180
+    cells = set()
+    for dlat in (-height, 0, height):
+        lat = mid_lat + dlat
+        if not -90 <= lat <= 90:
+            continue
+        for dlon in (-width, 0, width):
+            lon = (mid_lon + dlon + 180) % 360 - 180
+            cells.add(encode_geohash(lat, lon, precision))
+    return sorted(cells)
+
+
+def covered_radius_km(latitude, precision):
+    """
+    Radius around any point that its 3x3 block of cells is guaranteed to cover.
+
+    The point lies in the middle cell, so it is at least one cell height and
+    one cell width from the edge of the block. Widths are measured at the
+    block edge nearest the pole, where they are smallest.
+    """
+    height, width = cell_size(precision)
+    edge_lat = min(abs(latitude) + 2 * height, 90)
+    return min(height * KM_PER_DEGREE, width * KM_PER_DEGREE * math.cos(math.radians(edge_lat)))
+
+
+def precision_for_radius(latitude, radius_km):
+    """Finest precision whose 3x3 block covers ``radius_km``, or None if none does"""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if covered_radius_km(latitude, precision) >= radius_km:
+            return precision
+    return None
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Predicate on ``latitude``/``longitude`` for the smallest box around a circle.
+
+    Every point within ``radius_km`` of the centre lies inside it. The
+    longitude bound is the widest point of the circle on the sphere, and a
+    box crossing the antimeridian becomes two longitude ranges.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angle)
+    box = Q(latitude__gte=latitude - dlat, latitude__lte=latitude + dlat)
+    if abs(latitude) + dlat >= 90:
+        # The circle contains a pole, so it spans every longitude
+        return box
+    dlon = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(latitude)))))
+    west, east = longitude - dlon, longitude + dlon
+    if west < -180:
+        return box & (Q(longitude__gte=west + 360) | Q(longitude__lte=east))
+    if east > 180:
+        return box & (Q(longitude__gte=west) | Q(longitude__lte=east - 360))
+    return box & Q(longitude__gte=west, longitude__lte=east)
+
+
+def in_cells(queryset, cells):
+    """
+    Rows of ``queryset`` whose geohash lies inside any of ``cells``.
+
+    SQLite will not turn ``filters AND (range OR range ...)`` into separate
+    index seeks, so each cell is its own SELECT and the cells, which never
+    overlap, are combined with UNION ALL.
+    """
+    parts = [
+        queryset.filter(geohash__gte=cell, geohash__lt=cell + _PREFIX_END).order_by()
+        for cell in cells
+    ]
+    return parts[0].union(*parts[1:], all=True)
+
+
+def _coordinates(row):
+    if isinstance(row, dict):
+        return row['latitude'], row['longitude']
+    return row.latitude, row.longitude
+
+
+def _by_distance(rows, latitude, longitude):
+    ranked = []
+    for row in rows:
+        row_lat, row_lon = _coordinates(row)
+        ranked.append((haversine_km(latitude, longitude, row_lat, row_lon), row))
+    ranked.sort(key=lambda pair: pair[0])
+    return ranked
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """
+    Rows of ``queryset`` within ``radius_km`` of a point, nearest first.
+
+    Returns ``[(distance_km, row), ...]``. Rows must carry ``latitude``,
+    ``longitude`` and ``geohash``; values() querysets need to select the
+    coordinates.
+    """
+    queryset = queryset.filter(bounding_box(latitude, longitude, radius_km))
+    precision = precision_for_radius(latitude, radius_km)
+    if precision is None:
+        # Near the poles no block covers the radius; the box alone bounds it
+        queryset = queryset.filter(geohash__gt='')
+    else:
+        queryset = in_cells(queryset, covering_cells(latitude, longitude, precision))
+    return [pair for pair in _by_distance(queryset, latitude, longitude) if pair[0] <= radius_km]
+
+
+def _search_radius(max_radius_km):
+    return MAX_RADIUS_KM if max_radius_km is None else min(max_radius_km, MAX_RADIUS_KM)
+
+
+def nearest(queryset, latitude, longitude, k, max_radius_km=None):
+    """
+    The ``k`` rows of ``queryset`` nearest to a point, nearest first.
+
+    The search starts with small cells and moves to coarser ones until ``k``
+    rows fall inside the radius the current block is guaranteed to cover,
+    so every query reads only the neighbourhood that is actually needed.
+    It stops at the block covering ``max_radius_km``, which is capped at
+    MAX_RADIUS_KM. Returns ``[(distance_km, row), ...]``.
+    """
+    radius_km = _search_radius(max_radius_km)
+    for precision in range(KNN_START_PRECISION, 0, -1):
+        reach = covered_radius_km(latitude, precision)
+        if reach >= radius_km:
+            break
+        queryset_in_reach = queryset.filter(bounding_box(latitude, longitude, reach))
+        candidates = in_cells(queryset_in_reach, covering_cells(latitude, longitude, precision))
+        ranked = [pair for pair in _by_distance(candidates, latitude, longitude) if pair[0] <= reach]
+        if len(ranked) >= k:
+            return ranked[:k]
+    return within_radius(queryset, latitude, longitude, radius_km)[:k]
+
+
+def nearest_in(rows, hashes, latitude, longitude, k, max_radius_km=None, keep=None):
+    """
+    nearest() over rows already in memory.
+
+    ``rows`` are sorted by geohash and ``hashes`` holds their geohashes, so
+    each cell is a bisect instead of an index seek. Only rows for which
+    ``keep(row)`` is true are ranked. The caller must have loaded every row
+    inside the block that covers ``max_radius_km``.
+    """
+    radius_km = _search_radius(max_radius_km)
+    ranked = []
+    for precision in range(KNN_START_PRECISION, 0, -1):
+        reach = min(covered_radius_km(latitude, precision), radius_km)
+        candidates = []
+        for cell in covering_cells(latitude, longitude, precision):
+            start, stop = bisect_left(hashes, cell), bisect_left(hashes, cell + _PREFIX_END)
+            candidates.extend(row for row in rows[start:stop] if keep is None or keep(row))
+        ranked = [pair for pair in _by_distance(candidates, latitude, longitude) if pair[0] <= reach]
+        if len(ranked) >= k or reach >= radius_km:
+            break
+    return ranked[:k]
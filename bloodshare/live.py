@@ -0,0 +1,216 @@
+"""
+Live dashboard updates over Server-Sent Events.
+
+Each ASGI process runs a single poller, started when the first stream
+opens. It reads the donation requests changed since its last poll, which
+is one range scan on the updated_at index however many dashboards are
+open, and passes each change to every open stream that should see it.
+Creates, accepts and rejects from WSGI workers, the admin or other ASGI
+processes all show up, because they all write updated_at.
+
+Changes are read in pages ordered by (updated_at, id), each page
+continuing after the last row of the one before, so a bulk write that
+gives more than POLL_LIMIT rows the same updated_at is read in full
+rather than re-reading its first page forever.
+
+Event ids are the change's updated_at, so a reconnecting EventSource
+sends Last-Event-ID and catches up on what it missed.
+"""
+import asyncio
+import json
+import weakref
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .feeds import REQUEST_CARD_FIELDS, request_card, request_cards
+from .matching import is_compatible
+from .models import DonationRequest
+from .routers import PRIMARY
+
+
+# Seconds between polls of the requests table
+POLL_INTERVAL = 1.0
+
+# Seconds of silence after which a comment is sent to keep proxies from closing the stream
+KEEPALIVE_INTERVAL = 15.0
+
+# Streams are closed after this many seconds; the browser reconnects with Last-Event-ID
+STREAM_DURATION = 300.0
+
+# Changes are re-read this far back, since a transaction can commit after a
+# later one with an older updated_at
+COMMIT_LAG = timedelta(seconds=2)
+
+# Changes read per query; a busier poll reads as many pages as it needs
+POLL_LIMIT = 500
+
+# Changes a slow stream may have queued before it is closed and must catch up
+QUEUE_SIZE = 100
+
+CHANGE_FIELDS = (*REQUEST_CARD_FIELDS, 'requester_id', 'city_key', 'updated_at')
+
+
+async def changes_since(since, after_id=None, limit=POLL_LIMIT):
+    """
+    One page of requests changed after ``since``, oldest change first.
+
+    With ``after_id`` the page continues after the row ``(since, after_id)``
+    instead, so rows sharing that updated_at with a higher id are included.
+    """
+    # Not a replica: a change it hasn't caught up on would be polled past and never sent
+    queryset = DonationRequest.objects.using(PRIMARY)
+    if after_id is None:
+        queryset = queryset.filter(updated_at__gt=since)
+    else:
+        # The inclusive bound keeps this a range scan on the updated_at index
+        queryset = queryset.filter(
+            Q(updated_at__gte=since) & (Q(updated_at__gt=since) | Q(updated_at=since, id__gt=after_id))
+        )
+    queryset = request_cards(queryset).only(*CHANGE_FIELDS)
+    return [change async for change in queryset.order_by('updated_at', 'id')[:limit]]
+
+
+async def all_changes_since(since):
+    """Yield every request changed after ``since``, oldest change first, one page at a time"""
+    after_id = None
+    while True:
+        changes = await changes_since(since, after_id, POLL_LIMIT)
+        for change in changes:
+            yield change
+        if len(changes) < POLL_LIMIT:
+            return
+        since, after_id = changes[-1].updated_at, changes[-1].id
+
+
+def parse_event_id(value):
+    """The datetime in a Last-Event-ID header, or None if it is not one of ours"""
+    try:
+        parsed = datetime.fromisoformat(value or '')
+    except ValueError:
+        return None
+    return parsed if timezone.is_aware(parsed) else None
+
+
+class Subscription:
+    """What one open stream wants to hear about, and its queue of matching changes"""
+
+    def __init__(self, user_id, blood_group='', city_key=''):
+        self.user_id = user_id
+        self.blood_group = blood_group
+        self.city_key = city_key
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, change):
+        """
+        The user's own requests, plus others' requests they could donate to.
+
+        Without a blood group or city on the profile that part of the filter
+        is dropped, like the unfiltered browse list on the dashboard.
+        """
+        if change.requester_id == self.user_id:
+            return True
+        if self.blood_group and not is_compatible(self.blood_group, change.blood_group_needed):
+            return False
+        return not self.city_key or change.city_key == self.city_key
+
+    def event(self, change):
+        """The SSE message for ``change``"""
+        payload = request_card(change)
+        payload['own'] = change.requester_id == self.user_id
+        return f'id: {change.updated_at.isoformat()}\nevent: request\ndata: {json.dumps(payload)}\n\n'
+
+    def offer(self, change):
+        if self.overflowed or not self.wants(change):
+            return
+        try:
+            self.queue.put_nowait(self.event(change))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class ChangeHub:
+    """Polls for request changes on behalf of every stream in one event loop"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.since = timezone.now()
+        self.seen = {}
+        self.task = None
+
+    def subscribe(self, subscription):
+        if not self.subscribers:
+            self.since = timezone.now()
+        self.subscribers.add(subscription)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            await self.poll()
+
+    async def poll(self):
+        """Read changes since the last poll and hand them to the subscribers"""
+        read = 0
+        async for change in all_changes_since(self.since - COMMIT_LAG):
+            read += 1
+            self.since = max(self.since, change.updated_at)
+            key = (change.id, change.updated_at)
+            if key in self.seen:
+                continue
+            self.seen[key] = change.updated_at
+            for subscription in list(self.subscribers):
+                subscription.offer(change)
+        cutoff = self.since - COMMIT_LAG
+        self.seen = {key: updated_at for key, updated_at in self.seen.items() if updated_at > cutoff}
+        return read
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The ChangeHub of the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = ChangeHub()
+    return _hubs[loop]
+
+
+async def event_stream(subscription, last_event_id=None):
+    """
+    Yield SSE messages for ``subscription`` until STREAM_DURATION passes.
+
+    Changes after ``last_event_id`` are replayed first. The stream also
+    ends early if the client falls QUEUE_SIZE changes behind; it then
+    reconnects and catches up from its last event id.
+    """
+    hub = get_hub()
+    hub.subscribe(subscription)
+    try:
+        yield f'retry: {int(POLL_INTERVAL * 1000) * 3}\n\n'
+        if last_event_id is not None:
+            async for change in all_changes_since(last_event_id):
+                if subscription.wants(change):
+                    yield subscription.event(change)
+
+        deadline = asyncio.get_running_loop().time() + STREAM_DURATION
+        while not subscription.overflowed:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), min(KEEPALIVE_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from bloodshare.expiry import CHUNK_SIZE, expire_stale_requests, expiry_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move donation requests that have been pending too long to expired, a chunk at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help=f'Expire requests pending this many days (default: REQUEST_EXPIRY_DAYS, '
+                                 f'{settings.REQUEST_EXPIRY_DAYS})')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Requests expired per transaction')
+        parser.add_argument('--pause', type=float, default=0.01,
+                            help='Seconds to sleep between chunks so other writers get the lock')
+        parser.add_argument('--interval', type=float, help='Keep running, sleeping this many seconds between passes')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days must not be negative')
+
+        try:
+            while True:
+                self.expire(options)
+                if options['interval'] is None:
+                    break
+                # Don't hold a database connection while idle
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def expire(self, options):
+        cutoff = expiry_cutoff(options['days'])
+        total = chunks = 0
+        started = time.perf_counter()
+        for expired in expire_stale_requests(cutoff, options['chunk_size']):
+            total += expired
+            chunks += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'chunk {chunks}: {expired} expired')
+            if options['pause']:
+                time.sleep(options['pause'])
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{total:,} requests created before {cutoff:%Y-%m-%d %H:%M} expired in {chunks:,} chunks, '
+            f'{elapsed:.2f}s ({rate:,.0f} rows/s).'
+        ))
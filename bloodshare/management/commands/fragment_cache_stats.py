@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from bloodshare.fragments import fragment_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit rates of the cached dashboard fragments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        stats = fragment_stats()
+        if not stats:
+            self.stdout.write('No fragment lookups recorded yet.')
+        for name, counts in sorted(stats.items()):
+            self.stdout.write(
+                f"{name}: {counts['hit_rate']:.1%} hit rate ({counts['hits']:,} hits, {counts['misses']:,} misses)"
+            )
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,52 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from bloodshare.synthetic import generate, synthetic_email
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, profiles and donation requests for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000, help='Number of users (each gets a profile)')
+        parser.add_argument('--requests', type=int, default=None, help='Number of donation requests (default: users / 5)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create transaction')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes building batches')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; same seed and batch size give the same data')
+        parser.add_argument('--password', default='SamplePass123!', help='Password shared by every generated user')
+
+    def handle(self, *args, **options):
+        users = options['users']
+        requests = options['requests'] if options['requests'] is not None else users // 5
+        if users <= 0 or requests < 0 or options['batch_size'] <= 0 or options['workers'] <= 0:
+            raise CommandError('--users, --batch-size and --workers must be positive and --requests non-negative')
+        if User.objects.filter(username=synthetic_email(0)).exists():
+            raise CommandError(f'Synthetic users already exist ({synthetic_email(0)}); use a fresh database')
+
+        started = time.perf_counter()
+
+        def progress(users_done, requests_done):
+            self.stdout.write(f'  {users_done:,} users, {requests_done:,} requests', ending='\r')
+            self.stdout.flush()
+
+        # Hash once; every generated user shares the same valid hash
+        users_done, requests_done = generate(
+            users,
+            requests,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            password_hash=make_password(options['password']),
+            progress=progress if options['verbosity'] > 0 else None,
+        )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {users_done:,} users and {requests_done:,} requests in {elapsed:.1f}s '
+            f'({(users_done + requests_done) / elapsed:,.0f} rows/s).'
+        ))
+        self.stdout.write(f"Log in as {synthetic_email(0)} with password {options['password']!r}.")
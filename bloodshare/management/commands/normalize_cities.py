@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bloodshare import supply
+from bloodshare.cities import backfill_city_keys
+from bloodshare.models import DonationRequest, Profile
+
+
+class Command(BaseCommand):
+    help = 'Resolve free-text cities to canonical cities and fill in city_key, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per UPDATE transaction')
+        parser.add_argument('--all', action='store_true', help='Recompute keys for rows that already have one')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        total = 0
+        for model in (Profile, DonationRequest):
+            label = model._meta.verbose_name_plural
+
+            def progress(last_id, changed):
+                self.stdout.write(f'  {label}: up to id {last_id:,}, {changed:,} updated', ending='\r')
+                self.stdout.flush()
+
+            changed = backfill_city_keys(
+                model,
+                batch_size=options['batch_size'],
+                recompute=options['all'],
+                progress=progress if options['verbosity'] > 1 else None,
+            )
+            self.stdout.write(f'{label}: {changed:,} rows updated')
+            total += changed
+        if total:
+            # The keys were updated without signals, so the cells still count the old ones
+            drift = supply.rebuild()
+            self.stdout.write(f'Supply/demand cells recounted, {len(drift):,} corrected.')
+        self.stdout.write(self.style.SUCCESS('Cities normalized.'))
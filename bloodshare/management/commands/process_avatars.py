@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from bloodshare.avatars import process_avatar, variant_files
+from bloodshare.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Validate and thumbnail avatars that have not been processed yet, in this process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reprocess avatars that already have thumbnails')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['all']:
+            profiles = profiles.exclude(avatar_status='ready')
+
+        outcomes = {'ready': 0, 'failed': 0, None: 0}
+        for profile_id, variants in profiles.order_by('id').values_list('id', 'avatar_variants').iterator():
+            # Reprocessing replaces the thumbnails, so the old ones go
+            outcomes[process_avatar(profile_id, variant_files(variants))] += 1
+        self.stdout.write(f"{outcomes['ready']:,} processed, {outcomes['failed']:,} rejected, {outcomes[None]:,} skipped")
+        self.stdout.write(self.style.SUCCESS('Avatars processed.'))
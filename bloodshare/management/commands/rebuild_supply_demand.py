@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bloodshare import supply
+
+
+class Command(BaseCommand):
+    help = 'Recount the supply/demand cells from scratch and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep running, sleeping this many seconds between rebuilds')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.rebuild(options)
+                if options['interval'] is None:
+                    break
+                # Don't hold a database connection while idle
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def rebuild(self, options):
+        started = time.perf_counter()
+        drift = supply.rebuild()
+        elapsed = time.perf_counter() - started
+        for (city_key, blood_group), delta in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(
+                f"{city_key or '-'} {blood_group}: donors {delta[supply.DONORS]:+d}, "
+                f"requests {delta[supply.REQUESTS]:+d}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Supply/demand cells rebuilt in {elapsed:.2f}s, {len(drift):,} corrected.'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from bloodshare import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the landing page counters from scratch and fix any drift'
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile()
+        for name, delta in sorted(drift.items()):
+            if delta:
+                self.stdout.write(self.style.WARNING(f'{name}: corrected by {delta:+d}'))
+            else:
+                self.stdout.write(f'{name}: ok')
+        self.stdout.write(self.style.SUCCESS('Counters reconciled.'))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from bloodshare.events import BATCH_SIZE, roll_up
+
+
+class Command(BaseCommand):
+    help = 'Fold new request status events into the hourly and daily rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Events folded per transaction')
+        parser.add_argument('--interval', type=float, help='Keep running, sleeping this many seconds between passes')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        try:
+            while True:
+                self.roll_up(options)
+                if options['interval'] is None:
+                    break
+                # Don't hold a database connection while idle
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def roll_up(self, options):
+        total = batches = 0
+        started = time.perf_counter()
+        while folded := roll_up(options['batch_size']):
+            total += folded
+            batches += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'batch {batches}: {folded} events')
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{total:,} status events rolled up in {batches:,} batches, {elapsed:.2f}s ({rate:,.0f} events/s).'
+        ))
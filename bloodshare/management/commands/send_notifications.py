@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from bloodshare.notifications import BATCH_SIZE, drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Worker that emails compatible donors about new donation requests from the notification outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the outbox and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Donors per query and email batch')
+        parser.add_argument('--entries', type=int, default=10, help='Outbox entries to process, one at a time, per round')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0 or options['entries'] <= 0:
+            raise CommandError('--batch-size and --entries must be positive')
+
+        total_entries = total_emails = 0
+        try:
+            while True:
+                entries, emails = drain_outbox(options['entries'], options['batch_size'])
+                total_entries += entries
+                total_emails += emails
+                if entries and options['verbosity'] > 1:
+                    self.stdout.write(f'{entries} requests, {emails:,} emails')
+                if not entries:
+                    if options['once']:
+                        break
+                    # Don't hold a database connection while idle
+                    close_old_connections()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'{total_entries:,} requests fanned out, {total_emails:,} emails sent.'))
@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from bloodshare.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into every read replica with the online backup API. '
+        'A stand-in for real replication when trying replicas locally.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep copying, sleeping this many seconds in between')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured; set BLOODSHARE_REPLICA_PATHS.')
+        for alias in (PRIMARY, *settings.DATABASE_REPLICAS):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias} is not an SQLite database.')
+
+        once = options['interval'] is None
+        try:
+            while True:
+                started = time.perf_counter()
+                self.sync()
+                # Looping, only report each copy at -v 2
+                if options['verbosity'] > (0 if once else 1):
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Copied {PRIMARY} to {', '.join(settings.DATABASE_REPLICAS)} "
+                        f'in {time.perf_counter() - started:.2f}s.'
+                    ))
+                if once:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def sync(self):
+        source = sqlite3.connect(connections[PRIMARY].settings_dict['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                # Drop this process's own connection so it doesn't see a half-written copy
+                connections[alias].close()
+                target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
@@ -0,0 +1,257 @@
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .geo import covering_cells, in_cells, nearest, nearest_in, precision_for_radius
+from .models import BLOOD_GROUP_CHOICES, DonationRequest, Profile
+
+
+BLOOD_GROUPS = [code for code, _ in BLOOD_GROUP_CHOICES]
+
+# One bit per code in BLOOD_GROUP_CHOICES
+BLOOD_GROUP_BITS = {code: 1 << index for index, code in enumerate(BLOOD_GROUPS)}
+
+# Minimum gap between two whole-blood donations
+DONATION_INTERVAL = timedelta(days=56)
+
+# Farthest a donor can be and still be matched on distance
+MATCH_RADIUS_KM = 50
+
+# SQLite's default limit on bound parameters is 999; stay well below it
+CITY_CHUNK_SIZE = 500
+
+# Geohash cells per UNION ALL query; each cell binds a dozen parameters
+GEO_CELL_CHUNK_SIZE = 50
+
+
+def _can_receive(recipient, donor):
+    """ABO/Rh red-cell compatibility rule for a single pair of codes"""
+    recipient_abo, recipient_rh = recipient[:-1], recipient[-1]
+    donor_abo, donor_rh = donor[:-1], donor[-1]
+    abo_ok = donor_abo == 'O' or donor_abo == recipient_abo or recipient_abo == 'AB'
+    rh_ok = donor_rh == '-' or recipient_rh == '+'
+    return abo_ok and rh_ok
+
+
+# For each recipient code, a bitmask of every donor code it can receive from
+DONOR_MASKS = {
+    recipient: sum(BLOOD_GROUP_BITS[donor] for donor in BLOOD_GROUPS if _can_receive(recipient, donor))
+    for recipient in BLOOD_GROUPS
+}
+
+
+def groups_in_mask(mask):
+    """Expand a bitmask back into blood group codes, in BLOOD_GROUP_CHOICES order"""
+    return [code for code in BLOOD_GROUPS if mask & BLOOD_GROUP_BITS[code]]
+
+
+def compatible_donor_groups(recipient):
+    """Blood groups that can donate to ``recipient``"""
+    return groups_in_mask(DONOR_MASKS.get(recipient, 0))
+
+
+def is_compatible(donor, recipient):
+    """Whether a donor of group ``donor`` can give to ``recipient``"""
+    return bool(DONOR_MASKS.get(recipient, 0) & BLOOD_GROUP_BITS.get(donor, 0))
+
+
+def eligible_q(today=None):
+    """Predicate for donors whose last donation is far enough in the past"""
+    cutoff = (today or timezone.localdate()) - DONATION_INTERVAL
+    return Q(last_donation_date__isnull=True) | Q(last_donation_date__lte=cutoff)
+
+
+def can_donate_q(today=None):
+    """
+    Predicate for donors who are available and eligible.
+
+    ``is_available=True`` compiles to the bare ``WHERE is_available`` that
+    is profile_eligible_idx's condition, so SQLite can use that partial
+    index. It holds only available donors and carries last_donation_date,
+    so ineligible donors are skipped without reading their rows.
+    """
+    return Q(is_available=True) & eligible_q(today)
+
+
+def compatible_donors(donation_request, limit=20, fields=None):
+    """
+    Available, eligible donors who can give to ``donation_request``, best match first.
+
+    Donors in the request's canonical city come first, exact blood group
+    before the other compatible ones, like match_pending_requests(). Each
+    compatible group contributes its newest ``limit`` donors there, read
+    in id order from one profile_eligible_idx range, so only those few
+    rows are sorted. Only if the city has fewer than ``limit`` is the
+    list filled with the newest compatible donors elsewhere. Returns
+    profiles, or values() rows when ``fields`` is given.
+    """
+    groups = compatible_donor_groups(donation_request.blood_group_needed)
+    donors = Profile.objects.filter(can_donate_q()).exclude(user_id=donation_request.requester_id)
+    if fields:
+        donors = donors.values(*fields)
+
+    ranked = []
+    if donation_request.city_key:
+        in_city = [
+            donors.filter(blood_group=group, city_key=donation_request.city_key).order_by('-id').values('id')[:limit]
+            for group in groups
+        ]
+        ranked = list(donors.filter(reduce(or_, [Q(id__in=newest) for newest in in_city])).alias(
+            exact_match=Case(
+                When(blood_group=donation_request.blood_group_needed, then=Value(1)),
+                default=Value(0), output_field=IntegerField(),
+            ),
+        ).order_by('-exact_match', '-id')[:limit])
+        donors = donors.exclude(city_key=donation_request.city_key)
+    if len(ranked) < limit:
+        ranked.extend(donors.filter(blood_group__in=groups).order_by('-id')[:limit - len(ranked)])
+    return ranked
+
+
+def nearest_compatible_donors(donation_request, limit=20, max_radius_km=MATCH_RADIUS_KM, fields=None):
+    """
+    Eligible, available donors closest to a request that has coordinates.
+
+    Returns ``[(distance_km, profile), ...]`` nearest first, or values()
+    rows when ``fields`` is given. Requests without coordinates get ``[]``.
+    """
+    if not donation_request.geohash:
+        return []
+    queryset = Profile.objects.filter(
+        eligible_q(),
+        blood_group__in=compatible_donor_groups(donation_request.blood_group_needed),
+        is_available__in=[True],
+    ).exclude(user_id=donation_request.requester_id)
+    if fields:
+        queryset = queryset.values(*fields, 'latitude', 'longitude')
+    return nearest(queryset, donation_request.latitude, donation_request.longitude, limit, max_radius_km=max_radius_km)
+
+
+def match_pending_requests(requests=None, per_request=10):
+    """
+    Match many donation requests against same-city donors in a single pass.
+
+    Instead of one query per request, every available, eligible donor whose
+    city and blood group could serve any of the requests is loaded once,
+    bucketed by (city key, blood group), and each request draws its
+    candidates from its own buckets. Requests with coordinates put their
+    nearest donors first: the geohash blocks covering MATCH_RADIUS_KM
+    around them are read once, shared by every request in the same cell,
+    and each request ranks its neighbours in memory.
+    Returns ``{request_id: [profile, ...]}``, best match first.
+    """
+    if requests is None:
+        requests = DonationRequest.objects.filter(status='pending').only(
+            'id', 'requester_id', 'blood_group_needed', 'city_key', 'latitude', 'longitude', 'geohash',
+        )
+    requests = list(requests)
+    if not requests:
+        return {}
+
+    needed_mask = 0
+    cities = set()
+    for donation_request in requests:
+        needed_mask |= DONOR_MASKS.get(donation_request.blood_group_needed, 0)
+        if donation_request.city_key:
+            cities.add(donation_request.city_key)
+
+    buckets = defaultdict(list)
+    cities = sorted(cities)
+    for start in range(0, len(cities), CITY_CHUNK_SIZE):
+        donors = Profile.objects.filter(
+            can_donate_q(),
+            blood_group__in=groups_in_mask(needed_mask),
+            city_key__in=cities[start:start + CITY_CHUNK_SIZE],
+        ).only('id', 'user_id', 'blood_group', 'city_key')
+        for profile in donors:
+            buckets[(profile.city_key, profile.blood_group)].append(profile)
+
+    # Newest first within each bucket
+    for bucket in buckets.values():
+        bucket.sort(key=lambda profile: profile.id, reverse=True)
+
+    located = _located_donors(requests)
+    # Located donors each recipient group can take, sorted by geohash
+    nearby = {}
+
+    def ranked_candidates(city, exact):
+        others = []
+        for group in compatible_donor_groups(exact):
+            if group != exact:
+                others.extend(buckets.get((city, group), ()))
+        others.sort(key=lambda profile: profile.id, reverse=True)
+        return buckets.get((city, exact), []) + others
+
+    # Requests for the same (city, blood group) share one ranked candidate list
+    ranked = {}
+    matches = {}
+    for donation_request in requests:
+        key = (donation_request.city_key, donation_request.blood_group_needed)
+        if key not in ranked:
+            ranked[key] = ranked_candidates(*key)
+
+        chosen = []
+        if _match_precision(donation_request) is not None:
+            group = donation_request.blood_group_needed
+            if group not in nearby:
+                compatible = DONOR_MASKS.get(group, 0)
+                rows = [profile for profile in located if BLOOD_GROUP_BITS[profile.blood_group] & compatible]
+                nearby[group] = rows, [profile.geohash for profile in rows]
+            requester_id = donation_request.requester_id
+            chosen = [profile for _, profile in nearest_in(
+                *nearby[group], donation_request.latitude, donation_request.longitude, per_request,
+                max_radius_km=MATCH_RADIUS_KM, keep=lambda profile: profile.user_id != requester_id,
+            )]
+        seen = {profile.id for profile in chosen}
+        for profile in ranked[key]:
+            if len(chosen) == per_request:
+                break
+            if profile.user_id == donation_request.requester_id or profile.id in seen:
+                continue
+            chosen.append(profile)
+        matches[donation_request.id] = chosen
+    return matches
+
+
+def _match_precision(donation_request):
+    """Geohash precision whose block covers MATCH_RADIUS_KM around a request, or None without one"""
+    if not donation_request.geohash:
+        return None
+    return precision_for_radius(donation_request.latitude, MATCH_RADIUS_KM)
+
+
+def _located_donors(requests):
+    """
+    Available, eligible donors near any of ``requests``, sorted by geohash.
+
+    Every located request is bucketed into its geohash cell at the precision
+    whose 3x3 block covers MATCH_RADIUS_KM, and the union of those blocks is
+    read in a few UNION ALL queries.
+    """
+    needed_mask = 0
+    cells = set()
+    for donation_request in requests:
+        precision = _match_precision(donation_request)
+        if precision is None:
+            continue
+        needed_mask |= DONOR_MASKS.get(donation_request.blood_group_needed, 0)
+        cells.update(covering_cells(donation_request.latitude, donation_request.longitude, precision))
+
+    donors = Profile.objects.filter(can_donate_q(), blood_group__in=groups_in_mask(needed_mask)).only(
+        'id', 'user_id', 'blood_group', 'city_key', 'latitude', 'longitude', 'geohash',
+    )
+    # Blocks at different latitudes can use different precisions; a cell
+    # sorts right before the finer cells inside it, which are dropped
+    disjoint = []
+    for cell in sorted(cells):
+        if not disjoint or not cell.startswith(disjoint[-1]):
+            disjoint.append(cell)
+    located = []
+    for start in range(0, len(disjoint), GEO_CELL_CHUNK_SIZE):
+        located.extend(in_cells(donors, disjoint[start:start + GEO_CELL_CHUNK_SIZE]))
+    located.sort(key=lambda profile: profile.geohash)
+    return located
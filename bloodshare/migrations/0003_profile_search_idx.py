@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0002_donationrequest_accepted_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['blood_group', 'is_available', 'city'], name='profile_search_idx'),
+        ),
+    ]
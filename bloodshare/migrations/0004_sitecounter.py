@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    Profile = apps.get_model('bloodshare', 'Profile')
+    DonationRequest = apps.get_model('bloodshare', 'DonationRequest')
+    SiteCounter = apps.get_model('bloodshare', 'SiteCounter')
+    SiteCounter.objects.bulk_create([
+        SiteCounter(name='total_donors', value=Profile.objects.filter(is_available=True).count()),
+        SiteCounter(name='lives_saved', value=DonationRequest.objects.filter(status__in=['accepted', 'fulfilled']).count()),
+        SiteCounter(name='active_requests', value=DonationRequest.objects.filter(status='pending').count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0003_profile_search_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0004_sitecounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='request_feed_idx'),
+        ),
+    ]
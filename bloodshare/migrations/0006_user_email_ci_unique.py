@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+# Duplicate groups listed in the error; the rest are only counted
+MAX_LISTED = 20
+
+
+def check_case_insensitive_duplicates(apps, schema_editor):
+    """
+    Fail with the offending accounts if emails differ only by case.
+
+    CREATE UNIQUE INDEX would abort on them with a bare "UNIQUE constraint
+    failed". Which account to keep is for an administrator to decide, so
+    nothing is changed here.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    duplicates = list(
+        User._default_manager.filter(email__gt='')
+        .values(folded=Lower('email'))
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+        .order_by('folded')
+        .values_list('folded', flat=True)
+    )
+    if not duplicates:
+        return
+    lines = []
+    for folded in duplicates[:MAX_LISTED]:
+        accounts = User._default_manager.annotate(folded=Lower('email')).filter(folded=folded).order_by('id')
+        lines.append(', '.join(f'{user.email} (id {user.id})' for user in accounts))
+    if len(duplicates) > MAX_LISTED:
+        lines.append(f'... and {len(duplicates) - MAX_LISTED} more')
+    raise RuntimeError(
+        f'Accounts share an email address once case is ignored ({len(duplicates)} groups). '
+        'Change or clear the email of all but one account in each group, then migrate again:\n  '
+        + '\n  '.join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bloodshare', '0005_request_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_insensitive_duplicates, migrations.RunPython.noop),
+        # Case-insensitive unique index on auth_user.email, used by
+        # bloodshare.backends.EmailBackend. Blank emails (e.g. superusers
+        # created without one) are left out of the index.
+        migrations.RunSQL(
+            sql="CREATE UNIQUE INDEX bloodshare_user_email_ci_uniq ON auth_user (LOWER(email)) WHERE email > ''",
+            reverse_sql='DROP INDEX bloodshare_user_email_ci_uniq',
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0006_user_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donationrequest',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, help_text='Derived from the coordinates', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='donationrequest',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='donationrequest',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, help_text='Derived from the coordinates', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['status', 'geohash'], name='request_geo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['blood_group', 'is_available', 'geohash'], name='profile_geo_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0007_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('trigram_count', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'cities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CityAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'city aliases',
+            },
+        ),
+        migrations.CreateModel(
+            name='CityTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_search_idx',
+        ),
+        migrations.AddField(
+            model_name='donationrequest',
+            name='city_key',
+            field=models.CharField(blank=True, editable=False, help_text='Key of the canonical City', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='city_key',
+            field=models.CharField(blank=True, editable=False, help_text='Key of the canonical City', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['status', 'city_key', 'created_at', 'id'], name='request_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['blood_group', 'is_available', 'city_key'], name='profile_city_idx'),
+        ),
+        migrations.AddField(
+            model_name='citytrigram',
+            name='city',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='bloodshare.city'),
+        ),
+        migrations.AddField(
+            model_name='cityalias',
+            name='city',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='bloodshare.city'),
+        ),
+        migrations.AddConstraint(
+            model_name='citytrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'city'), name='city_trigram_uniq'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+# External-content FTS5 index over the searchable DonationRequest columns.
+# The table stores only the index; the text stays in bloodshare_donationrequest.
+# Triggers keep it in step with every write, including bulk_create() and
+# queryset.update(), and the UPDATE trigger only fires when an indexed
+# column changes, so status transitions never touch it. Prefix indexes on
+# 2 and 3 characters keep type-ahead queries ("hyd*") off a full term scan.
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE bloodshare_donationrequest_fts USING fts5(
+        name, city, details,
+        content='bloodshare_donationrequest',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER bloodshare_donationrequest_fts_insert AFTER INSERT ON bloodshare_donationrequest BEGIN
+        INSERT INTO bloodshare_donationrequest_fts (rowid, name, city, details)
+        VALUES (new.id, new.name, new.city, new.details);
+    END
+    """,
+    """
+    CREATE TRIGGER bloodshare_donationrequest_fts_delete AFTER DELETE ON bloodshare_donationrequest BEGIN
+        INSERT INTO bloodshare_donationrequest_fts (bloodshare_donationrequest_fts, rowid, name, city, details)
+        VALUES ('delete', old.id, old.name, old.city, old.details);
+    END
+    """,
+    """
+    CREATE TRIGGER bloodshare_donationrequest_fts_update AFTER UPDATE OF name, city, details ON bloodshare_donationrequest BEGIN
+        INSERT INTO bloodshare_donationrequest_fts (bloodshare_donationrequest_fts, rowid, name, city, details)
+        VALUES ('delete', old.id, old.name, old.city, old.details);
+        INSERT INTO bloodshare_donationrequest_fts (rowid, name, city, details)
+        VALUES (new.id, new.name, new.city, new.details);
+    END
+    """,
+    # Index the rows that already exist
+    "INSERT INTO bloodshare_donationrequest_fts (bloodshare_donationrequest_fts) VALUES ('rebuild')",
+]
+
+REVERSE_SQL = [
+    'DROP TRIGGER bloodshare_donationrequest_fts_update',
+    'DROP TRIGGER bloodshare_donationrequest_fts_delete',
+    'DROP TRIGGER bloodshare_donationrequest_fts_insert',
+    'DROP TABLE bloodshare_donationrequest_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0008_cities'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=FTS_SQL, reverse_sql=REVERSE_SQL),
+    ]
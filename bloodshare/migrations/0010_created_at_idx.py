@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0009_request_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['created_at'], name='request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['created_at'], name='profile_created_idx'),
+        ),
+    ]
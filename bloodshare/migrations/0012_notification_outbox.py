@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bloodshare', '0011_profile_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('request_created', 'Request created')], default='request_created', max_length=20)),
+                ('cursor', models.JSONField(blank=True, default=dict, help_text='Last donor profile id handled, per blood group')),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('locked_until', models.DateTimeField(blank=True, help_text='Lease held by the worker processing this entry', null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('donation_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_entries', to='bloodshare.donationrequest')),
+            ],
+            options={
+                'verbose_name_plural': 'notification outbox',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='outbox_pending_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DonorNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('donation_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='bloodshare.donationrequest')),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='donation_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['donor', 'created_at'], name='notification_rate_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='donornotification',
+            constraint=models.UniqueConstraint(fields=('donation_request', 'donor'), name='notification_once_per_donor'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0012_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donationrequest',
+            index=models.Index(fields=['updated_at'], name='request_updated_idx'),
+        ),
+    ]
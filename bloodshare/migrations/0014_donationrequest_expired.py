@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0013_request_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='donationrequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('fulfilled', 'Fulfilled'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+    ]
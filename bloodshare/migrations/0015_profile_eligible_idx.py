@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0014_donationrequest_expired'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['blood_group', 'city_key', 'id', 'last_donation_date'], name='profile_eligible_idx'),
+        ),
+    ]
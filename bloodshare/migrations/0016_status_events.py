@@ -0,0 +1,74 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bloodshare', '0015_profile_eligible_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket, UTC')),
+                ('to_status', models.CharField(max_length=20)),
+                ('blood_group', models.CharField(max_length=3)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.BigIntegerField(default=0, help_text="Sum of the events' time since request creation")),
+                ('max_seconds', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HourlyStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket, UTC')),
+                ('to_status', models.CharField(max_length=20)),
+                ('blood_group', models.CharField(max_length=3)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.BigIntegerField(default=0, help_text="Sum of the events' time since request creation")),
+                ('max_seconds', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RequestStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, help_text='Empty when the request was created', max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('blood_group', models.CharField(max_length=3)),
+                ('elapsed_seconds', models.PositiveIntegerField(help_text='Time since the request was created')),
+                ('created_at', models.DateTimeField()),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('donation_request', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_events', to='bloodshare.donationrequest')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='hourlystatusrollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'to_status', 'blood_group'), name='hourly_rollup_bucket_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystatusrollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'to_status', 'blood_group'), name='daily_rollup_bucket_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='requeststatusevent',
+            index=models.Index(fields=['donation_request', 'id'], name='status_event_request_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:09
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_cells(apps, schema_editor):
+    Profile = apps.get_model('bloodshare', 'Profile')
+    DonationRequest = apps.get_model('bloodshare', 'DonationRequest')
+    SupplyDemandCell = apps.get_model('bloodshare', 'SupplyDemandCell')
+    donors = Counter(dict(
+        ((city_key, blood_group), n) for city_key, blood_group, n in
+        Profile.objects.filter(is_available=True).values_list('city_key', 'blood_group')
+        .annotate(n=Count('id')).order_by()
+    ))
+    requests = Counter(dict(
+        ((city_key, blood_group), n) for city_key, blood_group, n in
+        DonationRequest.objects.filter(status='pending').values_list('city_key', 'blood_group_needed')
+        .annotate(n=Count('id')).order_by()
+    ))
+    SupplyDemandCell.objects.bulk_create([
+        SupplyDemandCell(city_key=city_key, blood_group=blood_group,
+                         available_donors=donors[city_key, blood_group],
+                         pending_requests=requests[city_key, blood_group])
+        for city_key, blood_group in donors.keys() | requests.keys()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0016_status_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplyDemandCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_key', models.CharField(blank=True, max_length=100)),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3)),
+                ('available_donors', models.IntegerField(default=0)),
+                ('pending_requests', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='supplydemandcell',
+            constraint=models.UniqueConstraint(fields=('city_key', 'blood_group'), name='supply_demand_cell_uniq'),
+        ),
+        migrations.RunPython(seed_cells, migrations.RunPython.noop),
+    ]
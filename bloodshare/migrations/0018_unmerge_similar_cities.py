@@ -0,0 +1,108 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import migrations
+from django.db.models import Count
+
+
+# Frozen copies of bloodshare.cities as of this migration, so later changes
+# there don't change what it does
+KNOWN_ALIAS_KEYS = {
+    'new delhi', 'bombay', 'bangalore', 'madras', 'calcutta',
+    'poona', 'allahabad', 'gurgaon', 'baroda', 'benares',
+}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_city_key(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub(' ', text.casefold()).strip()
+
+
+def trigrams(key):
+    grams = set()
+    for word in key.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def recount_cells(apps):
+    """Replace the supply/demand cells with counts by the new keys, like 0017's seed_cells()"""
+    Profile = apps.get_model('bloodshare', 'Profile')
+    DonationRequest = apps.get_model('bloodshare', 'DonationRequest')
+    SupplyDemandCell = apps.get_model('bloodshare', 'SupplyDemandCell')
+    donors = Counter(dict(
+        ((city_key, blood_group), n) for city_key, blood_group, n in
+        Profile.objects.filter(is_available=True).values_list('city_key', 'blood_group')
+        .annotate(n=Count('id')).order_by()
+    ))
+    requests = Counter(dict(
+        ((city_key, blood_group), n) for city_key, blood_group, n in
+        DonationRequest.objects.filter(status='pending').values_list('city_key', 'blood_group_needed')
+        .annotate(n=Count('id')).order_by()
+    ))
+    SupplyDemandCell.objects.all().delete()
+    SupplyDemandCell.objects.bulk_create([
+        SupplyDemandCell(city_key=city_key, blood_group=blood_group,
+                         available_donors=donors[city_key, blood_group],
+                         pending_requests=requests[city_key, blood_group])
+        for city_key, blood_group in donors.keys() | requests.keys()
+    ], batch_size=1000)
+
+
+def unmerge_similar_cities(apps, schema_editor):
+    """
+    Give every spelling that was merged into a city only for looking alike
+    a City of its own, and re-key the rows that used it.
+
+    The re-keying skips the signals that keep the supply/demand cells
+    current, so the cells are recounted afterwards.
+
+    Before this, aliases could only point elsewhere through KNOWN_ALIASES or
+    a similarity match, so any other alias naming a different key was a
+    similarity match.
+    """
+    City = apps.get_model('bloodshare', 'City')
+    CityAlias = apps.get_model('bloodshare', 'CityAlias')
+    CityTrigram = apps.get_model('bloodshare', 'CityTrigram')
+    Profile = apps.get_model('bloodshare', 'Profile')
+    DonationRequest = apps.get_model('bloodshare', 'DonationRequest')
+
+    moved = {}
+    for alias in CityAlias.objects.select_related('city').exclude(key__in=KNOWN_ALIAS_KEYS):
+        if alias.key == alias.city.key:
+            continue
+        city = City.objects.filter(key=alias.key).first()
+        if city is None:
+            city = City.objects.create(name=alias.key.title(), key=alias.key, trigram_count=len(trigrams(alias.key)))
+            CityTrigram.objects.bulk_create([CityTrigram(trigram=gram, city=city) for gram in trigrams(alias.key)])
+        moved.setdefault(alias.city.key, set()).add(alias.key)
+        alias.city = city
+        alias.save(update_fields=['city'])
+
+    for model in (Profile, DonationRequest):
+        for old_key, new_keys in moved.items():
+            ids = defaultdict(list)
+            for row_id, city in model.objects.filter(city_key=old_key).values_list('id', 'city').iterator():
+                key = normalize_city_key(city)
+                if key in new_keys:
+                    ids[key].append(row_id)
+            for key, row_ids in ids.items():
+                for start in range(0, len(row_ids), 500):
+                    model.objects.filter(id__in=row_ids[start:start + 500]).update(city_key=key)
+    if moved:
+        recount_cells(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodshare', '0017_supply_demand'),
+    ]
+
+    operations = [
+        migrations.RunPython(unmerge_similar_cities, migrations.RunPython.noop),
+    ]
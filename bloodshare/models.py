@@ -1,64 +1,370 @@
-from django.db import models
-from django.contrib.auth.models import User
-from django.core.validators import RegexValidator
-
-
-BLOOD_GROUP_CHOICES = [
-    ('A+', 'A+'),
-    ('A-', 'A-'),
-    ('B+', 'B+'),
-    ('B-', 'B-'),
-    ('AB+', 'AB+'),
-    ('AB-', 'AB-'),
-    ('O+', 'O+'),
-    ('O-', 'O-'),
-]
-
-
-class Profile(models.Model):
-    """Extended user profile linked to Django User model"""
-    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    phone = models.CharField(
-        max_length=15,
-        validators=[RegexValidator(regex=r'^\+?1?\d{9,15}$', message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.")],
-        blank=True
-    )
-    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES, blank=True)
-    city = models.CharField(max_length=100, blank=True)
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
-    is_available = models.BooleanField(default=False, help_text="Available to donate blood")
-    last_donation_date = models.DateField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    class Meta:
-        ordering = ['-created_at']
-
-    def __str__(self):
-        return f"{self.user.get_full_name() or self.user.username} - {self.blood_group}"
-
-
-class DonationRequest(models.Model):
-    """Donation requests created by users"""
-    STATUS_CHOICES = [
-        ('pending', 'Pending'),
-        ('accepted', 'Accepted'),
-        ('fulfilled', 'Fulfilled'),
-        ('cancelled', 'Cancelled'),
-    ]
-
-    requester = models.ForeignKey(User, on_delete=models.CASCADE, related_name='donation_requests')
-    accepted_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='accepted_requests')
-    name = models.CharField(max_length=200, help_text="Name of person needing blood")
-    blood_group_needed = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES)
-    city = models.CharField(max_length=100)
-    details = models.TextField(blank=True, help_text="Additional details about the request")
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    class Meta:
-        ordering = ['-created_at']
-
-    def __str__(self):
-        return f"{self.name} - {self.blood_group_needed} - {self.city}"
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
+
+from .geo import point_geohash
+
+
+BLOOD_GROUP_CHOICES = [
+    ('A+', 'A+'),
+    ('A-', 'A-'),
+    ('B+', 'B+'),
+    ('B-', 'B-'),
+    ('AB+', 'AB+'),
+    ('AB-', 'AB-'),
+    ('O+', 'O+'),
+    ('O-', 'O-'),
+]
+
+
+def _latitude_field():
+    return models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+
+
+def _longitude_field():
+    return models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+
+
+def _geohash_field():
+    return models.CharField(max_length=12, blank=True, editable=False, help_text="Derived from the coordinates")
+
+
+def _city_key_field():
+    return models.CharField(max_length=100, blank=True, editable=False, help_text="Key of the canonical City")
+
+
+class DerivedFieldsMixin:
+    """
+    Keeps ``geohash`` and ``city_key`` in step with the fields they derive from.
+
+    Resolving a city costs a query, so save() only does it when ``city``
+    differs from the value loaded from the database.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'city' in field_names:
+            instance._loaded_city = values[field_names.index('city')]
+        return instance
+
+    def _city_needs_key(self):
+        if self.city != getattr(self, '_loaded_city', None):
+            return True
+        return bool(self.city.strip()) and not self.city_key
+
+    def save(self, *args, **kwargs):
+        from .cities import city_key_for
+
+        deferred = self.get_deferred_fields()
+        update_fields = kwargs.get('update_fields')
+        derived = set()
+        if not {'latitude', 'longitude'} & deferred:
+            self.geohash = point_geohash(self.latitude, self.longitude)
+            if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+                derived.add('geohash')
+        if 'city' not in deferred and (update_fields is None or 'city' in update_fields) and self._city_needs_key():
+            self.city_key = city_key_for(self.city)
+            derived.add('city_key')
+        if update_fields is not None and derived:
+            kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+        self._loaded_city = self.city
+
+
+class Profile(DerivedFieldsMixin, models.Model):
+    """Extended user profile linked to Django User model"""
+    AVATAR_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
+    phone = models.CharField(
+        max_length=15,
+        validators=[RegexValidator(regex=r'^\+?1?\d{9,15}$', message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.")],
+        blank=True
+    )
+    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    city_key = _city_key_field()
+    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar_status = models.CharField(max_length=10, choices=AVATAR_STATUS_CHOICES, blank=True, editable=False)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Thumbnail paths by size and format")
+    is_available = models.BooleanField(default=False, help_text="Available to donate blood")
+    last_donation_date = models.DateField(null=True, blank=True)
+    latitude = _latitude_field()
+    longitude = _longitude_field()
+    geohash = _geohash_field()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['blood_group', 'is_available', 'city_key'], name='profile_city_idx'),
+            models.Index(fields=['blood_group', 'is_available', 'geohash'], name='profile_geo_idx'),
+            models.Index(fields=['created_at'], name='profile_created_idx'),
+            # Donor lookups filtered with matching.can_donate_q(): one range per
+            # (blood group, city) in id order, with eligibility checked in the index
+            models.Index(
+                fields=['blood_group', 'city_key', 'id', 'last_donation_date'],
+                name='profile_eligible_idx',
+                condition=models.Q(is_available=True),
+            ),
+        ]
+
+    @property
+    def next_eligible_date(self):
+        """The first day this donor may give whole blood again, or None if they already may"""
+        from .matching import DONATION_INTERVAL
+
+        if self.last_donation_date is None:
+            return None
+        next_date = self.last_donation_date + DONATION_INTERVAL
+        return next_date if next_date > timezone.localdate() else None
+
+    def save(self, *args, **kwargs):
+        from . import avatars
+
+        new_upload = bool(self.avatar) and not self.avatar._committed
+        stale_files = []
+        if new_upload or (not self.avatar and self.avatar_variants):
+            # The worker updates rows behind loaded instances' backs, so ask
+            # the database which files the previous avatar left behind
+            previous = Profile.objects.filter(pk=self.pk).values('avatar', 'avatar_variants').first() if self.pk else None
+            if previous:
+                stale_files = [name for name in [previous['avatar']] if name] + avatars.variant_files(previous['avatar_variants'])
+            self.avatar_status = 'pending' if new_upload else ''
+            self.avatar_variants = {}
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'avatar_status', 'avatar_variants'}
+        super().save(*args, **kwargs)
+        if new_upload:
+            avatars.schedule(self.id, stale_files)
+        elif stale_files:
+            transaction.on_commit(lambda: [default_storage.delete(path) for path in stale_files])
+
+    def __str__(self):
+        return f"{self.user.get_full_name() or self.user.username} - {self.blood_group}"
+
+
+class DonationRequest(DerivedFieldsMixin, models.Model):
+    """Donation requests created by users"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('accepted', 'Accepted'),
+        ('fulfilled', 'Fulfilled'),
+        ('cancelled', 'Cancelled'),
+        ('expired', 'Expired'),
+    ]
+
+    requester = models.ForeignKey(User, on_delete=models.CASCADE, related_name='donation_requests')
+    accepted_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='accepted_requests')
+    name = models.CharField(max_length=200, help_text="Name of person needing blood")
+    blood_group_needed = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES)
+    city = models.CharField(max_length=100)
+    city_key = _city_key_field()
+    details = models.TextField(blank=True, help_text="Additional details about the request")
+    latitude = _latitude_field()
+    longitude = _longitude_field()
+    geohash = _geohash_field()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id'], name='request_feed_idx'),
+            models.Index(fields=['status', 'geohash'], name='request_geo_idx'),
+            models.Index(fields=['status', 'city_key', 'created_at', 'id'], name='request_city_idx'),
+            models.Index(fields=['created_at'], name='request_created_idx'),
+            models.Index(fields=['updated_at'], name='request_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.blood_group_needed} - {self.city}"
+
+
+class SiteCounter(models.Model):
+    """Incrementally maintained site-wide counters shown on the landing page"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class SupplyDemandCell(models.Model):
+    """Available donors against pending requests for one city and blood group, kept current by signals"""
+    city_key = models.CharField(max_length=100, blank=True)
+    blood_group = models.CharField(max_length=3, choices=BLOOD_GROUP_CHOICES)
+    available_donors = models.IntegerField(default=0)
+    pending_requests = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['city_key', 'blood_group'], name='supply_demand_cell_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.city_key or '-'} {self.blood_group}: {self.available_donors}/{self.pending_requests}"
+
+
+class City(models.Model):
+    """Canonical spelling of a city; rows refer to it through ``city_key``"""
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+    trigram_count = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'cities'
+
+    def __str__(self):
+        return self.name
+
+
+class CityAlias(models.Model):
+    """A normalized spelling users have typed, resolved to its canonical City"""
+    key = models.CharField(max_length=100, unique=True)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='aliases')
+
+    class Meta:
+        verbose_name_plural = 'city aliases'
+
+    def __str__(self):
+        return f"{self.key} -> {self.city.key}"
+
+
+class CityTrigram(models.Model):
+    """Trigram index over City.key for typo-tolerant lookup"""
+    trigram = models.CharField(max_length=3)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'city'], name='city_trigram_uniq'),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """Event written in the same transaction as the change, for the send_notifications worker to fan out"""
+    EVENT_CHOICES = [
+        ('request_created', 'Request created'),
+    ]
+
+    donation_request = models.ForeignKey(DonationRequest, on_delete=models.CASCADE, related_name='outbox_entries')
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES, default='request_created')
+    cursor = models.JSONField(default=dict, blank=True, help_text="Last donor profile id handled, per blood group")
+    sent_count = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Lease held by the worker processing this entry")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'notification outbox'
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} #{self.donation_request_id}"
+
+
+class DonorNotification(models.Model):
+    """A donor who has been told about a request; deduplicates and rate-limits notifications"""
+    donation_request = models.ForeignKey(DonationRequest, on_delete=models.CASCADE, related_name='notifications')
+    donor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='donation_notifications')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['donation_request', 'donor'], name='notification_once_per_donor'),
+        ]
+        indexes = [
+            models.Index(fields=['donor', 'created_at'], name='notification_rate_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.donor_id} <- #{self.donation_request_id}"
+
+
+class RequestStatusEvent(models.Model):
+    """
+    One status change of a donation request; rows are only ever inserted.
+
+    The foreign keys have no database constraint and are never cascaded, so
+    the history outlives deleted requests and users.
+    """
+    donation_request = models.ForeignKey(
+        DonationRequest, on_delete=models.DO_NOTHING, db_constraint=False, related_name='status_events',
+    )
+    from_status = models.CharField(max_length=20, blank=True, help_text="Empty when the request was created")
+    to_status = models.CharField(max_length=20)
+    actor = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    blood_group = models.CharField(max_length=3)
+    elapsed_seconds = models.PositiveIntegerField(help_text="Time since the request was created")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['donation_request', 'id'], name='status_event_request_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.donation_request_id} {self.from_status or '-'} -> {self.to_status}"
+
+
+class StatusRollup(models.Model):
+    """Status changes per time bucket, status and blood group, added to by events.roll_up()"""
+    bucket = models.DateTimeField(help_text="Start of the bucket, UTC")
+    to_status = models.CharField(max_length=20)
+    blood_group = models.CharField(max_length=3)
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.BigIntegerField(default=0, help_text="Sum of the events' time since request creation")
+    max_seconds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def mean_seconds(self):
+        return self.total_seconds / self.count if self.count else 0
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:%M} {self.to_status} {self.blood_group}: {self.count}"
+
+
+class HourlyStatusRollup(StatusRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'to_status', 'blood_group'], name='hourly_rollup_bucket_uniq'),
+        ]
+
+
+class DailyStatusRollup(StatusRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'to_status', 'blood_group'], name='daily_rollup_bucket_uniq'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """The last event a rollup job has folded into its buckets"""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
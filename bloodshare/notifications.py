@@ -0,0 +1,203 @@
+"""
+Fan-out of new donation requests to compatible donors.
+
+Creating a request writes a NotificationOutbox row in the same
+transaction, so the web process never waits on email. The
+send_notifications worker drains the outbox. For each entry it walks
+the available, eligible donors of every compatible blood group in the
+request's city, one index range per group, in batches of BATCH_SIZE.
+Each batch is recorded as DonorNotification rows and then handed to the
+email backend over a single connection. The entry's cursor is committed
+with every batch, so a worker that dies mid-way resumes where it
+stopped. Delivery is therefore at most once.
+
+A worker claims one entry at a time and renews its lease with every
+batch. The renewal is conditional on the lease the worker last wrote,
+so a worker that stalled past its lease and was taken over notices at
+its next batch and stops before emailing anyone.
+
+DonorNotification also drives deduplication (one email per donor per
+request) and the per-donor rate cap.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .matching import can_donate_q, compatible_donor_groups
+from .models import DonorNotification, NotificationOutbox, Profile
+
+
+logger = logging.getLogger(__name__)
+
+# Donors per recipient query, DonorNotification insert and email batch
+BATCH_SIZE = 500
+
+# A donor receives at most RATE_LIMIT request emails per RATE_WINDOW
+RATE_LIMIT = 3
+RATE_WINDOW = timedelta(hours=24)
+
+# How long a worker may hold an entry before another one can take it over
+LEASE = timedelta(minutes=5)
+
+# Entries failing this many times are given up on
+MAX_ATTEMPTS = 5
+
+# Oldest entries tried per claim, in case other workers win the first ones
+CLAIM_CANDIDATES = 10
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the entry after this worker's lease ran out"""
+
+
+def enqueue_request_created(donation_request):
+    """Record that donors should hear about ``donation_request``; call inside its transaction"""
+    return NotificationOutbox.objects.create(donation_request=donation_request, event='request_created')
+
+
+def _message(donation_request, email, first_name):
+    greeting = f'Hi {first_name},' if first_name else 'Hi,'
+    body = (
+        f'{greeting}\n\n'
+        f'{donation_request.name} needs {donation_request.blood_group_needed} blood in {donation_request.city}. '
+        'Your blood group is compatible.\n\n'
+        f'{donation_request.details[:500]}\n\n'
+        'Log in to BloodShare to accept the request.\n'
+    )
+    return EmailMessage(
+        subject=f'{donation_request.blood_group_needed} blood needed in {donation_request.city}',
+        body=body,
+        to=[email],
+    )
+
+
+def _rate_limited(user_ids, now):
+    """The subset of ``user_ids`` that have already had RATE_LIMIT emails within RATE_WINDOW"""
+    return set(
+        DonorNotification.objects.filter(donor_id__in=user_ids, created_at__gte=now - RATE_WINDOW)
+        .values('donor_id')
+        .annotate(sent=Count('id'))
+        .filter(sent__gte=RATE_LIMIT)
+        .values_list('donor_id', flat=True)
+    )
+
+
+def _recipient_batches(entry, batch_size):
+    """
+    Yield ``(group, last_profile_id, donors)`` per batch of candidate donors.
+
+    Each query is ``blood_group = ? AND is_available AND city_key = ? AND
+    id > ?`` in id order. That is a range seek on profile_eligible_idx,
+    which also checks eligibility, so batch N costs the same as batch 1.
+    """
+    donation_request = entry.donation_request
+    for group in compatible_donor_groups(donation_request.blood_group_needed):
+        last_id = entry.cursor.get(group, 0)
+        while True:
+            donors = list(
+                Profile.objects.filter(
+                    can_donate_q(),
+                    blood_group=group,
+                    city_key=donation_request.city_key,
+                    id__gt=last_id,
+                ).exclude(
+                    user_id=donation_request.requester_id,
+                ).order_by('id').values_list('id', 'user_id', 'user__email', 'user__first_name')[:batch_size]
+            )
+            if not donors:
+                break
+            last_id = donors[-1][0]
+            yield group, last_id, donors
+            if len(donors) < batch_size:
+                break
+
+
+def fan_out(entry, batch_size=BATCH_SIZE, connection=None):
+    """Email every compatible donor about ``entry``'s request; returns the number of emails sent"""
+    donation_request = entry.donation_request
+    if donation_request.status != 'pending' or not donation_request.city_key:
+        return 0
+
+    connection = connection or get_connection()
+    sent = 0
+    for group, last_id, donors in _recipient_batches(entry, batch_size):
+        now = timezone.now()
+        user_ids = [user_id for _, user_id, email, _ in donors if email]
+        skip = _rate_limited(user_ids, now)
+        skip.update(DonorNotification.objects.filter(
+            donation_request=donation_request, donor_id__in=user_ids,
+        ).values_list('donor_id', flat=True))
+        recipients = [(user_id, email, first_name) for _, user_id, email, first_name in donors
+                      if email and user_id not in skip]
+
+        entry.cursor[group] = last_id
+        with transaction.atomic():
+            DonorNotification.objects.bulk_create(
+                [DonorNotification(donation_request=donation_request, donor_id=user_id) for user_id, _, _ in recipients],
+                ignore_conflicts=True,
+            )
+            if not NotificationOutbox.objects.filter(id=entry.id, locked_until=entry.locked_until).update(
+                cursor=entry.cursor,
+                sent_count=F('sent_count') + len(recipients),
+                locked_until=now + LEASE,
+            ):
+                raise LeaseLost(entry.id)
+        entry.locked_until = now + LEASE
+        if recipients:
+            connection.send_messages([_message(donation_request, email, name) for _, email, name in recipients])
+        sent += len(recipients)
+    return sent
+
+
+def claim_entry():
+    """
+    Lease the oldest unprocessed entry to this worker, or return None.
+
+    Claiming is a conditional UPDATE, so two workers never fan out the
+    same entry at once. An entry whose lease ran out (its worker died or
+    stalled) can be claimed again. The returned entry's ``locked_until``
+    is the lease this worker holds.
+    """
+    now = timezone.now()
+    available = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    candidates = NotificationOutbox.objects.filter(available, processed_at__isnull=True).order_by('id')
+    for entry_id in candidates.values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+        if NotificationOutbox.objects.filter(available, id=entry_id).update(
+            locked_until=now + LEASE, attempts=F('attempts') + 1,
+        ):
+            return NotificationOutbox.objects.select_related('donation_request').get(id=entry_id)
+    return None
+
+
+def drain_outbox(limit=10, batch_size=BATCH_SIZE):
+    """Process up to ``limit`` outbox entries, one at a time; returns ``(entries, emails)`` handled"""
+    entry = claim_entry()
+    if entry is None:
+        return 0, 0
+    entries = emails = 0
+    with get_connection() as connection:
+        while entry is not None:
+            entries += 1
+            try:
+                emails += fan_out(entry, batch_size, connection)
+            except LeaseLost:
+                logger.warning('Lease on notification outbox entry %s ran out; another worker took it over', entry.id)
+            except Exception as exc:
+                logger.exception('Notification fan-out for request %s failed', entry.donation_request_id)
+                give_up = entry.attempts >= MAX_ATTEMPTS
+                # Only while still holding the lease fan_out() last renewed
+                NotificationOutbox.objects.filter(id=entry.id, locked_until=entry.locked_until).update(
+                    last_error=str(exc)[:1000],
+                    locked_until=None,
+                    processed_at=timezone.now() if give_up else None,
+                )
+            else:
+                NotificationOutbox.objects.filter(id=entry.id, locked_until=entry.locked_until).update(
+                    processed_at=timezone.now(), locked_until=None,
+                )
+            entry = claim_entry() if entries < limit else None
+    return entries, emails
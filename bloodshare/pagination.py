@@ -0,0 +1,144 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.db.models import DateTimeField, IntegerField, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Encode the sort-key values of the last row into an opaque cursor"""
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _cursor_value(field, value):
+    """Parse one cursor value for ``field``, rejecting anything encode_cursor() would not have written"""
+    # Integers stay JSON numbers; everything else was encoded as a string
+    expected = int if isinstance(field, IntegerField) else str
+    if type(value) is not expected:
+        raise InvalidCursor('Malformed cursor')
+    if isinstance(field, DateTimeField):
+        # to_python() would also take a bare date, and a naive datetime
+        # only warns when compared with an aware column
+        try:
+            parsed = parse_datetime(value)
+        except ValueError as exc:
+            raise InvalidCursor('Malformed cursor') from exc
+        if parsed is None or (settings.USE_TZ and timezone.is_naive(parsed)):
+            raise InvalidCursor('Malformed cursor')
+        return parsed
+    try:
+        return field.to_python(value)
+    except ValidationError as exc:
+        raise InvalidCursor('Malformed cursor') from exc
+
+
+def decode_cursor(cursor, fields):
+    """
+    Decode a cursor produced by encode_cursor() into one value per model field in ``fields``.
+
+    Client-supplied cursors are untrusted, so each value must have the type
+    its field takes; anything else raises InvalidCursor rather than failing
+    later in the query.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor('Malformed cursor') from exc
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Malformed cursor')
+    return [_cursor_value(field, value) for field, value in zip(fields, values)]
+
+
+def _after(keys, values):
+    """
+    Build the "strictly after" predicate for a descending keyset.
+
+    The leading key gets an inclusive bound (``k1 <= v1``) so the database
+    can seek on the index, and the tie-break on the remaining keys is applied
+    as a residual filter.
+    """
+    if len(keys) == 1:
+        return Q(**{f'{keys[0]}__lt': values[0]})
+    head, rest = keys[0], keys[1:]
+    tie = Q(**{head: values[0]}) & _after(rest, values[1:])
+    return Q(**{f'{head}__lte': values[0]}) & (Q(**{f'{head}__lt': values[0]}) | tie)
+
+
+def keyset_page(queryset, keys, cursor=None, limit=20):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``queryset``.
+
+    ``keys`` are the field names the page is ordered by, descending, and must
+    end with a unique column so the order is total. Every page costs one index
+    seek regardless of how deep it is, unlike OFFSET pagination.
+    """
+    queryset = queryset.order_by(*[f'-{key}' for key in keys])
+    if cursor:
+        fields = [queryset.model._meta.get_field(key) for key in keys]
+        queryset = queryset.filter(_after(keys, decode_cursor(cursor, fields)))
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor([last[key] for key in keys])
+        else:
+            next_cursor = encode_cursor([getattr(last, key) for key in keys])
+    return rows, next_cursor
+
+
+# Exact counts are cheap up to this many rows; beyond it they are estimated
+EXACT_COUNT_LIMIT = 10_000
+
+
+def estimated_row_count(model):
+    """
+    Approximate number of rows in ``model``'s table without scanning it.
+
+    Uses the row count ANALYZE records in ``sqlite_stat1`` and falls back
+    to the largest primary key, which is one index seek.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+        except DatabaseError:
+            row = None
+        if row:
+            return int(row[0].split()[0])
+    return model._default_manager.aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an unbounded ``COUNT(*)``.
+
+    Up to EXACT_COUNT_LIMIT rows are counted exactly, through a ``LIMIT``ed
+    subquery. Past that, an unfiltered list reports the table estimate and
+    a filtered one reports the limit, so the last pages shown may be short
+    or empty.
+    """
+
+    @cached_property
+    def count(self):
+        exact = self.object_list[:EXACT_COUNT_LIMIT + 1].count()
+        if exact <= EXACT_COUNT_LIMIT:
+            return exact
+        if not self.object_list.query.has_filters():
+            return max(estimated_row_count(self.object_list.model), exact)
+        return EXACT_COUNT_LIMIT
@@ -0,0 +1,93 @@
+"""
+Read replicas with read-your-writes.
+
+Writes always go to the primary. Reads go to a replica only inside a
+request that ReplicaPinningMiddleware lets use one; every other read
+(management commands, worker threads, the shell) goes to the primary.
+Each such request sticks to one replica chosen at random, so its queries
+see a single consistent snapshot.
+
+A request is pinned to the primary when it is a write itself (any method
+but GET/HEAD/OPTIONS/TRACE), or when it comes within REPLICA_PIN_SECONDS
+of the same browser's last write, which the middleware remembers with a
+short-lived cookie. Reads inside transaction.atomic() also go to the
+primary, since the transaction is about to act on what it reads.
+
+Replicas are listed in settings.DATABASE_REPLICAS. With none configured
+everything goes to the primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'bloodshare_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# The alias reads should use in the current request
+_read_alias = ContextVar('bloodshare_read_alias', default=PRIMARY)
+
+
+@contextmanager
+def primary():
+    """Send the reads inside the block to the primary"""
+    token = _read_alias.set(PRIMARY)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias != PRIMARY and connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary along with the data
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Choose where a request reads from, and pin the next requests after a write"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = settings.DATABASE_REPLICAS
+        writes = request.method not in SAFE_METHODS
+        if not replicas or writes or PIN_COOKIE in request.COOKIES:
+            alias = PRIMARY
+        else:
+            alias = random.choice(replicas)
+
+        token = _read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if replicas and writes:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,85 @@
+from .cities import city_key_filter
+from .geo import nearest
+from .matching import can_donate_q, eligible_q
+from .models import BLOOD_GROUP_CHOICES, Profile
+from .pagination import keyset_page
+
+
+# Columns rendered by a donor card; nothing else is loaded from the database.
+DONOR_CARD_FIELDS = (
+    'id',
+    'blood_group',
+    'city',
+    'phone',
+    'user__first_name',
+    'user__last_name',
+    'user__username',
+)
+
+MAX_PAGE_SIZE = 50
+
+
+def donor_card(row):
+    """Shape a values() row into the JSON payload used by donor.html"""
+    full_name = f"{row['user__first_name']} {row['user__last_name']}".strip()
+    return {
+        'id': row['id'],
+        'name': full_name or row['user__username'],
+        'blood_group': row['blood_group'],
+        'city': row['city'],
+        'phone': row['phone'],
+    }
+
+
+def search_donors(blood_group=None, city=None, is_available=True, cursor=None, limit=20):
+    """
+    Search donor profiles using the (blood_group, city_key) donor indexes.
+
+    ``is_available=True`` finds the donors who can give blood today:
+    available and past the minimum interval since their last donation.
+    Results are returned newest-first and paginated on ``id``. ``city`` is
+    matched through its canonical city, so "delhi " and "New Delhi" find
+    the same donors. When both blood group and city are given every page is
+    a single index range scan.
+    Returns ``(cards, next_cursor)``.
+    """
+    queryset = Profile.objects.all()
+    if blood_group:
+        queryset = queryset.filter(blood_group=blood_group)
+    if is_available:
+        # Served by the partial profile_eligible_idx
+        queryset = queryset.filter(can_donate_q())
+    elif is_available is not None:
+        # ``is_available=True`` compiles to a bare ``WHERE is_available`` that
+        # SQLite cannot match against the index column; ``IN (1)`` can.
+        queryset = queryset.filter(is_available__in=[is_available])
+    if city:
+        queryset = queryset.filter(**city_key_filter(city))
+
+    queryset = queryset.values(*DONOR_CARD_FIELDS)
+    rows, next_cursor = keyset_page(queryset, ('id',), cursor=cursor, limit=min(limit, MAX_PAGE_SIZE))
+    return [donor_card(row) for row in rows], next_cursor
+
+
+def distance_card(distance_km, row):
+    """donor_card() plus the distance; the donor's coordinates are never exposed"""
+    card = donor_card(row)
+    card['distance_km'] = round(distance_km, 1)
+    return card
+
+
+def nearby_donors(latitude, longitude, blood_group=None, radius_km=None, limit=20):
+    """
+    The available, eligible donors nearest to a point, using the geohash index.
+
+    Donors without coordinates are not included. Returns a list of cards
+    nearest first, each with ``distance_km``.
+    """
+    groups = [blood_group] if blood_group else [code for code, _ in BLOOD_GROUP_CHOICES]
+    queryset = Profile.objects.filter(
+        eligible_q(),
+        blood_group__in=groups,
+        is_available__in=[True],
+    ).values(*DONOR_CARD_FIELDS, 'latitude', 'longitude')
+    ranked = nearest(queryset, latitude, longitude, min(limit, MAX_PAGE_SIZE), max_radius_km=radius_km)
+    return [distance_card(distance_km, row) for distance_km, row in ranked]
@@ -0,0 +1,146 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from . import counters, events, fragments, notifications, supply
+from .models import DonationRequest, Profile
+
+
+# Sent after a conditional UPDATE moves requests between statuses without
+# going through Model.save(), inside the same transaction. Arguments:
+# request_ids, requester_ids (of those requests, in any order), old_status,
+# new_status, actor.
+request_status_changed = Signal()
+
+
+def _snapshot(instance, field, contribution):
+    """Remember what ``instance`` currently contributes to the counters"""
+    if field in instance.get_deferred_fields():
+        # Reading a deferred field would cost a query per loaded row
+        instance._counter_snapshot = None
+    else:
+        instance._counter_snapshot = contribution(getattr(instance, field))
+
+
+def _apply_change(instance, field, contribution, created):
+    new = contribution(getattr(instance, field))
+    old = {} if created else getattr(instance, '_counter_snapshot', None)
+    if old is not None:
+        counters.apply_deltas(counters.diff(old, new))
+    # Without a snapshot the old value is unknown; reconcile_counters fixes any drift
+    instance._counter_snapshot = new
+
+
+def _snapshot_cells(instance, fields, contribution):
+    """Remember what ``instance`` currently contributes to the supply/demand cells"""
+    if set(fields) & instance.get_deferred_fields():
+        instance._supply_snapshot = None
+    else:
+        instance._supply_snapshot = contribution(instance)
+
+
+def _apply_cell_change(instance, contribution, created):
+    new = contribution(instance)
+    old = {} if created else getattr(instance, '_supply_snapshot', None)
+    if old is not None:
+        supply.apply_deltas(counters.diff(old, new))
+    # Without a snapshot the old cell is unknown; rebuild_supply_demand fixes any drift
+    instance._supply_snapshot = new
+
+
+@receiver(post_init, sender=Profile)
+def snapshot_profile(sender, instance, **kwargs):
+    _snapshot(instance, 'is_available', counters.profile_contribution)
+    _snapshot_cells(instance, supply.PROFILE_FIELDS, supply.profile_contribution)
+
+
+@receiver(post_init, sender=DonationRequest)
+def snapshot_request(sender, instance, **kwargs):
+    _snapshot(instance, 'status', counters.request_contribution)
+    _snapshot_cells(instance, supply.REQUEST_FIELDS, supply.request_contribution)
+    instance._status_snapshot = None if 'status' in instance.get_deferred_fields() else instance.status
+
+
+@receiver(post_save, sender=Profile)
+def count_profile(sender, instance, created, **kwargs):
+    _apply_change(instance, 'is_available', counters.profile_contribution, created)
+
+
+@receiver(post_save, sender=DonationRequest)
+def count_request(sender, instance, created, **kwargs):
+    _apply_change(instance, 'status', counters.request_contribution, created)
+
+
+@receiver(post_save, sender=Profile)
+def tally_profile(sender, instance, created, **kwargs):
+    _apply_cell_change(instance, supply.profile_contribution, created)
+
+
+@receiver(post_save, sender=DonationRequest)
+def tally_request(sender, instance, created, **kwargs):
+    _apply_cell_change(instance, supply.request_contribution, created)
+
+
+@receiver(post_save, sender=DonationRequest)
+def notify_donors(sender, instance, created, raw=False, **kwargs):
+    # Shares the caller's transaction, so save() inside atomic() commits both or neither
+    if created and not raw:
+        notifications.enqueue_request_created(instance)
+
+
+@receiver(post_save, sender=DonationRequest)
+def log_request_status(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        events.record_created(instance)
+    elif instance._status_snapshot is not None and instance._status_snapshot != instance.status:
+        # The admin sets _status_actor to the staff user making the edit
+        events.record_change(instance, instance._status_snapshot, getattr(instance, '_status_actor', None))
+    instance._status_snapshot = instance.status
+
+
+@receiver(post_delete, sender=Profile)
+def uncount_profile(sender, instance, **kwargs):
+    counters.apply_deltas(counters.diff(counters.profile_contribution(instance.is_available), {}))
+
+
+@receiver(post_delete, sender=DonationRequest)
+def uncount_request(sender, instance, **kwargs):
+    counters.apply_deltas(counters.diff(counters.request_contribution(instance.status), {}))
+
+
+@receiver(post_delete, sender=Profile)
+def untally_profile(sender, instance, **kwargs):
+    supply.apply_deltas(counters.diff(supply.profile_contribution(instance), {}))
+
+
+@receiver(post_delete, sender=DonationRequest)
+def untally_request(sender, instance, **kwargs):
+    supply.apply_deltas(counters.diff(supply.request_contribution(instance), {}))
+
+
+@receiver(request_status_changed)
+def tally_status_change(sender, request_ids, old_status, new_status, **kwargs):
+    supply.apply_status_change(request_ids, old_status, new_status)
+
+
+@receiver(request_status_changed)
+def count_status_change(sender, request_ids, old_status, new_status, **kwargs):
+    delta = counters.diff(counters.request_contribution(old_status), counters.request_contribution(new_status))
+    counters.apply_deltas({name: value * len(request_ids) for name, value in delta.items()})
+
+
+@receiver(request_status_changed)
+def log_status_change(sender, request_ids, old_status, new_status, actor=None, **kwargs):
+    events.record_transitions(request_ids, old_status, new_status, actor)
+
+
+@receiver(post_save, sender=DonationRequest)
+@receiver(post_delete, sender=DonationRequest)
+def invalidate_request_fragments(sender, instance, **kwargs):
+    fragments.bump_for_request(instance.requester_id)
+
+
+@receiver(request_status_changed)
+def invalidate_status_fragments(sender, requester_ids, **kwargs):
+    fragments.bump_for_status_change(requester_ids)
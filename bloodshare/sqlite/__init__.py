@@ -0,0 +1,15 @@
+"""
+SQLite database backend with connection PRAGMAs and a transaction mode.
+
+Use it as the ENGINE of a sqlite3 DATABASES entry. It accepts two OPTIONS
+on top of Django's sqlite3 backend:
+
+``pragmas``
+    ``{name: value}`` applied to every new connection, e.g.
+    ``{'journal_mode': 'wal', 'synchronous': 'normal'}``.
+``transaction_mode``
+    ``'DEFERRED'`` (SQLite's default), ``'IMMEDIATE'`` or ``'EXCLUSIVE'``,
+    used when ``transaction.atomic()`` begins a transaction.
+
+Without them it behaves exactly like ``django.db.backends.sqlite3``.
+"""
@@ -0,0 +1,49 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+# PRAGMA statements can't take parameters, so names and values are checked
+# before they are formatted into one
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^(-?\d+|[A-Za-z_]+)$')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = dict(options.get('pragmas') or {})
+        self.transaction_mode = (options.get('transaction_mode') or 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"OPTIONS['transaction_mode'] must be one of {', '.join(TRANSACTION_MODES)}, "
+                f"not {options['transaction_mode']!r}."
+            )
+        for name, value in self.pragmas.items():
+            if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+                raise ImproperlyConfigured(f'Invalid SQLite PRAGMA {name} = {value!r}.')
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Ours, not sqlite3.connect()'s
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # A DEFERRED transaction that reads and then writes has to upgrade its
+        # lock mid-way, and SQLite fails that upgrade with "database is
+        # locked" straight away rather than waiting out busy_timeout.
+        # IMMEDIATE takes the write lock at BEGIN, where waiting works.
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,152 @@
+"""
+Donor supply against request demand, per city and blood group.
+
+SupplyDemandCell holds one row per (city_key, blood_group) with the number
+of available donors and of pending requests there, so the report reads
+a few hundred cells instead of grouping every profile and request. Like
+the landing page counters, the cells are kept current on every write
+path in the app: each save or delete applies the difference between
+what the row contributed before and after, and status transitions and
+chunked expiry adjust the cells of the requests they moved, in the same
+transaction, from the request_status_changed signal. The paths that
+re-key or insert rows in bulk (normalize_cities, generate_data and
+migration 0018) recount the cells when they finish.
+
+rebuild(), also run by the rebuild_supply_demand command, recounts
+everything and reports the drift, which only writes made outside the
+app (raw SQL, a queryset.update() in a shell) can cause.
+
+Donation eligibility depends on today's date, so "available" here means
+``is_available`` only.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.utils import timezone
+
+from .cities import city_key_filter
+from .models import City, DonationRequest, Profile, SupplyDemandCell
+
+
+DONORS = 'available_donors'
+REQUESTS = 'pending_requests'
+
+# Fields a row's contribution is read from; with any deferred it is unknown
+PROFILE_FIELDS = ('city_key', 'blood_group', 'is_available')
+REQUEST_FIELDS = ('city_key', 'blood_group_needed', 'status')
+
+
+def profile_contribution(profile):
+    """What a single profile adds to the cells"""
+    return {(profile.city_key, profile.blood_group, DONORS): 1} if profile.is_available else {}
+
+
+def request_contribution(donation_request):
+    """What a single donation request adds to the cells"""
+    if donation_request.status != 'pending':
+        return {}
+    return {(donation_request.city_key, donation_request.blood_group_needed, REQUESTS): 1}
+
+
+def apply_deltas(deltas):
+    """Add ``{(city_key, blood_group, column): n}`` to the cells, creating any that are missing"""
+    cells = defaultdict(dict)
+    for (city_key, blood_group, column), delta in deltas.items():
+        if delta:
+            cells[city_key, blood_group][column] = delta
+    now = timezone.now()
+    for (city_key, blood_group), changes in cells.items():
+        cell = SupplyDemandCell.objects.filter(city_key=city_key, blood_group=blood_group)
+        updates = {column: F(column) + delta for column, delta in changes.items()}
+        if not cell.update(updated_at=now, **updates):
+            SupplyDemandCell.objects.get_or_create(city_key=city_key, blood_group=blood_group)
+            cell.update(updated_at=now, **updates)
+
+
+def apply_status_change(request_ids, old_status, new_status):
+    """Move the requests in ``request_ids`` into or out of the pending counts"""
+    if old_status == new_status or 'pending' not in (old_status, new_status):
+        return
+    requests = DonationRequest.objects.filter(id__in=request_ids)
+    if new_status == 'pending':
+        # Rare, and may need new cells
+        apply_deltas({
+            (city_key, blood_group, REQUESTS): n
+            for city_key, blood_group, n in requests.values_list('city_key', 'blood_group_needed')
+            .annotate(n=Count('id')).order_by()
+        })
+        return
+    # Leaving pending, so each request's cell already exists: one UPDATE
+    # takes every moved request off its own cell
+    in_cell = requests.filter(city_key=OuterRef('city_key'), blood_group_needed=OuterRef('blood_group'))
+    moved = in_cell.order_by().values('city_key').annotate(n=Count('id')).values('n')
+    SupplyDemandCell.objects.filter(Exists(in_cell)).update(
+        pending_requests=F('pending_requests') - Subquery(moved), updated_at=timezone.now(),
+    )
+
+
+def compute_cells():
+    """``{(city_key, blood_group): {DONORS: n, REQUESTS: n}}`` counted from scratch"""
+    cells = defaultdict(lambda: {DONORS: 0, REQUESTS: 0})
+    donors = Profile.objects.filter(is_available=True).values_list('city_key', 'blood_group')
+    for city_key, blood_group, n in donors.annotate(n=Count('id')).order_by():
+        cells[city_key, blood_group][DONORS] = n
+    requests = DonationRequest.objects.filter(status='pending').values_list('city_key', 'blood_group_needed')
+    for city_key, blood_group, n in requests.annotate(n=Count('id')).order_by():
+        cells[city_key, blood_group][REQUESTS] = n
+    return cells
+
+
+def rebuild():
+    """
+    Replace the cells with exact counts.
+
+    Returns ``{(city_key, blood_group): drift}`` for the cells that were
+    off, where drift is ``{DONORS: n, REQUESTS: n}``.
+    """
+    with transaction.atomic():
+        actual = compute_cells()
+        stored = Counter()
+        for city_key, blood_group, donors, requests in SupplyDemandCell.objects.values_list(
+            'city_key', 'blood_group', DONORS, REQUESTS,
+        ):
+            stored[city_key, blood_group, DONORS] = donors
+            stored[city_key, blood_group, REQUESTS] = requests
+        SupplyDemandCell.objects.all().delete()
+        SupplyDemandCell.objects.bulk_create([
+            SupplyDemandCell(city_key=city_key, blood_group=blood_group, **counts)
+            for (city_key, blood_group), counts in actual.items()
+        ], batch_size=1000)
+
+    drift = {}
+    for city_key, blood_group in set(actual) | {(city_key, blood_group) for city_key, blood_group, _ in stored}:
+        counts = actual.get((city_key, blood_group), {DONORS: 0, REQUESTS: 0})
+        delta = {column: counts[column] - stored[city_key, blood_group, column] for column in (DONORS, REQUESTS)}
+        if any(delta.values()):
+            drift[city_key, blood_group] = delta
+    return drift
+
+
+def report(city='', blood_group=''):
+    """
+    Cells with the most unmet demand first, as
+    ``[{'city', 'city_key', 'blood_group', 'available_donors', 'pending_requests', 'shortfall'}, ...]``.
+
+    ``city`` is any spelling of a city. Cells with neither donors nor requests are left out.
+    """
+    cells = SupplyDemandCell.objects.exclude(available_donors=0, pending_requests=0)
+    if city:
+        cells = cells.filter(**city_key_filter(city))
+    if blood_group:
+        cells = cells.filter(blood_group=blood_group)
+    cells = list(
+        cells.annotate(shortfall=F(REQUESTS) - F(DONORS))
+        .order_by('-shortfall', 'city_key', 'blood_group')
+        .values('city_key', 'blood_group', DONORS, REQUESTS, 'shortfall')
+    )
+    names = dict(City.objects.filter(key__in={cell['city_key'] for cell in cells}).values_list('key', 'name'))
+    for cell in cells:
+        cell['city'] = names.get(cell['city_key'], cell['city_key'])
+    return cells
+
@@ -0,0 +1,233 @@
+"""
+Synthetic data generation for load tests.
+
+Rows are built in batches of users; each batch draws from its own random
+stream seeded by ``(seed, batch start)``, so the same seed and batch size
+reproduce the same dataset whether batches run in one process or many.
+"""
+import multiprocessing
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, supply
+from .cities import city_key_for
+from .geo import KM_PER_DEGREE, point_geohash
+from .models import DonationRequest, Profile
+
+
+# Approximate ABO/Rh distribution of donors
+BLOOD_GROUP_WEIGHTS = {
+    'O+': 37, 'B+': 32, 'A+': 22, 'AB+': 6,
+    'O-': 1.5, 'A-': 0.6, 'B-': 0.6, 'AB-': 0.3,
+}
+
+# Ordered by size; weights fall off with rank like real city populations
+CITIES = [
+    'Mumbai', 'Delhi', 'Bengaluru', 'Hyderabad', 'Ahmedabad', 'Chennai',
+    'Kolkata', 'Pune', 'Jaipur', 'Lucknow', 'Kanpur', 'Nagpur', 'Indore',
+    'Bhopal', 'Patna', 'Vadodara', 'Ghaziabad', 'Ludhiana', 'Agra', 'Nashik',
+    'Meerut', 'Varanasi', 'Noida', 'Prayagraj', 'Ranchi', 'Coimbatore',
+    'Jabalpur', 'Gwalior', 'Vijayawada', 'Madurai',
+]
+CITY_WEIGHTS = [1 / rank ** 0.8 for rank in range(1, len(CITIES) + 1)]
+
+# Approximate city centres as (latitude, longitude)
+CITY_COORDINATES = {
+    'Mumbai': (19.076, 72.878), 'Delhi': (28.614, 77.209), 'Bengaluru': (12.972, 77.595),
+    'Hyderabad': (17.385, 78.487), 'Ahmedabad': (23.023, 72.571), 'Chennai': (13.083, 80.271),
+    'Kolkata': (22.573, 88.364), 'Pune': (18.520, 73.857), 'Jaipur': (26.912, 75.787),
+    'Lucknow': (26.847, 80.947), 'Kanpur': (26.449, 80.332), 'Nagpur': (21.146, 79.088),
+    'Indore': (22.720, 75.858), 'Bhopal': (23.260, 77.413), 'Patna': (25.594, 85.138),
+    'Vadodara': (22.307, 73.181), 'Ghaziabad': (28.669, 77.454), 'Ludhiana': (30.901, 75.857),
+    'Agra': (27.177, 78.008), 'Nashik': (19.998, 73.790), 'Meerut': (28.984, 77.706),
+    'Varanasi': (25.318, 82.974), 'Noida': (28.535, 77.391), 'Prayagraj': (25.435, 81.846),
+    'Ranchi': (23.344, 85.310), 'Coimbatore': (11.017, 76.956), 'Jabalpur': (23.182, 79.987),
+    'Gwalior': (26.218, 78.183), 'Vijayawada': (16.506, 80.648), 'Madurai': (9.925, 78.120),
+}
+
+# Share of synthetic profiles and requests that have coordinates
+LOCATED_SHARE = 0.7
+
+# Located rows are scattered up to this far from their city centre
+CITY_SPREAD_KM = 15
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Amit', 'Ananya', 'Anjali', 'Arjun', 'Deepak', 'Divya',
+    'Ishaan', 'Kajal', 'Karan', 'Kavya', 'Manish', 'Meera', 'Neha', 'Nikhil',
+    'Pooja', 'Priya', 'Rahul', 'Riya', 'Rohit', 'Sandeep', 'Sneha', 'Vikas',
+]
+LAST_NAMES = [
+    'Agarwal', 'Bansal', 'Chauhan', 'Gupta', 'Iyer', 'Jain', 'Kumar', 'Mishra',
+    'Nair', 'Patel', 'Rao', 'Reddy', 'Saxena', 'Sharma', 'Singh', 'Verma', 'Yadav',
+]
+
+STATUS_WEIGHTS = {'pending': 30, 'accepted': 40, 'fulfilled': 20, 'cancelled': 10}
+
+DETAILS = [
+    '', 'Urgent need for surgery', 'Emergency transfusion needed',
+    'Scheduled operation next week', 'Thalassemia patient, regular transfusions',
+    'Accident victim in ICU', 'Required for delivery, please contact family',
+]
+
+
+def synthetic_email(index):
+    """Email (and username) of the ``index``-th synthetic user"""
+    return f'donor{index}@example.com'
+
+
+def synthetic_phone(rng):
+    """Indian mobile number that passes Profile.phone's validator"""
+    return f'+91{rng.choice("6789")}{rng.randrange(10 ** 9):09d}'
+
+
+def synthetic_location(rng, city):
+    """
+    ``latitude``/``longitude``/``geohash`` field values near ``city``, or none.
+
+    bulk_create() skips Model.save(), so the geohash is filled in here.
+    """
+    if rng.random() >= LOCATED_SHARE:
+        return {}
+    centre_lat, centre_lon = CITY_COORDINATES[city]
+    spread = CITY_SPREAD_KM / KM_PER_DEGREE
+    latitude = round(centre_lat + rng.uniform(-spread, spread), 6)
+    longitude = round(centre_lon + rng.uniform(-spread, spread), 6)
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': point_geohash(latitude, longitude)}
+
+
+def build_batch(start, stop, seed, password_hash, total_users, total_requests, city_keys):
+    """
+    Field values for synthetic users ``start..stop``, their profiles and their share of requests.
+
+    ``city_keys`` maps each of CITIES to its canonical key, resolved once up
+    front since bulk_create() skips Model.save(). Nothing here touches the
+    database, so batches can be built in worker processes.
+
+    Returns ``(users, profiles, requests)`` as lists of field dicts. Profiles
+    line up with users; a request's ``requester`` and ``accepted_by`` are
+    positions in ``users``.
+    """
+    rng = random.Random(f'{seed}:{start}')
+    today = timezone.localdate()
+    groups, group_weights = list(BLOOD_GROUP_WEIGHTS), list(BLOOD_GROUP_WEIGHTS.values())
+    statuses, status_weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+
+    users = [
+        {
+            'username': synthetic_email(index),
+            'email': synthetic_email(index),
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'password': password_hash,
+        }
+        for index in range(start, stop)
+    ]
+
+    profiles = []
+    for _ in users:
+        city = rng.choices(CITIES, CITY_WEIGHTS)[0]
+        profiles.append({
+            'phone': synthetic_phone(rng),
+            'blood_group': rng.choices(groups, group_weights)[0],
+            'city': city,
+            'city_key': city_keys[city],
+            'is_available': rng.random() < 0.6,
+            'last_donation_date': today - timedelta(days=rng.randrange(365)) if rng.random() < 0.3 else None,
+            **synthetic_location(rng, city),
+        })
+
+    first_request = start * total_requests // total_users
+    last_request = stop * total_requests // total_users
+    positions = range(len(users))
+    requests = []
+    for _ in range(first_request, last_request):
+        status = rng.choices(statuses, status_weights)[0]
+        requester = rng.choice(positions)
+        donor = rng.choice(positions) if status in ('accepted', 'fulfilled') else None
+        city = rng.choices(CITIES, CITY_WEIGHTS)[0]
+        requests.append({
+            'requester': requester,
+            'accepted_by': donor if donor != requester else None,
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'blood_group_needed': rng.choices(groups, group_weights)[0],
+            'city': city,
+            'city_key': city_keys[city],
+            'details': rng.choice(DETAILS),
+            'status': status,
+            **synthetic_location(rng, city),
+        })
+    return users, profiles, requests
+
+
+def insert_batch(users, profiles, requests):
+    """
+    Insert one batch from build_batch() in a single transaction.
+
+    Returns ``(users_created, requests_created)``.
+    """
+    with transaction.atomic():
+        users = User.objects.bulk_create([User(**fields) for fields in users])
+        if users and users[0].pk is None:
+            # Backends that cannot return ids from a bulk insert
+            ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+        Profile.objects.bulk_create([Profile(user=user, **fields) for user, fields in zip(users, profiles)])
+        DonationRequest.objects.bulk_create([
+            DonationRequest(**{
+                **fields,
+                'requester': users[fields['requester']],
+                'accepted_by': None if fields['accepted_by'] is None else users[fields['accepted_by']],
+            })
+            for fields in requests
+        ])
+    return len(users), len(requests)
+
+
+def _build_batch(args):
+    return build_batch(*args)
+
+
+def generate(users, requests=0, start=0, seed=0, batch_size=5000, workers=1, password_hash='!', progress=None):
+    """
+    Generate synthetic users ``start..users`` and their donation requests.
+
+    With ``workers > 1`` batches are built in a process pool while this
+    process inserts them as they arrive. Only one process ever writes, so
+    SQLite's single writer is never contended.
+    ``progress`` is called with ``(users_done, requests_done)`` after each
+    batch. Derived tables are reconciled at the end because bulk inserts
+    skip model signals.
+    """
+    total_users = users
+    city_keys = {city: city_key_for(city) for city in CITIES}
+    batches = [
+        (offset, min(offset + batch_size, total_users), seed, password_hash, total_users, requests, city_keys)
+        for offset in range(start, total_users, batch_size)
+    ]
+
+    users_done = requests_done = 0
+
+    def insert(batch):
+        nonlocal users_done, requests_done
+        batch_users, batch_requests = insert_batch(*batch)
+        users_done += batch_users
+        requests_done += batch_requests
+        if progress:
+            progress(users_done, requests_done)
+
+    if workers > 1:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for batch in pool.imap_unordered(_build_batch, batches):
+                insert(batch)
+    else:
+        for batch in batches:
+            insert(build_batch(*batch))
+
+    counters.reconcile()
+    supply.rebuild()
+    return users_done, requests_done
@@ -0,0 +1,36 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from ..avatars import pick_variant
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar_picture(profile, size, css_class='', alt='Avatar'):
+    """
+    ``<picture>`` for ``profile``'s avatar displayed at ``size`` CSS pixels.
+
+    Serves the smallest WebP thumbnail covering 1x and 2x screens, with a
+    JPEG fallback. Until the upload has been processed the original is
+    used instead.
+    """
+    size = int(size)
+    one_x = pick_variant(profile.avatar_variants, size)
+    if not one_x:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" width="{}" height="{}">',
+            profile.avatar.url, alt, css_class, size, size,
+        )
+    two_x = pick_variant(profile.avatar_variants, size, density=2)
+
+    def srcset(fmt):
+        return f'{default_storage.url(one_x[fmt])} 1x, {default_storage.url(two_x[fmt])} 2x'
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img src="{}" srcset="{}" alt="{}" class="{}" width="{}" height="{}" decoding="async"></picture>',
+        srcset('webp'), default_storage.url(one_x['jpeg']), srcset('jpeg'), alt, css_class, size, size,
+    )
@@ -1,339 +1,2382 @@
-from django.test import TestCase, Client
-from django.contrib.auth.models import User
-from django.urls import reverse
-from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Profile, DonationRequest
-
-
-class ProfileModelTest(TestCase):
-    """Test Profile model behavior"""
-    
-    def setUp(self):
-        self.user = User.objects.create_user(
-            username='testuser',
-            email='test@example.com',
-            password='testpass123',
-            first_name='Test',
-            last_name='User'
-        )
-    
-    def test_profile_creation(self):
-        """Test that a profile is created when user is created"""
-        profile = Profile.objects.create(
-            user=self.user,
-            phone='+1234567890',
-            blood_group='O+',
-            city='Test City',
-            is_available=True
-        )
-        self.assertEqual(profile.user, self.user)
-        self.assertEqual(profile.phone, '+1234567890')
-        self.assertEqual(profile.blood_group, 'O+')
-        self.assertEqual(profile.city, 'Test City')
-        self.assertTrue(profile.is_available)
-    
-    def test_profile_str_representation(self):
-        """Test Profile string representation"""
-        profile = Profile.objects.create(
-            user=self.user,
-            blood_group='A+'
-        )
-        expected = f"{self.user.get_full_name()} - A+"
-        self.assertEqual(str(profile), expected)
-    
-    def test_profile_one_to_one_relationship(self):
-        """Test that Profile has one-to-one relationship with User"""
-        profile = Profile.objects.create(user=self.user)
-        # Should not be able to create another profile for same user
-        with self.assertRaises(Exception):
-            Profile.objects.create(user=self.user)
-
-
-class DonationRequestModelTest(TestCase):
-    """Test DonationRequest model behavior"""
-    
-    def setUp(self):
-        self.user = User.objects.create_user(
-            username='testuser',
-            email='test@example.com',
-            password='testpass123'
-        )
-    
-    def test_donation_request_creation(self):
-        """Test creating a donation request"""
-        request = DonationRequest.objects.create(
-            requester=self.user,
-            name='John Doe',
-            blood_group_needed='B+',
-            city='New York',
-            details='Urgent need for blood',
-            status='pending'
-        )
-        self.assertEqual(request.requester, self.user)
-        self.assertEqual(request.name, 'John Doe')
-        self.assertEqual(request.blood_group_needed, 'B+')
-        self.assertEqual(request.city, 'New York')
-        self.assertEqual(request.status, 'pending')
-    
-    def test_donation_request_str_representation(self):
-        """Test DonationRequest string representation"""
-        request = DonationRequest.objects.create(
-            requester=self.user,
-            name='Jane Smith',
-            blood_group_needed='AB-',
-            city='Los Angeles'
-        )
-        expected = "Jane Smith - AB- - Los Angeles"
-        self.assertEqual(str(request), expected)
-    
-    def test_donation_request_default_status(self):
-        """Test that donation request defaults to pending status"""
-        request = DonationRequest.objects.create(
-            requester=self.user,
-            name='Test Name',
-            blood_group_needed='O+',
-            city='Test City'
-        )
-        self.assertEqual(request.status, 'pending')
-    
-    def test_donation_request_ordering(self):
-        """Test that donation requests are ordered by created_at descending"""
-        request1 = DonationRequest.objects.create(
-            requester=self.user,
-            name='First Request',
-            blood_group_needed='A+',
-            city='City1'
-        )
-        request2 = DonationRequest.objects.create(
-            requester=self.user,
-            name='Second Request',
-            blood_group_needed='B+',
-            city='City2'
-        )
-        requests = list(DonationRequest.objects.all())
-        self.assertEqual(requests[0], request2)  # Most recent first
-        self.assertEqual(requests[1], request1)
-
-
-class SignUpFlowTest(TestCase):
-    """Test user signup flow"""
-    
-    def setUp(self):
-        self.client = Client()
-        self.signup_url = reverse('signup')
-    
-    def test_signup_page_loads(self):
-        """Test that signup page loads successfully"""
-        response = self.client.get(self.signup_url)
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'Create Your Account')
-    
-    def test_signup_with_valid_data(self):
-        """Test successful user signup with valid data"""
-        data = {
-            'full_name': 'John Doe',
-            'email': 'john@example.com',
-            'password1': 'SecurePass123!',
-            'password2': 'SecurePass123!',
-            'phone': '+1234567890',
-            'blood_group': 'O+',
-            'city': 'New York',
-            'agree_to_terms': True
-        }
-        response = self.client.post(self.signup_url, data)
-        
-        # Should redirect to dashboard
-        self.assertEqual(response.status_code, 302)
-        self.assertRedirects(response, reverse('dashboard'))
-        
-        # User should be created
-        user = User.objects.get(email='john@example.com')
-        self.assertEqual(user.username, 'john@example.com')
-        self.assertEqual(user.first_name, 'John')
-        self.assertEqual(user.last_name, 'Doe')
-        
-        # Profile should be created
-        profile = Profile.objects.get(user=user)
-        self.assertEqual(profile.phone, '+1234567890')
-        self.assertEqual(profile.blood_group, 'O+')
-        self.assertEqual(profile.city, 'New York')
-    
-    def test_signup_with_duplicate_email(self):
-        """Test that signup fails with duplicate email"""
-        User.objects.create_user(
-            username='existing@example.com',
-            email='existing@example.com',
-            password='testpass123'
-        )
-        
-        data = {
-            'full_name': 'New User',
-            'email': 'existing@example.com',
-            'password1': 'SecurePass123!',
-            'password2': 'SecurePass123!',
-            'agree_to_terms': True
-        }
-        response = self.client.post(self.signup_url, data)
-        
-        # Should not redirect (form errors)
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'already exists')
-        
-        # Should only have one user with this email
-        self.assertEqual(User.objects.filter(email='existing@example.com').count(), 1)
-    
-    def test_signup_with_mismatched_passwords(self):
-        """Test that signup fails with mismatched passwords"""
-        data = {
-            'full_name': 'Test User',
-            'email': 'test@example.com',
-            'password1': 'SecurePass123!',
-            'password2': 'DifferentPass123!',
-            'agree_to_terms': True
-        }
-        response = self.client.post(self.signup_url, data)
-        
-        # Should not redirect (form errors)
-        self.assertEqual(response.status_code, 200)
-        # Check that form has errors on password2 field
-        form = response.context['form']
-        self.assertFalse(form.is_valid())
-        self.assertTrue('password2' in form.errors)
-    
-    def test_signup_without_terms_agreement(self):
-        """Test that signup fails without terms agreement"""
-        data = {
-            'full_name': 'Test User',
-            'email': 'test@example.com',
-            'password1': 'SecurePass123!',
-            'password2': 'SecurePass123!',
-            'agree_to_terms': False
-        }
-        response = self.client.post(self.signup_url, data)
-        
-        # Should not redirect (form errors)
-        self.assertEqual(response.status_code, 200)
-        self.assertFormError(response, 'form', 'agree_to_terms', ['This field is required.'])
-    
-    def test_signup_with_optional_fields(self):
-        """Test signup with only required fields"""
-        data = {
-            'full_name': 'Minimal User',
-            'email': 'minimal@example.com',
-            'password1': 'SecurePass123!',
-            'password2': 'SecurePass123!',
-            'agree_to_terms': True
-        }
-        response = self.client.post(self.signup_url, data)
-        
-        # Should succeed
-        self.assertEqual(response.status_code, 302)
-        
-        user = User.objects.get(email='minimal@example.com')
-        profile = Profile.objects.get(user=user)
-        self.assertEqual(profile.phone, '')
-        self.assertEqual(profile.blood_group, '')
-        self.assertEqual(profile.city, '')
-    
-    def test_signup_user_is_logged_in(self):
-        """Test that user is automatically logged in after signup"""
-        data = {
-            'full_name': 'Auto Login User',
-            'email': 'autologin@example.com',
-            'password1': 'SecurePass123!',
-            'password2': 'SecurePass123!',
-            'agree_to_terms': True
-        }
-        response = self.client.post(self.signup_url, data)
-        
-        # User should be logged in
-        user = User.objects.get(email='autologin@example.com')
-        self.assertTrue(self.client.session.get('_auth_user_id') == str(user.id))
-
-
-class LoginFlowTest(TestCase):
-    """Test user login flow"""
-    
-    def setUp(self):
-        self.client = Client()
-        self.login_url = reverse('login')
-        self.user = User.objects.create_user(
-            username='testuser@example.com',
-            email='testuser@example.com',
-            password='testpass123',
-            first_name='Test',
-            last_name='User'
-        )
-    
-    def test_login_page_loads(self):
-        """Test that login page loads successfully"""
-        response = self.client.get(self.login_url)
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'Welcome Back')
-    
-    def test_login_with_valid_credentials(self):
-        """Test successful login with valid credentials"""
-        data = {
-            'email': 'testuser@example.com',
-            'password': 'testpass123'
-        }
-        response = self.client.post(self.login_url, data)
-        
-        # Should redirect to dashboard
-        self.assertEqual(response.status_code, 302)
-        self.assertRedirects(response, reverse('dashboard'))
-    
-    def test_login_with_invalid_credentials(self):
-        """Test login fails with invalid credentials"""
-        data = {
-            'email': 'testuser@example.com',
-            'password': 'wrongpassword'
-        }
-        response = self.client.post(self.login_url, data)
-        
-        # Should not redirect
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'Invalid email or password')
-    
-    def test_login_redirects_authenticated_users(self):
-        """Test that authenticated users are redirected from login page"""
-        self.client.login(username='testuser@example.com', password='testpass123')
-        response = self.client.get(self.login_url)
-        self.assertEqual(response.status_code, 302)
-        self.assertRedirects(response, reverse('dashboard'))
-
-
-class DashboardTest(TestCase):
-    """Test dashboard functionality"""
-    
-    def setUp(self):
-        self.client = Client()
-        self.user = User.objects.create_user(
-            username='testuser@example.com',
-            email='testuser@example.com',
-            password='testpass123'
-        )
-        self.profile = Profile.objects.create(
-            user=self.user,
-            blood_group='O+',
-            city='Test City'
-        )
-    
-    def test_dashboard_requires_authentication(self):
-        """Test that dashboard requires authentication"""
-        response = self.client.get(reverse('dashboard'))
-        self.assertEqual(response.status_code, 302)  # Redirect to login
-    
-    def test_dashboard_loads_for_authenticated_user(self):
-        """Test that dashboard loads for authenticated user"""
-        self.client.login(username='testuser@example.com', password='testpass123')
-        response = self.client.get(reverse('dashboard'))
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'Welcome back')
-    
-    def test_dashboard_shows_user_profile(self):
-        """Test that dashboard displays user profile information"""
-        self.client.login(username='testuser@example.com', password='testpass123')
-        response = self.client.get(reverse('dashboard'))
-        self.assertContains(response, 'O+')
-        self.assertContains(response, 'Test City')
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse, resolve
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.test.utils import CaptureQueriesContext
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth import authenticate
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db.models import Q
+from django.db.utils import ConnectionHandler
+from django.utils import timezone
+from .models import (
+    Profile, DonationRequest, City, CityAlias, DailyStatusRollup, DonorNotification, HourlyStatusRollup,
+    NotificationOutbox, RequestStatusEvent, SiteCounter, SupplyDemandCell,
+)
+from . import avatars
+from .avatars import THUMBNAIL_SIZES, process_avatar
+from .backends import users_with_email
+from .cities import city_key_filter, normalize_city_key
+from .counters import ACTIVE_REQUESTS, compute_counts, get_landing_stats, reconcile
+from .events import roll_up, summary
+from .expiry import expire_requests, expire_stale_requests, expiry_cutoff, stale_ids
+from .exports import iter_chunks, stream
+from .feeds import request_cards
+from .forms import DonationRequestForm
+from .fragments import fragment_stats, reset_stats
+from .geo import (
+    KM_PER_DEGREE, MAX_RADIUS_KM, bounding_box, covering_cells, encode_geohash, haversine_km, in_cells, nearest,
+    nearest_in, within_radius,
+)
+from .live import POLL_LIMIT, Subscription, get_hub
+from .matching import can_donate_q, compatible_donor_groups, compatible_donors, is_compatible, match_pending_requests
+from .notifications import LeaseLost, RATE_LIMIT, claim_entry, drain_outbox, fan_out
+from .pagination import EstimatedCountPaginator, _after, encode_cursor
+from .routers import PIN_COOKIE, ReplicaPinningMiddleware
+from .search import search_donors
+from .signals import request_status_changed
+from .supply import compute_cells, rebuild, report
+from .transitions import atransition_request
+
+
+class ProfileModelTest(TestCase):
+    """Test Profile model behavior"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='User'
+        )
+    
+    def test_profile_creation(self):
+        """Test that a profile is created when user is created"""
+        profile = Profile.objects.create(
+            user=self.user,
+            phone='+1234567890',
+            blood_group='O+',
+            city='Test City',
+            is_available=True
+        )
+        self.assertEqual(profile.user, self.user)
+        self.assertEqual(profile.phone, '+1234567890')
+        self.assertEqual(profile.blood_group, 'O+')
+        self.assertEqual(profile.city, 'Test City')
+        self.assertTrue(profile.is_available)
+    
+    def test_profile_str_representation(self):
+        """Test Profile string representation"""
+        profile = Profile.objects.create(
+            user=self.user,
+            blood_group='A+'
+        )
+        expected = f"{self.user.get_full_name()} - A+"
+        self.assertEqual(str(profile), expected)
+    
+    def test_profile_one_to_one_relationship(self):
+        """Test that Profile has one-to-one relationship with User"""
+        profile = Profile.objects.create(user=self.user)
+        # Should not be able to create another profile for same user
+        with self.assertRaises(Exception):
+            Profile.objects.create(user=self.user)
+
+
+class DonationRequestModelTest(TestCase):
+    """Test DonationRequest model behavior"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+    
+    def test_donation_request_creation(self):
+        """Test creating a donation request"""
+        request = DonationRequest.objects.create(
+            requester=self.user,
+            name='John Doe',
+            blood_group_needed='B+',
+            city='New York',
+            details='Urgent need for blood',
+            status='pending'
+        )
+        self.assertEqual(request.requester, self.user)
+        self.assertEqual(request.name, 'John Doe')
+        self.assertEqual(request.blood_group_needed, 'B+')
+        self.assertEqual(request.city, 'New York')
+        self.assertEqual(request.status, 'pending')
+    
+    def test_donation_request_str_representation(self):
+        """Test DonationRequest string representation"""
+        request = DonationRequest.objects.create(
+            requester=self.user,
+            name='Jane Smith',
+            blood_group_needed='AB-',
+            city='Los Angeles'
+        )
+        expected = "Jane Smith - AB- - Los Angeles"
+        self.assertEqual(str(request), expected)
+    
+    def test_donation_request_default_status(self):
+        """Test that donation request defaults to pending status"""
+        request = DonationRequest.objects.create(
+            requester=self.user,
+            name='Test Name',
+            blood_group_needed='O+',
+            city='Test City'
+        )
+        self.assertEqual(request.status, 'pending')
+    
+    def test_donation_request_ordering(self):
+        """Test that donation requests are ordered by created_at descending"""
+        request1 = DonationRequest.objects.create(
+            requester=self.user,
+            name='First Request',
+            blood_group_needed='A+',
+            city='City1'
+        )
+        request2 = DonationRequest.objects.create(
+            requester=self.user,
+            name='Second Request',
+            blood_group_needed='B+',
+            city='City2'
+        )
+        requests = list(DonationRequest.objects.all())
+        self.assertEqual(requests[0], request2)  # Most recent first
+        self.assertEqual(requests[1], request1)
+
+
+class SignUpFlowTest(TestCase):
+    """Test user signup flow"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.signup_url = reverse('signup')
+    
+    def test_signup_page_loads(self):
+        """Test that signup page loads successfully"""
+        response = self.client.get(self.signup_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Create Your Account')
+    
+    def test_signup_with_valid_data(self):
+        """Test successful user signup with valid data"""
+        data = {
+            'full_name': 'John Doe',
+            'email': 'john@example.com',
+            'password1': 'SecurePass123!',
+            'password2': 'SecurePass123!',
+            'phone': '+1234567890',
+            'blood_group': 'O+',
+            'city': 'New York',
+            'agree_to_terms': True
+        }
+        response = self.client.post(self.signup_url, data)
+        
+        # Should redirect to dashboard
+        self.assertEqual(response.status_code, 302)
+        self.assertRedirects(response, reverse('dashboard'))
+        
+        # User should be created
+        user = User.objects.get(email='john@example.com')
+        self.assertEqual(user.username, 'john@example.com')
+        self.assertEqual(user.first_name, 'John')
+        self.assertEqual(user.last_name, 'Doe')
+        
+        # Profile should be created
+        profile = Profile.objects.get(user=user)
+        self.assertEqual(profile.phone, '+1234567890')
+        self.assertEqual(profile.blood_group, 'O+')
+        self.assertEqual(profile.city, 'New York')
+    
+    def test_signup_with_duplicate_email(self):
+        """Test that signup fails with duplicate email"""
+        User.objects.create_user(
+            username='existing@example.com',
+            email='existing@example.com',
+            password='testpass123'
+        )
+        
+        data = {
+            'full_name': 'New User',
+            'email': 'existing@example.com',
+            'password1': 'SecurePass123!',
+            'password2': 'SecurePass123!',
+            'agree_to_terms': True
+        }
+        response = self.client.post(self.signup_url, data)
+        
+        # Should not redirect (form errors)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'already exists')
+        
+        # Should only have one user with this email
+        self.assertEqual(User.objects.filter(email='existing@example.com').count(), 1)
+    
+    def test_signup_with_mismatched_passwords(self):
+        """Test that signup fails with mismatched passwords"""
+        data = {
+            'full_name': 'Test User',
+            'email': 'test@example.com',
+            'password1': 'SecurePass123!',
+            'password2': 'DifferentPass123!',
+            'agree_to_terms': True
+        }
+        response = self.client.post(self.signup_url, data)
+        
+        # Should not redirect (form errors)
+        self.assertEqual(response.status_code, 200)
+        # Check that form has errors on password2 field
+        form = response.context['form']
+        self.assertFalse(form.is_valid())
+        self.assertTrue('password2' in form.errors)
+    
+    def test_signup_without_terms_agreement(self):
+        """Test that signup fails without terms agreement"""
+        data = {
+            'full_name': 'Test User',
+            'email': 'test@example.com',
+            'password1': 'SecurePass123!',
+            'password2': 'SecurePass123!',
+            'agree_to_terms': False
+        }
+        response = self.client.post(self.signup_url, data)
+        
+        # Should not redirect (form errors)
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'agree_to_terms', ['This field is required.'])
+    
+    def test_signup_with_optional_fields(self):
+        """Test signup with only required fields"""
+        data = {
+            'full_name': 'Minimal User',
+            'email': 'minimal@example.com',
+            'password1': 'SecurePass123!',
+            'password2': 'SecurePass123!',
+            'agree_to_terms': True
+        }
+        response = self.client.post(self.signup_url, data)
+        
+        # Should succeed
+        self.assertEqual(response.status_code, 302)
+        
+        user = User.objects.get(email='minimal@example.com')
+        profile = Profile.objects.get(user=user)
+        self.assertEqual(profile.phone, '')
+        self.assertEqual(profile.blood_group, '')
+        self.assertEqual(profile.city, '')
+    
+    def test_signup_user_is_logged_in(self):
+        """Test that user is automatically logged in after signup"""
+        data = {
+            'full_name': 'Auto Login User',
+            'email': 'autologin@example.com',
+            'password1': 'SecurePass123!',
+            'password2': 'SecurePass123!',
+            'agree_to_terms': True
+        }
+        response = self.client.post(self.signup_url, data)
+        
+        # User should be logged in
+        user = User.objects.get(email='autologin@example.com')
+        self.assertTrue(self.client.session.get('_auth_user_id') == str(user.id))
+
+
+class LoginFlowTest(TestCase):
+    """Test user login flow"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.login_url = reverse('login')
+        self.user = User.objects.create_user(
+            username='testuser@example.com',
+            email='testuser@example.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='User'
+        )
+    
+    def test_login_page_loads(self):
+        """Test that login page loads successfully"""
+        response = self.client.get(self.login_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Welcome Back')
+    
+    def test_login_with_valid_credentials(self):
+        """Test successful login with valid credentials"""
+        data = {
+            'email': 'testuser@example.com',
+            'password': 'testpass123'
+        }
+        response = self.client.post(self.login_url, data)
+        
+        # Should redirect to dashboard
+        self.assertEqual(response.status_code, 302)
+        self.assertRedirects(response, reverse('dashboard'))
+    
+    def test_login_with_invalid_credentials(self):
+        """Test login fails with invalid credentials"""
+        data = {
+            'email': 'testuser@example.com',
+            'password': 'wrongpassword'
+        }
+        response = self.client.post(self.login_url, data)
+        
+        # Should not redirect
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Invalid email or password')
+    
+    def test_login_redirects_authenticated_users(self):
+        """Test that authenticated users are redirected from login page"""
+        self.client.login(username='testuser@example.com', password='testpass123')
+        response = self.client.get(self.login_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertRedirects(response, reverse('dashboard'))
+
+
+class DashboardTest(TestCase):
+    """Test dashboard functionality"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser@example.com',
+            email='testuser@example.com',
+            password='testpass123'
+        )
+        self.profile = Profile.objects.create(
+            user=self.user,
+            blood_group='O+',
+            city='Test City'
+        )
+    
+    def test_dashboard_requires_authentication(self):
+        """Test that dashboard requires authentication"""
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 302)  # Redirect to login
+    
+    def test_dashboard_loads_for_authenticated_user(self):
+        """Test that dashboard loads for authenticated user"""
+        self.client.login(username='testuser@example.com', password='testpass123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Welcome back')
+    
+    def test_dashboard_shows_user_profile(self):
+        """Test that dashboard displays user profile information"""
+        self.client.login(username='testuser@example.com', password='testpass123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'O+')
+        self.assertContains(response, 'Test City')
+
+
+class DonorSearchTest(TestCase):
+    """Test the donor search API"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='searcher@example.com',
+            email='searcher@example.com',
+            password='testpass123'
+        )
+        for i in range(5):
+            donor = User.objects.create_user(
+                username=f'donor{i}@example.com',
+                password='testpass123',
+                first_name='Donor',
+                last_name=str(i)
+            )
+            Profile.objects.create(user=donor, blood_group='O+', city='Delhi', is_available=True, phone='+919999990001')
+        unavailable = User.objects.create_user(username='busy@example.com', password='testpass123')
+        Profile.objects.create(user=unavailable, blood_group='O+', city='Delhi', is_available=False)
+        other_city = User.objects.create_user(username='far@example.com', password='testpass123')
+        Profile.objects.create(user=other_city, blood_group='O+', city='Agra', is_available=True)
+        self.client.login(username='searcher@example.com', password='testpass123')
+
+    def test_search_requires_authentication(self):
+        """Test that donor search requires authentication"""
+        response = Client().get(reverse('donor_search'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_search_filters_by_group_city_and_availability(self):
+        """Test that only available donors in the given group and city are returned"""
+        response = self.client.get(reverse('donor_search'), {'blood_group': 'O+', 'city': 'Delhi'})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(set(data['results'][0]), {'id', 'name', 'blood_group', 'city', 'phone'})
+        self.assertTrue(all(d['city'] == 'Delhi' for d in data['results']))
+
+    def test_search_keyset_pagination(self):
+        """Test that following next_cursor walks every result exactly once"""
+        seen = []
+        params = {'blood_group': 'O+', 'city': 'Delhi', 'limit': 2}
+        while True:
+            data = self.client.get(reverse('donor_search'), params).json()
+            seen.extend(d['id'] for d in data['results'])
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_search_rejects_bad_input(self):
+        """Test that invalid blood groups and cursors are rejected"""
+        response = self.client.get(reverse('donor_search'), {'blood_group': 'Z+'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('donor_search'), {'blood_group': 'O+', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_rejects_cursor_values_of_the_wrong_type(self):
+        """Test that well-formed cursors holding something other than an id are a 400, not a 500"""
+        for values in ([{'a': 1}], ['abc'], [None], [1.5], [True], [[1]]):
+            response = self.client.get(reverse('donor_search'), {'blood_group': 'O+', 'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+            self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+
+class MatchingTest(TestCase):
+    """Test ABO/Rh compatibility matching"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        Profile.objects.create(user=self.requester, blood_group='A+', city='Delhi', is_available=True)
+
+    def make_donor(self, username, blood_group, city='Delhi', **kwargs):
+        user = User.objects.create_user(username=username, password='testpass123')
+        return Profile.objects.create(user=user, blood_group=blood_group, city=city, is_available=True, **kwargs)
+
+    def test_compatibility_table(self):
+        """Test the precomputed compatibility bitmasks"""
+        self.assertEqual(compatible_donor_groups('O-'), ['O-'])
+        self.assertEqual(len(compatible_donor_groups('AB+')), 8)
+        self.assertEqual(set(compatible_donor_groups('A+')), {'A+', 'A-', 'O+', 'O-'})
+        self.assertTrue(is_compatible('O-', 'B+'))
+        self.assertFalse(is_compatible('A+', 'O+'))
+        self.assertFalse(is_compatible('B-', 'A-'))
+
+    def test_compatible_donors_ranking(self):
+        """Test that same-city donors rank first, exact matches first among them, and ineligible donors are left out"""
+        far_exact = self.make_donor('far@example.com', 'A+', city='Agra')
+        near_universal = self.make_donor('universal@example.com', 'O-')
+        rested = self.make_donor('rested@example.com', 'O+', last_donation_date=date.today() - timedelta(days=56))
+        near_exact = self.make_donor('exact@example.com', 'A+', city='New Delhi')
+        self.make_donor('recent@example.com', 'O+', last_donation_date=date.today())
+        self.make_donor('incompatible@example.com', 'B+')
+        donation_request = DonationRequest.objects.create(
+            requester=self.requester, name='Patient', blood_group_needed='A+', city='Delhi'
+        )
+        self.assertEqual(compatible_donors(donation_request), [near_exact, rested, near_universal, far_exact])
+        # Other cities are only read when the city runs short
+        with self.assertNumQueries(1):
+            self.assertEqual(compatible_donors(donation_request, limit=3), [near_exact, rested, near_universal])
+        rows = compatible_donors(donation_request, limit=2, fields=['id', 'blood_group'])
+        self.assertEqual(rows, [{'id': near_exact.id, 'blood_group': 'A+'}, {'id': rested.id, 'blood_group': 'O+'}])
+
+        # Each group's newest same-city donors are one index range, read in id order
+        plan = Profile.objects.filter(can_donate_q(), blood_group='O+', city_key='delhi').order_by('-id')[:20].explain()
+        self.assertIn('profile_eligible_idx (blood_group=? AND city_key=?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_batch_matching_uses_constant_queries(self):
+        """Test that batch matching does not issue one query per request"""
+        o_neg = self.make_donor('oneg@example.com', 'O-')
+        b_pos = self.make_donor('bpos@example.com', 'B+')
+        requests = [
+            DonationRequest.objects.create(requester=self.requester, name=f'Patient {i}', blood_group_needed=group, city='Delhi')
+            for i, group in enumerate(['A+', 'B+', 'O-', 'AB+'] * 5)
+        ]
+        with self.assertNumQueries(2):
+            matches = match_pending_requests()
+        self.assertEqual(matches[requests[0].id], [o_neg])
+        self.assertEqual(matches[requests[1].id], [b_pos, o_neg])
+        self.assertEqual(matches[requests[3].id], [b_pos, o_neg])
+
+    def test_request_matches_endpoint(self):
+        """Test that only the requester can list matches for a request"""
+        self.make_donor('oneg@example.com', 'O-')
+        donation_request = DonationRequest.objects.create(
+            requester=self.requester, name='Patient', blood_group_needed='A+', city='Delhi'
+        )
+        url = reverse('request_matches', args=[donation_request.id])
+        self.client.login(username='requester@example.com', password='testpass123')
+        data = self.client.get(url).json()
+        self.assertEqual([d['blood_group'] for d in data['results']], ['O-'])
+
+        User.objects.create_user(username='other@example.com', password='testpass123')
+        self.client.login(username='other@example.com', password='testpass123')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class LandingStatsTest(TestCase):
+    """Test incrementally maintained landing page counters"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='counter@example.com', password='testpass123')
+
+    def stats(self):
+        return get_landing_stats()
+
+    def test_counters_follow_profile_and_request_changes(self):
+        """Test that saves and deletes are applied as counter deltas"""
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = Profile.objects.create(user=self.user, is_available=True)
+            donation_request = DonationRequest.objects.create(
+                requester=self.user, name='Patient', blood_group_needed='O+', city='Delhi'
+            )
+        self.assertEqual(self.stats(), {'total_donors': 1, 'lives_saved': 0, 'active_requests': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            donation_request.status = 'accepted'
+            donation_request.save()
+            profile.is_available = False
+            profile.save()
+            profile.save()
+        self.assertEqual(self.stats(), {'total_donors': 0, 'lives_saved': 1, 'active_requests': 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            donation_request.delete()
+        self.assertEqual(self.stats(), {'total_donors': 0, 'lives_saved': 0, 'active_requests': 0})
+        self.assertEqual(self.stats(), compute_counts())
+
+    def test_reconcile_fixes_drift(self):
+        """Test that reconcile corrects counters bypassed by queryset updates"""
+        Profile.objects.create(user=self.user, is_available=True)
+        Profile.objects.update(is_available=False)
+        self.assertEqual(reconcile()['total_donors'], -1)
+        self.assertEqual(self.stats()['total_donors'], 0)
+
+    def test_landing_runs_no_count_queries(self):
+        """Test that the landing page reads counters rather than counting rows"""
+        Profile.objects.create(user=self.user, is_available=True)
+        with self.assertNumQueries(1) as ctx:
+            response = self.client.get(reverse('landing'))
+        self.assertNotIn('COUNT(', ctx.captured_queries[0]['sql'].upper())
+        self.assertEqual(response.context['stats']['total_donors'], 1)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('landing'))
+
+
+class AcceptRejectTest(TestCase):
+    """Test accepting and rejecting donation requests"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        self.donor = User.objects.create_user(username='donor@example.com', password='testpass123')
+        self.donation_request = DonationRequest.objects.create(
+            requester=self.requester, name='Patient', blood_group_needed='O+', city='Delhi'
+        )
+        self.accept_url = reverse('accept_request', args=[self.donation_request.id])
+        self.reject_url = reverse('reject_request', args=[self.donation_request.id])
+
+    def test_accept_writes_only_changed_columns(self):
+        """Test that accepting issues one conditional UPDATE of status, accepted_by and updated_at"""
+        self.client.login(username='donor@example.com', password='testpass123')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.accept_url)
+        self.assertEqual(response.status_code, 200)
+        request_queries = [q['sql'] for q in ctx.captured_queries
+                           if 'bloodshare_donationrequest' in q['sql']
+                           # The status event and supply/demand cell read it in subqueries, and
+                           # the fragment cache needs the requester
+                           and not q['sql'].startswith(('INSERT INTO bloodshare_requeststatusevent',
+                                                        'UPDATE "bloodshare_supplydemandcell"',
+                                                        'SELECT "bloodshare_donationrequest"."requester_id"'))]
+        self.assertEqual(len(request_queries), 1)
+        self.assertTrue(request_queries[0].startswith('UPDATE'))
+        self.assertIn("\"status\" = 'pending'", request_queries[0])
+        self.assertNotIn('"details"', request_queries[0])
+        self.donation_request.refresh_from_db()
+        self.assertEqual(self.donation_request.status, 'accepted')
+        self.assertEqual(self.donation_request.accepted_by, self.donor)
+
+    def test_second_accept_conflicts(self):
+        """Test that accepting an already accepted request returns 409"""
+        self.client.login(username='donor@example.com', password='testpass123')
+        self.client.post(self.accept_url)
+        self.assertEqual(self.client.post(self.accept_url).status_code, 409)
+        self.assertEqual(self.client.post(self.reject_url).status_code, 409)
+
+    def test_cannot_accept_or_reject_own_request(self):
+        """Test that the requester cannot act on their own request"""
+        self.client.login(username='requester@example.com', password='testpass123')
+        self.assertEqual(self.client.post(self.accept_url).status_code, 400)
+        self.assertEqual(self.client.post(self.reject_url).status_code, 400)
+
+    def test_unknown_request_not_found(self):
+        """Test that unknown requests return 404"""
+        self.client.login(username='donor@example.com', password='testpass123')
+        response = self.client.post(reverse('accept_request', args=[self.donation_request.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_reject_updates_counters(self):
+        """Test that conditional updates still keep the landing counters in step"""
+        self.client.login(username='donor@example.com', password='testpass123')
+        self.client.post(self.reject_url)
+        cache.clear()
+        self.assertEqual(get_landing_stats(), compute_counts())
+
+
+class AcceptConcurrencyTest(TransactionTestCase):
+    """Stress test racing accepts against a single request"""
+
+    workers = 16
+
+    def test_exactly_one_winner(self):
+        """Test that many simultaneous accepts produce exactly one winner"""
+        requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        donation_request = DonationRequest.objects.create(
+            requester=requester, name='Patient', blood_group_needed='O+', city='Delhi'
+        )
+        clients = []
+        for i in range(self.workers):
+            donor = User.objects.create_user(username=f'donor{i}@example.com', password='testpass123')
+            client = Client()
+            client.force_login(donor)
+            clients.append(client)
+
+        url = reverse('accept_request', args=[donation_request.id])
+        barrier = threading.Barrier(self.workers)
+        statuses = []
+
+        def accept(client):
+            try:
+                barrier.wait()
+                statuses.append(client.post(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=accept, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [200] + [409] * (self.workers - 1))
+        donation_request.refresh_from_db()
+        self.assertEqual(donation_request.status, 'accepted')
+        self.assertIsNotNone(donation_request.accepted_by)
+
+
+class QueryBudgetTest(TestCase):
+    """Per-view query budgets; a failure here means a view grew an N+1"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='budget@example.com',
+            email='budget@example.com',
+            password='testpass123',
+            first_name='Budget',
+            last_name='User'
+        )
+        Profile.objects.create(user=self.user, blood_group='O+', city='Delhi', is_available=True)
+        self.other = User.objects.create_user(username='other@example.com', password='testpass123')
+        self.client.login(username='budget@example.com', password='testpass123')
+
+    def add_requests(self, count):
+        DonationRequest.objects.bulk_create([
+            DonationRequest(requester=requester, name=f'Patient {i}', blood_group_needed='A+',
+                            city='Delhi', details='x' * 5000)
+            for i in range(count)
+            for requester in (self.user, self.other)
+        ])
+
+    def test_dashboard_query_count_is_constant(self):
+        """Test that the dashboard runs the same number of queries for 1 or 30 rows per list"""
+        # session, user, profile, user requests, browse requests
+        self.add_requests(1)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('dashboard'))
+        self.add_requests(29)
+        # bulk_create skips the signals that invalidate the cached lists
+        cache.clear()
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['all_requests']), 20)
+
+    def test_dashboard_does_not_load_full_details(self):
+        """Test that request lists load a bounded preview instead of the details column"""
+        self.add_requests(1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        list_queries = [q['sql'] for q in ctx.captured_queries if 'FROM "bloodshare_donationrequest"' in q['sql']]
+        self.assertEqual(len(list_queries), 2)
+        for sql in list_queries:
+            self.assertIn('SUBSTR', sql.upper())
+        self.assertNotContains(response, 'x' * 200)
+
+    def test_landing_query_budget(self):
+        """Test that a warm landing page runs no queries"""
+        self.client.logout()
+        self.client.get(reverse('landing'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('landing'))
+
+    def test_donor_search_query_budget(self):
+        """Test that a donor search page is a single query after authentication"""
+        # session, user, search
+        with self.assertNumQueries(3):
+            self.client.get(reverse('donor_search'), {'blood_group': 'O+', 'city': 'Delhi'})
+
+    def test_accept_query_budget(self):
+        """Test that accepting a request is a single UPDATE plus counter and cell deltas and a status event"""
+        self.add_requests(1)
+        donation_request = DonationRequest.objects.filter(requester=self.other).get()
+        # session, user, savepoint, UPDATE, requester, supply/demand cell, two counter deltas, status event, release
+        with self.assertNumQueries(10):
+            self.client.post(reverse('accept_request', args=[donation_request.id]))
+
+
+class RequestFeedTest(TestCase):
+    """Test the keyset-paginated request feed"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='browser@example.com', password='testpass123')
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        DonationRequest.objects.bulk_create([
+            DonationRequest(requester=self.requester, name=f'Patient {i}',
+                            blood_group_needed='A+' if i % 2 else 'O-', city='Delhi')
+            for i in range(25)
+        ])
+        DonationRequest.objects.create(requester=self.user, name='Mine', blood_group_needed='A+', city='Delhi')
+        self.client.login(username='browser@example.com', password='testpass123')
+
+    def test_feed_pages_through_everything_once(self):
+        """Test that following cursors yields every other user's pending request exactly once"""
+        seen = []
+        params = {'limit': 7}
+        while True:
+            data = self.client.get(reverse('request_feed'), params).json()
+            seen.extend(r['id'] for r in data['results'])
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        expected = list(DonationRequest.objects.filter(requester=self.requester).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_feed_rejects_bad_cursor_timestamps(self):
+        """Test that cursors without a valid, timezone-aware created_at are a 400, not a 500"""
+        for values in (['notadate', 1], [None, 1], ['2024-13-45T00:00:00+00:00', 1], ['2024-01-01', 1],
+                       ['2024-01-01T00:00:00', 1], [1, 1], ['2024-01-01T00:00:00+00:00', '1']):
+            response = self.client.get(reverse('request_feed'), {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+            self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+    def test_feed_filters(self):
+        """Test that status and blood group filters apply"""
+        data = self.client.get(reverse('request_feed'), {'blood_group': 'O-', 'limit': 50}).json()
+        self.assertEqual(len(data['results']), 13)
+        data = self.client.get(reverse('request_feed'), {'status': 'accepted'}).json()
+        self.assertEqual(data['results'], [])
+        self.assertEqual(self.client.get(reverse('request_feed'), {'status': 'bogus'}).status_code, 400)
+
+    def test_dashboard_links_to_next_page(self):
+        """Test that the dashboard renders a load-more cursor when there are more requests"""
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['all_requests']), 20)
+        self.assertContains(response, response.context['next_cursor'])
+
+    def test_feed_uses_index(self):
+        """Test that feed pages are served from the (status, created_at, id) index"""
+        queryset = request_cards(DonationRequest.objects.filter(status='pending').exclude(requester=self.user))
+        queryset = queryset.filter(_after(('created_at', 'id'), [timezone.now(), 10])).order_by('-created_at', '-id')
+        plan = queryset[:21].explain()
+        self.assertIn('request_feed_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class EmailBackendTest(TestCase):
+    """Test case-insensitive email authentication"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='mixed@example.com',
+            email='Mixed.Case@Example.com',
+            password='testpass123'
+        )
+
+    def test_login_is_case_insensitive(self):
+        """Test that users can sign in with any casing of their email"""
+        self.assertEqual(authenticate(email='mixed.case@example.com', password='testpass123'), self.user)
+        self.assertEqual(authenticate(email=' MIXED.CASE@EXAMPLE.COM', password='testpass123'), self.user)
+        self.assertIsNone(authenticate(email='mixed.case@example.com', password='wrong'))
+
+    def test_lookup_uses_functional_index(self):
+        """Test that the email lookup is a single indexed query"""
+        self.assertIn('bloodshare_user_email_ci_uniq', users_with_email('a@example.com').explain())
+
+    def test_email_is_unique_ignoring_case(self):
+        """Test that the database rejects emails differing only by case"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='dupe', email='MIXED.case@example.com')
+        # Users without an email are not constrained
+        User.objects.create_user(username='blank1')
+        User.objects.create_user(username='blank2')
+
+    def test_non_ascii_email_logs_in(self):
+        """Test that the lookup folds case exactly as SQLite's LOWER() does"""
+        user = User.objects.create_user(username='emile', email='ÉMILE@Example.com', password='testpass123')
+        self.assertEqual(authenticate(email='ÉMILE@EXAMPLE.COM', password='testpass123'), user)
+        self.assertEqual(authenticate(email='Émile@example.com', password='testpass123'), user)
+
+    def test_migration_lists_case_duplicates(self):
+        """Test that the unique index migration names the accounts that would break it"""
+        migration = importlib.import_module('bloodshare.migrations.0006_user_email_ci_unique')
+        migration.check_case_insensitive_duplicates(apps, None)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX bloodshare_user_email_ci_uniq')
+        dupe = User.objects.create_user(username='dupe', email='mixed.case@EXAMPLE.com')
+        with self.assertRaises(RuntimeError) as raised:
+            migration.check_case_insensitive_duplicates(apps, None)
+        # create_user() lowercases the domain
+        self.assertIn(f'Mixed.Case@example.com (id {self.user.id}), mixed.case@example.com (id {dupe.id})',
+                      str(raised.exception))
+
+    def test_unknown_email_still_hashes(self):
+        """Test that unknown emails pay the password hashing cost"""
+        with mock.patch('django.contrib.auth.base_user.make_password') as make_password:
+            self.assertIsNone(authenticate(email='nobody@example.com', password='testpass123'))
+        make_password.assert_called_once_with('testpass123')
+
+    def test_signup_rejects_case_variant_email(self):
+        """Test that signup treats emails case-insensitively"""
+        response = self.client.post(reverse('signup'), {
+            'full_name': 'Copy Cat',
+            'email': 'MIXED.CASE@example.com',
+            'password1': 'SecurePass123!',
+            'password2': 'SecurePass123!',
+            'agree_to_terms': True
+        })
+        self.assertContains(response, 'already exists')
+
+
+@override_settings(ROOT_URLCONF='bloodshare_project.asgi_urls')
+class AsyncApiTest(TestCase):
+    """Test the async API views served under ASGI"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        self.donor = User.objects.create_user(username='donor@example.com', password='testpass123')
+        self.profile = Profile.objects.create(user=self.donor, blood_group='O+', is_available=False)
+        self.donation_request = DonationRequest.objects.create(
+            requester=self.requester, name='Patient', blood_group_needed='O+', city='Delhi'
+        )
+        self.async_client.force_login(self.donor)
+
+    def test_async_views_are_routed(self):
+        """Test that the ASGI URLconf resolves the API to coroutine views"""
+        match = resolve(reverse('accept_request', args=[self.donation_request.id]))
+        self.assertTrue(asyncio.iscoroutinefunction(match.func))
+
+    async def test_toggle_availability(self):
+        """Test toggling availability through the async view"""
+        response = await self.async_client.post(reverse('toggle_availability'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_available'])
+        await self.profile.arefresh_from_db()
+        self.assertTrue(self.profile.is_available)
+
+    async def test_accept_then_conflict(self):
+        """Test that the async accept has the same race semantics as the sync one"""
+        url = reverse('accept_request', args=[self.donation_request.id])
+        self.assertEqual((await self.async_client.post(url)).status_code, 200)
+        self.assertEqual((await self.async_client.post(url)).status_code, 409)
+        await self.donation_request.arefresh_from_db()
+        self.assertEqual(self.donation_request.status, 'accepted')
+        self.assertEqual(self.donation_request.accepted_by_id, self.donor.id)
+
+    async def test_transition_rolls_back_with_its_receivers(self):
+        """Test that the UPDATE and the status event commit or fail together"""
+        with mock.patch('bloodshare.events.record_transitions', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            await atransition_request(self.donation_request.id, 'pending', 'accepted', accepted_by=self.donor)
+        self.assertEqual((await DonationRequest.objects.aget(id=self.donation_request.id)).status, 'pending')
+
+    async def test_reject_and_method_and_auth_checks(self):
+        """Test rejecting, GET rejection and anonymous redirects"""
+        url = reverse('reject_request', args=[self.donation_request.id])
+        self.assertEqual((await self.async_client.get(url)).status_code, 405)
+        self.assertEqual((await self.async_client.post(url)).status_code, 200)
+        self.async_client.cookies.clear()
+        self.assertEqual((await self.async_client.post(url)).status_code, 302)
+
+
+class GenerateDataCommandTest(TestCase):
+    """Test the synthetic data generator"""
+
+    def test_generates_valid_reproducible_data(self):
+        """Test that generated rows pass model validation and respect the seed"""
+        call_command('generate_data', users=40, requests=10, batch_size=15, seed=5, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Profile.objects.count(), 40)
+        self.assertEqual(DonationRequest.objects.count(), 10)
+        for profile in Profile.objects.select_related('user')[:10]:
+            profile.full_clean()
+        self.assertTrue(User.objects.get(username='donor0@example.com').check_password('SamplePass123!'))
+        first_run = list(Profile.objects.order_by('user__username').values_list('blood_group', 'city', 'phone'))
+
+        Profile.objects.all().delete()
+        DonationRequest.objects.all().delete()
+        User.objects.all().delete()
+        call_command('generate_data', users=40, requests=10, batch_size=15, seed=5, stdout=StringIO())
+        second_run = list(Profile.objects.order_by('user__username').values_list('blood_group', 'city', 'phone'))
+        self.assertEqual(first_run, second_run)
+
+    def test_workers_build_the_same_data(self):
+        """Test that a worker pool inserts the same rows as a single process"""
+        def snapshot():
+            return (
+                list(Profile.objects.order_by('user__username').values_list('user__username', 'blood_group', 'city', 'phone')),
+                list(DonationRequest.objects.order_by('requester__username', 'name', 'city').values_list(
+                    'requester__username', 'accepted_by__username', 'name', 'city', 'status', 'geohash',
+                )),
+            )
+
+        call_command('generate_data', users=60, requests=30, batch_size=10, seed=3, workers=2, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(DonationRequest.objects.count(), 30)
+        pooled = snapshot()
+
+        Profile.objects.all().delete()
+        DonationRequest.objects.all().delete()
+        User.objects.all().delete()
+        call_command('generate_data', users=60, requests=30, batch_size=10, seed=3, stdout=StringIO())
+        self.assertEqual(pooled, snapshot())
+
+    def test_counters_are_reconciled(self):
+        """Test that bulk-inserted rows are reflected in the landing counters"""
+        call_command('generate_data', users=30, requests=20, stdout=StringIO())
+        self.assertEqual(dict(SiteCounter.objects.values_list('name', 'value')), compute_counts())
+        self.assertEqual(rebuild(), {})
+
+
+class ProximitySearchTest(TestCase):
+    """Test geohash-indexed proximity search"""
+
+    # Connaught Place, Delhi
+    ORIGIN = (28.6315, 77.2167)
+
+    def setUp(self):
+        self.client = Client()
+        self.searcher = User.objects.create_user(username='searcher@example.com', password='testpass123')
+        self.client.login(username='searcher@example.com', password='testpass123')
+
+    def make_donor(self, username, blood_group='O+', offset_km=(0, 0), **kwargs):
+        user = User.objects.create_user(username=username, password='testpass123', first_name=username.split('@')[0])
+        latitude = self.ORIGIN[0] + offset_km[0] / KM_PER_DEGREE
+        longitude = self.ORIGIN[1] + offset_km[1] / KM_PER_DEGREE
+        return Profile.objects.create(
+            user=user, blood_group=blood_group, city='Delhi', is_available=True,
+            latitude=latitude, longitude=longitude, **kwargs
+        )
+
+    def test_geohash_follows_coordinates(self):
+        """Test the geohash encoding and that save() keeps it in step"""
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        profile = self.make_donor('donor@example.com')
+        self.assertTrue(profile.geohash.startswith('ttnfv'))
+        profile.latitude = profile.longitude = None
+        profile.save(update_fields=['latitude', 'longitude'])
+        profile.refresh_from_db()
+        self.assertEqual(profile.geohash, '')
+
+    def test_location_form_needs_both_coordinates(self):
+        """Test that a latitude without a longitude is rejected"""
+        form = DonationRequestForm(data={'name': 'Patient', 'blood_group_needed': 'A+', 'city': 'Delhi', 'latitude': '28.6'})
+        self.assertFalse(form.is_valid())
+
+    def test_nearest_matches_brute_force(self):
+        """Test that k-NN agrees with sorting every donor by distance, across cell edges"""
+        rng = random.Random(3)
+        for i in range(60):
+            self.make_donor(f'donor{i}@example.com', offset_km=(rng.uniform(-30, 30), rng.uniform(-30, 30)))
+        queryset = Profile.objects.all()
+        rows = list(queryset.order_by('geohash'))
+        hashes = [p.geohash for p in rows]
+        for _ in range(5):
+            latitude = self.ORIGIN[0] + rng.uniform(-0.2, 0.2)
+            longitude = self.ORIGIN[1] + rng.uniform(-0.2, 0.2)
+            expected = sorted(queryset, key=lambda p: haversine_km(latitude, longitude, p.latitude, p.longitude))[:7]
+            self.assertEqual([p for _, p in nearest(queryset, latitude, longitude, 7)], expected)
+            self.assertEqual([p for _, p in nearest_in(rows, hashes, latitude, longitude, 7)], expected)
+
+    def test_search_stops_at_max_radius(self):
+        """Test that k-NN never reads past MAX_RADIUS_KM, and the bounding box is applied in SQL"""
+        near = self.make_donor('near@example.com', offset_km=(0, 5))
+        self.make_donor('far@example.com', offset_km=(MAX_RADIUS_KM + 20, 0))
+        queryset = Profile.objects.all()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual([p for _, p in nearest(queryset, *self.ORIGIN, 5)], [near])
+        self.assertEqual([p for _, p in nearest(queryset, *self.ORIGIN, 5, max_radius_km=10_000)], [near])
+        self.assertIn('"latitude" >=', queries[-1]['sql'])
+        self.assertNotIn('"geohash" > \'\'', ' '.join(query['sql'] for query in queries))
+
+    def test_bounding_box_contains_the_circle(self):
+        """Test that the box keeps every point of the circle, including across the antimeridian"""
+        rng = random.Random(7)
+        for latitude, longitude in ((28.6, 77.2), (-70, 179.5), (64, -179.9), (0, 0)):
+            box = bounding_box(latitude, longitude, 100)
+            for _ in range(200):
+                lat = latitude + rng.uniform(-1, 1) * 100 / KM_PER_DEGREE
+                lon = (longitude + rng.uniform(-4, 4) + 180) % 360 - 180
+                if haversine_km(latitude, longitude, lat, lon) <= 100:
+                    self.assertTrue(self._in_box(box, lat, lon), (latitude, longitude, lat, lon))
+
+    @staticmethod
+    def _in_box(q, lat, lon):
+        """Evaluate a bounding_box() predicate in Python"""
+        values = {'latitude': lat, 'longitude': lon}
+        results = []
+        for child in q.children:
+            if isinstance(child, Q):
+                results.append(ProximitySearchTest._in_box(child, lat, lon))
+            else:
+                lookup, bound = child
+                field, op = lookup.split('__')
+                results.append(values[field] >= bound if op == 'gte' else values[field] <= bound)
+        return any(results) if q.connector == Q.OR else all(results)
+
+    def test_radius_search_uses_geohash_index(self):
+        """Test that a radius query only returns nearby donors and seeks the geo index"""
+        near = self.make_donor('near@example.com', offset_km=(1, 1))
+        self.make_donor('far@example.com', offset_km=(20, 0))
+        queryset = Profile.objects.filter(blood_group__in=['O+'], is_available__in=[True])
+        self.assertEqual([p for _, p in within_radius(queryset, *self.ORIGIN, 5)], [near])
+        plan = in_cells(queryset, covering_cells(*self.ORIGIN, 5)).explain()
+        self.assertIn('profile_geo_idx', plan)
+        self.assertIn('geohash>', plan)
+
+    def test_nearby_endpoint(self):
+        """Test that the nearby API ranks by distance without exposing coordinates"""
+        self.make_donor('second@example.com', offset_km=(0, 3))
+        self.make_donor('first@example.com', offset_km=(1, 0))
+        self.make_donor('other-group@example.com', blood_group='B+')
+        user = User.objects.create_user(username='nowhere@example.com', password='testpass123')
+        Profile.objects.create(user=user, blood_group='O+', city='Delhi', is_available=True)
+
+        data = self.client.get(reverse('nearby_donor_search'), {
+            'lat': self.ORIGIN[0], 'lng': self.ORIGIN[1], 'blood_group': 'O+',
+        }).json()
+        self.assertEqual([d['name'] for d in data['results']], ['first', 'second'])
+        self.assertEqual(data['results'][0]['distance_km'], 1.0)
+        self.assertNotIn('latitude', data['results'][0])
+
+        url = reverse('nearby_donor_search')
+        self.assertEqual(self.client.get(url, {'lat': 28.6}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'lat': 91, 'lng': 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'lat': 0, 'lng': 0, 'radius_km': '-1'}).status_code, 400)
+
+    def test_matches_put_nearest_donors_first(self):
+        """Test that a request with coordinates lists nearby donors first and skips ineligible ones"""
+        self.make_donor('near-recent@example.com', offset_km=(0, 1), last_donation_date=date.today())
+        self.make_donor('near@example.com', blood_group='O-', offset_km=(2, 0))
+        same_city = User.objects.create_user(username='same-city@example.com', password='testpass123')
+        Profile.objects.create(user=same_city, blood_group='A+', city='Delhi', is_available=True)
+        donation_request = DonationRequest.objects.create(
+            requester=self.searcher, name='Patient', blood_group_needed='A+', city='New Delhi',
+            latitude=self.ORIGIN[0], longitude=self.ORIGIN[1],
+        )
+        data = self.client.get(reverse('request_matches', args=[donation_request.id])).json()
+        self.assertEqual([d['blood_group'] for d in data['results']], ['O-', 'A+'])
+        self.assertEqual(data['results'][0]['distance_km'], 2.0)
+        self.assertNotIn('distance_km', data['results'][1])
+
+    def test_batch_matching_buckets_located_requests(self):
+        """Test that located requests are matched by distance without a proximity query each"""
+        near = self.make_donor('near@example.com', blood_group='O-', offset_km=(1, 0))
+        mid = self.make_donor('mid@example.com', blood_group='A+', offset_km=(0, 8))
+        far = self.make_donor('far@example.com', blood_group='O-', offset_km=(25, 0))
+        self.make_donor('incompatible@example.com', blood_group='B+', offset_km=(0, 1))
+        requests = [
+            DonationRequest.objects.create(
+                requester=self.searcher, name=f'Patient {i}', blood_group_needed='A+', city='Delhi',
+                latitude=self.ORIGIN[0] + i / 1000, longitude=self.ORIGIN[1],
+            )
+            for i in range(10)
+        ]
+        with self.assertNumQueries(3):
+            matches = match_pending_requests(per_request=3)
+        for donation_request in requests:
+            self.assertEqual(matches[donation_request.id], [near, mid, far])
+
+
+class CityNormalizationTest(TestCase):
+    """Test canonical cities, aliases and the trigram index"""
+
+    def setUp(self):
+        self.client = Client()
+        self.searcher = User.objects.create_user(username='searcher@example.com', password='testpass123')
+        self.client.login(username='searcher@example.com', password='testpass123')
+
+    def make_donor(self, username, city):
+        user = User.objects.create_user(username=username, password='testpass123')
+        return Profile.objects.create(user=user, blood_group='O+', city=city, is_available=True)
+
+    def test_spellings_share_a_canonical_key(self):
+        """Test that case, spacing, accents and known aliases resolve to one city"""
+        self.assertEqual(normalize_city_key('  New   Délhi. '), 'new delhi')
+        donors = [self.make_donor(f'donor{i}@example.com', city) for i, city in enumerate(['Delhi', 'delhi ', 'New Delhi'])]
+        self.assertEqual({donor.city_key for donor in donors}, {'delhi'})
+        self.assertEqual(list(City.objects.values_list('name', flat=True)), ['Delhi'])
+        self.assertEqual(self.make_donor('agra@example.com', 'Agra').city_key, 'agra')
+
+    def test_similar_names_stay_separate_cities(self):
+        """Test that a new spelling is never merged into a city just because it looks alike"""
+        keys = {city: self.make_donor(f'{city}@example.com', city).city_key
+                for city in ('Raipur', 'Jaipur', 'Rampur', 'Nagpur', 'Nagaur')}
+        self.assertEqual(keys, {'Raipur': 'raipur', 'Jaipur': 'jaipur', 'Rampur': 'rampur',
+                                'Nagpur': 'nagpur', 'Nagaur': 'nagaur'})
+        data = self.client.get(reverse('city_suggestions'), {'q': 'Jaipur'}).json()
+        self.assertEqual(data['results'][0]['name'], 'Jaipur')
+
+    def test_staff_confirm_typos(self):
+        """Test that a typo keeps its own key until its alias is pointed at the right city"""
+        self.make_donor('delhi@example.com', 'Delhi')
+        typo = self.make_donor('typo@example.com', 'Dehli')
+        self.assertEqual(typo.city_key, 'dehli')
+
+        CityAlias.objects.filter(key='dehli').update(city=City.objects.get(key='delhi'))
+        out = StringIO()
+        call_command('normalize_cities', '--all', stdout=out)
+        self.assertIn('Supply/demand cells recounted, 2 corrected.', out.getvalue())
+        self.assertEqual(rebuild(), {})
+        typo.refresh_from_db()
+        self.assertEqual(typo.city_key, 'delhi')
+        self.make_donor('typo2@example.com', 'dehli')
+        self.assertEqual(Profile.objects.filter(city_key='delhi').count(), 3)
+
+    def test_key_follows_city_changes_only(self):
+        """Test that saving without touching the city does not resolve it again"""
+        donor = self.make_donor('donor@example.com', 'Bombay')
+        self.assertEqual(donor.city_key, 'mumbai')
+        donor = Profile.objects.get(id=donor.id)
+        donor.phone = '+919999990001'
+        with self.assertNumQueries(1):
+            donor.save()
+        donor.city = 'Pune'
+        donor.save(update_fields=['city'])
+        donor.refresh_from_db()
+        self.assertEqual(donor.city_key, 'pune')
+
+    def test_search_and_feed_match_any_spelling(self):
+        """Test that city filters use the canonical key and its index"""
+        self.make_donor('donor@example.com', 'Delhi')
+        requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        DonationRequest.objects.create(requester=requester, name='Patient', blood_group_needed='A+', city='New Delhi')
+
+        data = self.client.get(reverse('donor_search'), {'blood_group': 'O+', 'city': 'new delhi'}).json()
+        self.assertEqual([d['city'] for d in data['results']], ['Delhi'])
+        data = self.client.get(reverse('request_feed'), {'city': 'DELHI'}).json()
+        self.assertEqual([r['city'] for r in data['results']], ['New Delhi'])
+        self.assertEqual(search_donors(blood_group='O+', city='Atlantis')[0], [])
+
+        plan = Profile.objects.filter(blood_group='O+', is_available__in=[True], **city_key_filter('Delhi')).explain()
+        self.assertIn('profile_city_idx (blood_group=? AND is_available=? AND city_key=?)', plan)
+
+    def test_backfill_command(self):
+        """Test that the backfill command keys rows inserted without save()"""
+        users = [User.objects.create_user(username=f'bulk{i}@example.com', password='x') for i in range(5)]
+        Profile.objects.bulk_create([
+            Profile(user=user, city=city) for user, city in zip(users, ['Delhi', 'delhi', 'Bangalore', 'Bengaluru ', ''])
+        ])
+        call_command('normalize_cities', batch_size=2, stdout=StringIO())
+        keys = list(Profile.objects.order_by('user__username').values_list('city_key', flat=True))
+        self.assertEqual(keys, ['delhi', 'delhi', 'bengaluru', 'bengaluru', ''])
+
+    def test_city_suggestions(self):
+        """Test typo-tolerant suggestions from the trigram index"""
+        self.make_donor('one@example.com', 'Hyderabad')
+        self.make_donor('two@example.com', 'Ahmedabad')
+        data = self.client.get(reverse('city_suggestions'), {'q': 'Hydrabad'}).json()
+        self.assertEqual(data['results'][0]['name'], 'Hyderabad')
+        self.assertEqual(self.client.get(reverse('city_suggestions'), {'q': ''}).json()['results'], [])
+
+
+class RequestFullTextSearchTest(TestCase):
+    """Test the FTS5 index over donation requests"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='searcher@example.com', email='searcher@example.com', password='testpass123')
+        self.client.login(username='searcher@example.com', password='testpass123')
+
+    def make_request(self, name, details='', city='Delhi', **kwargs):
+        return DonationRequest.objects.create(
+            requester=self.user, name=name, blood_group_needed='A+', city=city, details=details, **kwargs
+        )
+
+    def search(self, text, **params):
+        data = self.client.get(reverse('request_search'), {'q': text, **params}).json()
+        return [r['name'] for r in data['results']]
+
+    def test_index_follows_writes(self):
+        """Test that inserts, updates, bulk updates and deletes reach the index"""
+        first = self.make_request('Ravi Kumar', 'Needs platelets after chemotherapy')
+        self.assertEqual(self.search('chemotherapy'), ['Ravi Kumar'])
+        first.details = 'Scheduled surgery'
+        first.save()
+        self.assertEqual(self.search('chemotherapy'), [])
+        DonationRequest.objects.filter(id=first.id).update(city='Pune')
+        self.assertEqual(self.search('pune'), ['Ravi Kumar'])
+        first.delete()
+        self.assertEqual(self.search('surgery'), [])
+
+    def test_ranking_prefix_and_filters(self):
+        """Test that name hits outrank details hits and the last word matches as a prefix"""
+        self.make_request('Meera Nair', 'Contact Kumar at the ward desk')
+        self.make_request('Anil Kumar', 'Accident victim')
+        self.make_request('Kumari Devi', 'Delivery', status='accepted')
+        self.assertEqual(self.search('kumar'), ['Anil Kumar', 'Meera Nair'])
+        self.assertEqual(self.search('kuma', status='accepted'), ['Kumari Devi'])
+        self.assertEqual(self.search('accident kumar'), ['Anil Kumar'])
+        self.assertEqual(self.search('"kumar" OR NEAR('), [])
+        self.assertEqual(self.client.get(reverse('request_search'), {'q': 'x', 'status': 'bogus'}).status_code, 400)
+
+    def test_paging(self):
+        """Test that next_offset walks every match once"""
+        for i in range(5):
+            self.make_request(f'Patient {i}', 'Thalassemia')
+        seen = []
+        params = {'q': 'thalassemia', 'limit': 2}
+        while True:
+            data = self.client.get(reverse('request_search'), params).json()
+            seen.extend(r['id'] for r in data['results'])
+            if data['next_offset'] is None:
+                break
+            params['offset'] = data['next_offset']
+        self.assertEqual(sorted(seen), sorted(DonationRequest.objects.values_list('id', flat=True)))
+
+    def test_admin_search_uses_index(self):
+        """Test that the admin changelist searches through FTS instead of LIKE"""
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+        self.make_request('Ravi Kumar', 'Needs platelets')
+        self.make_request('Other Patient', 'Accident')
+        url = reverse('admin:bloodshare_donationrequest_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'q': 'platelets'})
+        self.assertContains(response, 'Ravi Kumar')
+        self.assertNotContains(response, 'Other Patient')
+        self.assertFalse(any(' LIKE ' in q['sql'] for q in ctx.captured_queries))
+        self.assertContains(self.client.get(url, {'q': 'searcher@example.com'}), 'Other Patient')
+
+    def test_admin_search_matches_requester_username(self):
+        """Test that the changelist finds requests by the exact requester username"""
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+        other = User.objects.create_user(username='ravi_k', email='ravi@example.com')
+        DonationRequest.objects.create(requester=other, name='Ravi Patient', blood_group_needed='A+', city='Delhi')
+        self.make_request('Searcher Patient', 'Accident')
+        url = reverse('admin:bloodshare_donationrequest_changelist')
+        response = self.client.get(url, {'q': 'ravi_k'})
+        self.assertContains(response, 'Ravi Patient')
+        self.assertNotContains(response, 'Searcher Patient')
+        plan = DonationRequest.objects.filter(requester__in=User.objects.filter(username='ravi_k')).explain()
+        self.assertIn('INDEX sqlite_autoindex_auth_user_1 (username=?)', plan)
+
+
+class AdminChangelistTest(TestCase):
+    """Test that the admin changelists stay cheap as tables grow"""
+
+    def setUp(self):
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+
+    def add_profiles(self, count, city='Delhi'):
+        for _ in range(count):
+            index = User.objects.count()
+            user = User.objects.create_user(username=f'donor{index}@example.com', email=f'donor{index}@example.com')
+            Profile.objects.create(user=user, blood_group='O+', city=city)
+            DonationRequest.objects.create(requester=user, name=f'Patient {index}', blood_group_needed='A+', city=city)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Test that users and requesters are joined instead of loaded per row"""
+        for name in ('profile', 'donationrequest'):
+            url = reverse(f'admin:bloodshare_{name}_changelist')
+            self.add_profiles(2)
+            with CaptureQueriesContext(connection) as few:
+                self.client.get(url)
+            self.add_profiles(20)
+            with CaptureQueriesContext(connection) as many:
+                response = self.client.get(url)
+            self.assertEqual(len(few), len(many))
+            self.assertContains(response, 'donor3@example.com')
+
+    def test_estimated_count_paginator(self):
+        """Test that counts stop at the limit and fall back to the table estimate"""
+        self.add_profiles(6)
+        with mock.patch('bloodshare.pagination.EXACT_COUNT_LIMIT', 3):
+            self.assertEqual(EstimatedCountPaginator(Profile.objects.all(), 2).count, Profile.objects.order_by('id').last().id)
+            self.assertEqual(EstimatedCountPaginator(Profile.objects.filter(blood_group='O+'), 2).count, 3)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.assertEqual(EstimatedCountPaginator(Profile.objects.all(), 2).count, 6)
+        self.assertEqual(EstimatedCountPaginator(Profile.objects.filter(blood_group='O+'), 2).count, 6)
+
+    def test_city_and_requester_filters(self):
+        """Test the free-text filters, which match any spelling and use indexes"""
+        self.add_profiles(1, city='Bombay')
+        self.add_profiles(1, city='Pune')
+        url = reverse('admin:bloodshare_donationrequest_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'city': 'mumbai'})
+        self.assertEqual(list(response.context['cl'].result_list.values_list('city', flat=True)), ['Bombay'])
+        self.assertFalse(any('DISTINCT "bloodshare_donationrequest"."city"' in q['sql'] for q in ctx.captured_queries))
+        self.assertContains(response, 'name="city" value="mumbai"')
+        response = self.client.get(url, {'requester_email': 'DONOR2@example.com'})
+        self.assertEqual(list(response.context['cl'].result_list.values_list('city', flat=True)), ['Pune'])
+
+    def test_date_hierarchy_uses_created_at_index(self):
+        """Test that drilling into a date range is an index range scan"""
+        start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        queryset = DonationRequest.objects.filter(created_at__gte=start, created_at__lt=start.replace(month=2))
+        plan = queryset.order_by('-created_at', '-id')[:100].explain()
+        self.assertIn('request_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+def make_image_bytes(size=(600, 400), fmt='JPEG', exif=True):
+    """Encoded test image, with camera EXIF (including a GPS block) when ``exif`` is set"""
+    image = Image.new('RGB', size, (200, 30, 30))
+    buffer = io.BytesIO()
+    kwargs = {}
+    if exif:
+        data = Image.Exif()
+        data[0x010F] = 'TestCamera'  # Make
+        data[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        data[0x8825] = {1: 'N', 2: (28.0, 36.0, 0.0)}  # GPSInfo
+        kwargs['exif'] = data
+    image.save(buffer, fmt, **kwargs)
+    return buffer.getvalue()
+
+
+class AvatarPipelineTest(TestCase):
+    """Test background avatar validation, metadata stripping and thumbnails"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root, AVATAR_PROCESSING_INLINE=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(
+            username='avatar@example.com', email='avatar@example.com', password='testpass123', first_name='Ava',
+        )
+        self.profile = Profile.objects.create(user=self.user, blood_group='O+', city='Delhi')
+        self.client.login(username='avatar@example.com', password='testpass123')
+
+    def upload(self, content, name='me.jpg'):
+        data = {'phone': '', 'blood_group': 'O+', 'city': 'Delhi', 'avatar': SimpleUploadedFile(name, content)}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('profile_edit'), data)
+        self.profile.refresh_from_db()
+        return response
+
+    def test_upload_is_processed_after_commit(self):
+        """Test that the upload is saved pending and processed once the transaction commits"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.post(reverse('profile_edit'), {
+                'blood_group': 'O+', 'city': 'Delhi', 'avatar': SimpleUploadedFile('me.jpg', make_image_bytes()),
+            })
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatar_status, 'pending')
+        self.assertEqual(self.profile.avatar_variants, {})
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatar_status, 'ready')
+
+    def test_metadata_is_stripped_and_orientation_applied(self):
+        """Test that EXIF and GPS data are dropped after rotating the image upright"""
+        self.upload(make_image_bytes())
+        with Image.open(self.profile.avatar.path) as source:
+            self.assertEqual(source.size, (400, 600))
+            self.assertEqual(dict(source.getexif()), {})
+            self.assertNotIn('exif', source.info)
+        sizes = self.profile.avatar_variants['sizes']
+        self.assertEqual(sorted(sizes, key=int), [str(size) for size in THUMBNAIL_SIZES])
+        for size, formats in sizes.items():
+            self.assertEqual(set(formats), {'webp', 'jpeg'})
+            for fmt, path in formats.items():
+                with Image.open(self.profile.avatar.storage.path(path)) as thumbnail:
+                    self.assertEqual(thumbnail.format, fmt.upper())
+                    self.assertEqual(thumbnail.size, (int(size), int(size)))
+                    self.assertEqual(dict(thumbnail.getexif()), {})
+
+    def test_invalid_upload_is_rejected(self):
+        """Test that an image the form accepts but the pipeline does not is removed and marked failed"""
+        self.upload(make_image_bytes(fmt='BMP', exif=False), name='me.bmp')
+        self.assertEqual(self.profile.avatar_status, 'failed')
+        self.assertFalse(self.profile.avatar)
+        self.assertEqual(default_storage.listdir('avatars')[1], [])
+
+    def test_replacing_avatar_removes_old_files(self):
+        """Test that a new upload deletes the previous source and thumbnails"""
+        self.upload(make_image_bytes())
+        old_files = [self.profile.avatar.name, *[p for f in self.profile.avatar_variants['sizes'].values() for p in f.values()]]
+        self.upload(make_image_bytes(size=(300, 300), fmt='PNG', exif=False), name='new.png')
+        self.assertEqual(self.profile.avatar_status, 'ready')
+        for path in old_files:
+            self.assertFalse(default_storage.exists(path), path)
+        self.assertEqual(len(default_storage.listdir('avatars/variants')[1]), 6)
+
+    def test_dashboard_serves_smallest_variant(self):
+        """Test that the dashboard links 80/160px thumbnails instead of the original"""
+        self.upload(make_image_bytes())
+        sizes = self.profile.avatar_variants['sizes']
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, f"{sizes['80']['webp']} 1x, ")
+        self.assertContains(response, f"{sizes['160']['webp']} 2x")
+        self.assertNotContains(response, self.profile.avatar.url)
+        self.assertNotContains(response, sizes['320']['jpeg'])
+
+    def test_unprocessed_avatar_falls_back_to_original(self):
+        """Test that the original is shown while thumbnails are pending"""
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(reverse('profile_edit'), {
+                'blood_group': 'O+', 'city': 'Delhi', 'avatar': SimpleUploadedFile('me.jpg', make_image_bytes()),
+            })
+        self.profile.refresh_from_db()
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, f'src="{self.profile.avatar.url}"')
+        self.assertEqual(process_avatar(self.profile.id), 'ready')
+
+    def test_stale_job_does_not_overwrite_newer_upload(self):
+        """Test that processing an avatar that was replaced meanwhile changes nothing"""
+        self.upload(make_image_bytes())
+        render = avatars.render_variants
+
+        def replaced_during_render(data):
+            Profile.objects.filter(id=self.profile.id).update(avatar='avatars/newer.jpg', avatar_status='pending')
+            return render(data)
+
+        with mock.patch.object(avatars, 'render_variants', replaced_during_render):
+            self.assertIsNone(avatars.process_avatar(self.profile.id))
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.avatar.name, self.profile.avatar_status), ('avatars/newer.jpg', 'pending'))
+        # The abandoned job removed its own thumbnails; the first upload's remain
+        self.assertEqual(len(self.profile.avatar.storage.listdir('avatars/variants')[1]), 6)
+
+    def test_process_avatars_command(self):
+        """Test that the backfill command thumbnails avatars saved before the pipeline"""
+        name = default_storage.save('avatars/legacy.jpg', SimpleUploadedFile('legacy.jpg', make_image_bytes()))
+        Profile.objects.filter(id=self.profile.id).update(avatar=name)
+        out = StringIO()
+        call_command('process_avatars', stdout=out)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatar_status, 'ready')
+        self.assertIn('1 processed', out.getvalue())
+
+
+class NotificationFanOutTest(TestCase):
+    """Test the notification outbox and its batched, rate-limited fan-out"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(
+            username='needs@example.com', email='needs@example.com', password='testpass123',
+        )
+        Profile.objects.create(user=self.requester, blood_group='O-', city='Delhi', is_available=True)
+
+    def add_donor(self, name, blood_group='O-', city='Delhi', is_available=True, **fields):
+        user = User.objects.create_user(username=f'{name}@example.com', email=f'{name}@example.com', first_name=name)
+        Profile.objects.create(user=user, blood_group=blood_group, city=city, is_available=is_available, **fields)
+        return user
+
+    def create_request(self, blood_group='O-', city='Delhi'):
+        return DonationRequest.objects.create(
+            requester=self.requester, name='Patient', blood_group_needed=blood_group, city=city,
+        )
+
+    def recipients(self):
+        return sorted(message.to[0] for message in mail.outbox)
+
+    def test_dashboard_writes_outbox_without_sending(self):
+        """Test that creating a request queues one outbox entry and sends nothing in the request"""
+        self.add_donor('donor')
+        self.client.login(username='needs@example.com', password='testpass123')
+        self.client.post(reverse('dashboard'), {'name': 'Patient', 'blood_group_needed': 'O-', 'city': 'Delhi'})
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(entry.donation_request.name, 'Patient')
+        self.assertIsNone(entry.processed_at)
+        self.assertEqual(mail.outbox, [])
+
+    def test_only_compatible_available_donors_in_city_are_emailed(self):
+        """Test the recipient rules: group compatibility, availability, eligibility, city, not the requester"""
+        self.add_donor('match')
+        self.add_donor('otherspelling', city='DELHI ')
+        self.add_donor('incompatible', blood_group='A+')
+        self.add_donor('unavailable', is_available=False)
+        self.add_donor('elsewhere', city='Mumbai')
+        self.add_donor('recent', last_donation_date=date.today())
+        self.create_request()
+        self.assertEqual(drain_outbox(), (1, 2))
+        self.assertEqual(self.recipients(), ['match@example.com', 'otherspelling@example.com'])
+        entry = NotificationOutbox.objects.get()
+        self.assertIsNotNone(entry.processed_at)
+        self.assertEqual(entry.sent_count, 2)
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    def test_fan_out_is_batched_and_resumable(self):
+        """Test that donors are emailed in batches and a re-run never emails anyone twice"""
+        for i in range(5):
+            self.add_donor(f'donor{i}')
+        self.add_donor('universal', blood_group='AB+')  # Cannot give to O-
+        self.create_request()
+        with mock.patch.object(EmailBackend, 'send_messages', autospec=True, side_effect=EmailBackend.send_messages) as send:
+            self.assertEqual(drain_outbox(batch_size=2), (1, 5))
+        self.assertEqual([len(call.args[1]) for call in send.call_args_list], [2, 2, 1])
+
+        NotificationOutbox.objects.update(processed_at=None, cursor={})
+        self.assertEqual(drain_outbox(), (1, 0))
+        self.assertEqual(len(self.recipients()), 5)
+
+    def test_batch_queries_do_not_grow_with_recipients(self):
+        """Test that a batch costs the same queries for 1 or 20 recipients"""
+        self.add_donor('first')
+        self.create_request()
+        entry = NotificationOutbox.objects.select_related('donation_request').get()
+        with CaptureQueriesContext(connection) as few:
+            fan_out(entry)
+        for i in range(20):
+            self.add_donor(f'donor{i}')
+        entry = NotificationOutbox.objects.select_related('donation_request').get()
+        entry.cursor = {}
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(fan_out(entry), 20)
+        self.assertEqual(len(few), len(many))
+
+    def test_rate_cap_per_donor(self):
+        """Test that a donor gets at most RATE_LIMIT request emails per window"""
+        self.add_donor('busy')
+        for _ in range(RATE_LIMIT + 2):
+            self.create_request()
+        self.assertEqual(drain_outbox(), (RATE_LIMIT + 2, RATE_LIMIT))
+
+    def test_requests_no_longer_pending_are_skipped(self):
+        """Test that a request accepted before the worker got to it notifies nobody"""
+        self.add_donor('donor')
+        donation_request = self.create_request()
+        DonationRequest.objects.filter(id=donation_request.id).update(status='accepted')
+        self.assertEqual(drain_outbox(), (1, 0))
+
+    def test_leased_entries_are_not_claimed_twice(self):
+        """Test that an entry leased by one worker is skipped by another until the lease runs out"""
+        self.create_request()
+        self.assertIsNotNone(claim_entry())
+        self.assertIsNone(claim_entry())
+        NotificationOutbox.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_entry().attempts, 2)
+
+    def test_worker_stops_once_its_lease_is_taken_over(self):
+        """Test that a stalled worker whose entry was re-claimed sends nothing more"""
+        for i in range(3):
+            self.add_donor(f'donor{i}')
+        self.create_request()
+        stalled = claim_entry()
+        # The lease runs out and another worker claims the entry
+        NotificationOutbox.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(claim_entry())
+        with self.assertRaises(LeaseLost):
+            fan_out(stalled, batch_size=2)
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(DonorNotification.objects.exists())
+
+        # drain_outbox() leaves the entry to the worker that holds it
+        NotificationOutbox.objects.update(locked_until=None)
+        with mock.patch('bloodshare.notifications.fan_out', side_effect=LeaseLost), \
+                self.assertLogs('bloodshare.notifications', 'WARNING'):
+            self.assertEqual(drain_outbox(limit=1), (1, 0))
+        entry = NotificationOutbox.objects.get()
+        self.assertIsNone(entry.processed_at)
+        self.assertIsNotNone(entry.locked_until)
+
+    def test_send_notifications_command(self):
+        """Test that the worker command drains the outbox once and exits"""
+        self.add_donor('donor')
+        self.create_request()
+        out = StringIO()
+        call_command('send_notifications', '--once', stdout=out)
+        self.assertIn('1 requests fanned out, 1 emails sent', out.getvalue())
+        self.assertEqual(self.recipients(), ['donor@example.com'])
+
+
+@override_settings(ROOT_URLCONF='bloodshare_project.asgi_urls')
+class LiveUpdatesTest(TestCase):
+    """Test the Server-Sent Events stream of request changes"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        self.donor = User.objects.create_user(username='donor@example.com', password='testpass123')
+        Profile.objects.create(user=self.donor, blood_group='O-', city='Delhi', is_available=True)
+        self.async_client.force_login(self.donor)
+
+    def create_request(self, requester=None, blood_group='A+', city='Delhi'):
+        return DonationRequest.objects.create(
+            requester=requester or self.requester, name='Patient', blood_group_needed=blood_group, city=city,
+        )
+
+    async def next_event(self, stream):
+        """The next non-comment message on ``stream`` as ``(fields, data)``"""
+        while True:
+            message = (await stream.__anext__()).decode()
+            if not message.startswith((':', 'retry:')):
+                break
+        fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+        return fields, json.loads(fields.pop('data'))
+
+    def test_subscription_filter(self):
+        """Test that a stream gets the user's own requests and ones they could donate to nearby"""
+        subscription = Subscription(self.donor.id, 'A+', 'delhi')
+        self.assertTrue(subscription.wants(self.create_request(blood_group='AB+')))
+        self.assertFalse(subscription.wants(self.create_request(blood_group='O-')))
+        self.assertFalse(subscription.wants(self.create_request(city='Mumbai')))
+        self.assertTrue(subscription.wants(self.create_request(requester=self.donor, blood_group='O-', city='Mumbai')))
+        self.assertTrue(Subscription(self.donor.id).wants(self.create_request(blood_group='O-', city='Pune')))
+
+    def test_dashboard_offers_stream_only_under_asgi(self):
+        """Test that the dashboard connects to the stream only when it is routed"""
+        self.client.force_login(self.donor)
+        self.assertContains(self.client.get(reverse('dashboard')), "new EventSource('/api/requests/events/')")
+        with override_settings(ROOT_URLCONF='bloodshare_project.urls'):
+            self.assertNotContains(self.client.get(reverse('dashboard')), 'new EventSource')
+
+    def test_change_query_uses_updated_at_index(self):
+        """Test that polling for changes is a range scan on updated_at"""
+        plan = DonationRequest.objects.filter(updated_at__gt=timezone.now()).order_by('updated_at', 'id')[:500].explain()
+        self.assertIn('request_updated_idx', plan)
+
+    async def test_stream_pushes_matching_changes(self):
+        """Test that one poll delivers creates and status changes to the open stream"""
+        with mock.patch.multiple('bloodshare.live', POLL_INTERVAL=3600, KEEPALIVE_INTERVAL=0.1, STREAM_DURATION=2):
+            response = await self.async_client.get('/api/requests/events/')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = response.streaming_content
+            self.assertTrue((await stream.__anext__()).startswith(b'retry:'))
+
+            await sync_to_async(self.create_request)(blood_group='B+', city='Mumbai')  # Not for this donor
+            donation_request = await sync_to_async(self.create_request)()
+            await get_hub().poll()
+            fields, card = await self.next_event(stream)
+            self.assertEqual(fields['event'], 'request')
+            self.assertEqual((card['id'], card['status'], card['own']), (donation_request.id, 'pending', False))
+
+            url = reverse('accept_request', args=[donation_request.id])
+            self.assertEqual((await self.async_client.post(url)).status_code, 200)
+            await get_hub().poll()
+            _, card = await self.next_event(stream)
+            self.assertEqual((card['id'], card['status']), (donation_request.id, 'accepted'))
+            # The stream ends on its own after STREAM_DURATION and unsubscribes
+            self.assertTrue(all([message.startswith(b':') async for message in stream]))
+        self.assertEqual(get_hub().subscribers, set())
+
+    async def test_poll_reads_past_a_bulk_expiry(self):
+        """Test that more than POLL_LIMIT rows sharing one updated_at don't stall the stream"""
+        def create_stale_requests():
+            return [donation_request.id for donation_request in DonationRequest.objects.bulk_create(
+                DonationRequest(requester=self.requester, name='Patient', blood_group_needed='A+', city='Delhi')
+                for _ in range(POLL_LIMIT + 20)
+            )]
+
+        with mock.patch('bloodshare.live.POLL_INTERVAL', 3600):
+            hub = get_hub()
+            # Only Mumbai requests, so the expired ones don't fill its queue
+            subscription = Subscription(self.donor.id, 'O-', 'mumbai')
+            hub.subscribe(subscription)
+            try:
+                ids = await sync_to_async(create_stale_requests)()
+                self.assertEqual(await sync_to_async(expire_requests)(ids), POLL_LIMIT + 20)
+                await hub.poll()
+                later = await sync_to_async(self.create_request)(city='Mumbai')
+                await hub.poll()
+            finally:
+                hub.unsubscribe(subscription)
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertIn(f'"id": {later.id},', subscription.queue.get_nowait())
+
+    async def test_reconnect_catches_up_from_last_event_id(self):
+        """Test that Last-Event-ID replays changes made while disconnected"""
+        donation_request = await sync_to_async(self.create_request)()
+        last_event_id = (donation_request.updated_at - timedelta(seconds=1)).isoformat()
+        with mock.patch('bloodshare.live.STREAM_DURATION', 0):
+            response = await self.async_client.get('/api/requests/events/', headers={'Last-Event-ID': last_event_id})
+            messages = [message.decode() async for message in response.streaming_content]
+        self.assertEqual(len(messages), 2)
+        self.assertIn(f'id: {donation_request.updated_at.isoformat()}\n', messages[1])
+        self.assertIn(f'"id": {donation_request.id},', messages[1])
+
+
+class DashboardFragmentCacheTest(TestCase):
+    """Test the generation-keyed cache of the dashboard request lists"""
+
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+        self.user = User.objects.create_user(username='viewer@example.com', password='testpass123')
+        Profile.objects.create(user=self.user, blood_group='O+', city='Delhi')
+        self.other = User.objects.create_user(username='other@example.com', password='testpass123')
+        self.client.login(username='viewer@example.com', password='testpass123')
+
+    def create_request(self, requester, name='Patient'):
+        # Generations advance on commit, which TestCase only simulates
+        with self.captureOnCommitCallbacks(execute=True):
+            return DonationRequest.objects.create(requester=requester, name=name, blood_group_needed='A+', city='Delhi')
+
+    def dashboard(self, queries):
+        with self.assertNumQueries(queries):
+            return self.client.get(reverse('dashboard'))
+
+    def test_warm_dashboard_skips_list_queries(self):
+        """Test that a repeat view serves both lists from cache"""
+        self.create_request(self.user, 'Mine')
+        self.create_request(self.other, 'Theirs')
+        cold = self.dashboard(5)
+        # session, user, profile
+        warm = self.dashboard(3)
+        self.assertEqual(cold.context['browse_requests_html'], warm.context['browse_requests_html'])
+        self.assertEqual(cold.context['user_requests_html'], warm.context['user_requests_html'])
+        self.assertContains(warm, 'Mine')
+        self.assertContains(warm, 'Theirs')
+
+    def test_writes_invalidate_only_affected_fragments(self):
+        """Test that another user's new request refreshes the browse list but not "Your requests\""""
+        self.create_request(self.user, 'Mine')
+        self.dashboard(5)
+        self.create_request(self.other, 'Brand new')
+        response = self.dashboard(4)
+        self.assertContains(response, 'Brand new')
+        self.create_request(self.user, 'Another of mine')
+        self.assertContains(self.dashboard(5), 'Another of mine')
+
+    def test_status_change_refreshes_requester_list(self):
+        """Test that accepting a request shows up on the requester's cached dashboard"""
+        donation_request = self.create_request(self.user, 'Mine')
+        self.assertContains(self.dashboard(5), 'status-pending')
+        self.client.force_login(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('accept_request', args=[donation_request.id]))
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('dashboard')), 'status-accepted')
+
+    def test_status_change_keeps_other_users_lists(self):
+        """Test that a transition only refreshes its own requester's "Your requests" list"""
+        mine = self.create_request(self.user, 'Mine')
+        theirs = self.create_request(self.other, 'Theirs')
+        self.dashboard(5)
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_requests([theirs.id])
+        # Only the browse list is rendered again
+        self.dashboard(4)
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_requests([mine.id])
+        self.dashboard(5)
+
+    def test_rolled_back_write_does_not_invalidate(self):
+        """Test that generations only move when the write commits"""
+        self.dashboard(5)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            DonationRequest.objects.create(requester=self.other, name='Patient', blood_group_needed='A+', city='Delhi')
+            raise RuntimeError
+        self.dashboard(3)
+
+    def test_file_based_cache(self):
+        """Test the same invalidation with FileBasedCache"""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        with override_settings(CACHES=backend):
+            self.dashboard(5)
+            self.dashboard(3)
+            self.create_request(self.other, 'Filed')
+            self.assertContains(self.dashboard(4), 'Filed')
+
+    def test_hit_rate_stats(self):
+        """Test that hits and misses are counted per fragment"""
+        self.dashboard(5)
+        self.dashboard(3)
+        self.dashboard(3)
+        stats = fragment_stats()
+        self.assertEqual(stats['browse_requests'], {'hits': 2, 'misses': 1, 'hit_rate': 0.6667})
+        self.assertEqual(stats['user_requests']['hits'], 2)
+        out = StringIO()
+        call_command('fragment_cache_stats', '--reset', stdout=out)
+        self.assertIn('browse_requests', out.getvalue())
+        self.assertIn('66.7%', out.getvalue())
+        self.assertEqual(fragment_stats(), {})
+
+
+class SQLiteProfileTest(TestCase):
+    """Test the PRAGMAs and transaction mode of the bloodshare.sqlite backend"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = f'{directory}/profile.sqlite3'
+
+    def wrapper(self, **options):
+        wrapper = ConnectionHandler({
+            'default': {'ENGINE': 'bloodshare.sqlite', 'NAME': self.path, 'OPTIONS': options},
+        })['default']
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_production_pragmas_are_applied(self):
+        """Test that every new connection gets the production profile's PRAGMAs"""
+        wrapper = self.wrapper(timeout=20, transaction_mode='immediate', pragmas={
+            'journal_mode': 'wal', 'synchronous': 'normal', 'busy_timeout': 20000,
+            'cache_size': -64000, 'mmap_size': 268435456, 'temp_store': 'memory',
+        })
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 20000)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64000)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 268435456)
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)
+        self.assertEqual(self.pragma(wrapper, 'foreign_keys'), 1)
+
+    def test_defaults_match_stock_sqlite_backend(self):
+        """Test that without options the journal and transactions are SQLite's defaults"""
+        wrapper = self.wrapper()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(wrapper.transaction_mode, 'DEFERRED')
+
+    def test_immediate_transactions_take_the_write_lock_at_begin(self):
+        """Test that a transaction holds the write lock before it writes anything"""
+        wrapper = self.wrapper(transaction_mode='IMMEDIATE', pragmas={'journal_mode': 'wal'})
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+
+        # What transaction.atomic() runs on entry
+        wrapper._start_transaction_under_autocommit()
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+            other.execute('BEGIN IMMEDIATE')
+        # WAL readers carry on next to the writer
+        self.assertEqual(other.execute('SELECT COUNT(*) FROM t').fetchone()[0], 0)
+        wrapper.connection.rollback()
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+    def test_invalid_options_are_rejected(self):
+        """Test that unknown transaction modes and unsafe PRAGMA values raise ImproperlyConfigured"""
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(transaction_mode='LAZY')
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(pragmas={'journal_mode': 'wal; DROP TABLE auth_user'})
+
+
+class ReadReplicaRoutingTest(TransactionTestCase):
+    """Test read replica routing and read-your-writes pinning against a second SQLite file"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict, 'NAME': f'{directory}/replica.sqlite3',
+        }
+        self.addCleanup(connections.settings.pop, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(lambda: connections['replica'].close())
+        settings = override_settings(DATABASE_REPLICAS=['replica'])
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(username='donor@example.com', password='testpass123')
+        Profile.objects.create(user=self.user, blood_group='O+', city='Delhi', is_available=False)
+        self.client.force_login(self.user)
+        self.sync()
+
+    def sync(self):
+        call_command('sync_replicas', verbosity=0)
+
+    def search(self):
+        response = self.client.get(reverse('donor_search'), {'blood_group': 'O+', 'city': 'Delhi'})
+        return len(response.json()['results'])
+
+    def test_requests_read_from_the_replica(self):
+        """Test that reads in a request see the replica until it is synced"""
+        Profile.objects.filter(user=self.user).update(is_available=True)
+        self.assertEqual(self.search(), 0)
+        self.sync()
+        self.assertEqual(self.search(), 1)
+
+    def test_reads_outside_requests_use_the_primary(self):
+        """Test that code outside a request, like a management command, reads the primary"""
+        Profile.objects.filter(user=self.user).update(is_available=True)
+        self.assertTrue(Profile.objects.filter(user=self.user, is_available=True).exists())
+
+    def test_write_pins_the_next_request_to_the_primary(self):
+        """Test that after a write the same client reads its own write, and others don't"""
+        response = self.client.post(reverse('toggle_availability'))
+        self.assertTrue(response.json()['is_available'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        self.assertEqual(self.search(), 1)
+
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.search(), 0)
+
+    def test_transactions_read_the_primary(self):
+        """Test that reads inside transaction.atomic() go to the primary"""
+        def view(request):
+            aliases = [router.db_for_read(Profile)]
+            with transaction.atomic():
+                aliases.append(router.db_for_read(Profile))
+            return aliases
+
+        self.assertEqual(ReplicaPinningMiddleware(view)(RequestFactory().get('/')), ['replica', 'default'])
+
+    def test_replicas_are_not_migrated(self):
+        """Test that migrate leaves replicas to get their schema from the primary"""
+        self.assertFalse(router.allow_migrate('replica', 'bloodshare'))
+        self.assertTrue(router.allow_migrate('default', 'bloodshare'))
+
+
+class RequestExpiryTest(TestCase):
+    """Test chunked expiry of stale pending requests"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+
+    def create_requests(self, count, days_old, status='pending'):
+        created = [
+            DonationRequest.objects.create(
+                requester=self.requester, name=f'Patient {i}', blood_group_needed='O+', city='Delhi', status=status,
+            )
+            for i in range(count)
+        ]
+        DonationRequest.objects.filter(id__in=[r.id for r in created]).update(
+            created_at=timezone.now() - timedelta(days=days_old),
+        )
+        return created
+
+    def test_only_stale_pending_requests_expire(self):
+        """Test that pending requests past the cutoff expire and everything else is left alone"""
+        stale = self.create_requests(3, days_old=40)
+        fresh = self.create_requests(2, days_old=5)
+        accepted = self.create_requests(1, days_old=40, status='accepted')
+
+        with override_settings(REQUEST_EXPIRY_DAYS=30):
+            expired = sum(expire_stale_requests(expiry_cutoff()))
+
+        self.assertEqual(expired, 3)
+        self.assertEqual(
+            set(DonationRequest.objects.filter(status='expired').values_list('id', flat=True)), {r.id for r in stale},
+        )
+        self.assertEqual(DonationRequest.objects.filter(id__in=[r.id for r in fresh], status='pending').count(), 2)
+        self.assertEqual(DonationRequest.objects.get(id=accepted[0].id).status, 'accepted')
+        self.assertEqual(SiteCounter.objects.get(name=ACTIVE_REQUESTS).value, compute_counts()[ACTIVE_REQUESTS])
+
+    def test_requests_expire_in_chunks_oldest_first(self):
+        """Test that each chunk is one short transaction over the oldest stale requests"""
+        self.create_requests(5, days_old=40)
+        newest = self.create_requests(1, days_old=35)
+        cutoff = expiry_cutoff(30)
+        self.assertNotIn(newest[0].id, stale_ids(cutoff, chunk_size=5))
+        self.assertEqual(list(expire_stale_requests(cutoff, chunk_size=2)), [2, 2, 2])
+
+    def test_requests_changed_meanwhile_are_not_expired(self):
+        """Test that a request accepted after it was picked keeps its new status"""
+        self.create_requests(3, days_old=40)
+        ids = stale_ids(expiry_cutoff(30))
+        DonationRequest.objects.filter(id=ids[0]).update(status='accepted')
+        self.assertEqual(expire_requests(ids), 2)
+        self.assertEqual(DonationRequest.objects.get(id=ids[0]).status, 'accepted')
+
+    def test_only_the_requests_this_call_expired_are_reported(self):
+        """Test that a request expired earlier in the same instant is not counted or signalled again"""
+        first, second = self.create_requests(2, days_old=40)
+        received = []
+
+        def receiver(sender, request_ids, **kwargs):
+            received.append(request_ids)
+
+        request_status_changed.connect(receiver)
+        self.addCleanup(request_status_changed.disconnect, receiver)
+        with mock.patch('bloodshare.expiry.timezone.now', return_value=timezone.now()):
+            self.assertEqual(expire_requests([first.id]), 1)
+            self.assertEqual(expire_requests([first.id, second.id]), 1)
+        self.assertEqual(received, [[first.id], [second.id]])
+        self.assertEqual(SiteCounter.objects.get(name=ACTIVE_REQUESTS).value, compute_counts()[ACTIVE_REQUESTS])
+
+    def test_stale_ids_come_from_the_feed_index(self):
+        """Test that picking a chunk is a range scan on the (status, created_at, id) index"""
+        plan = DonationRequest.objects.filter(status='pending', created_at__lt=expiry_cutoff(30)) \
+            .order_by('created_at', 'id').values_list('id', flat=True)[:500].explain()
+        self.assertIn('request_feed_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_command_reports_throughput(self):
+        """Test that expire_requests honours --days and reports rows per second"""
+        self.create_requests(4, days_old=10)
+        out = StringIO()
+        call_command('expire_requests', days=7, chunk_size=3, pause=0, stdout=out)
+        self.assertIn('4 requests created before', out.getvalue())
+        self.assertIn('in 2 chunks', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(DonationRequest.objects.filter(status='expired').count(), 4)
+
+
+class DonorEligibilityTest(TestCase):
+    """Test that donor lookups only read donors who can give blood today"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+
+    def make_donor(self, username, days_since_donation=None, **kwargs):
+        user = User.objects.create_user(username=username, first_name=username, password='testpass123')
+        last_donation = None
+        if days_since_donation is not None:
+            last_donation = timezone.localdate() - timedelta(days=days_since_donation)
+        fields = {'blood_group': 'O+', 'city': 'Delhi', 'is_available': True, **kwargs}
+        return Profile.objects.create(user=user, last_donation_date=last_donation, **fields)
+
+    def test_search_skips_donors_within_the_donation_interval(self):
+        """Test that donors who gave blood less than 56 days ago are not listed"""
+        self.make_donor('never')
+        self.make_donor('rested', days_since_donation=56)
+        self.make_donor('recent', days_since_donation=10)
+        self.make_donor('away', is_available=False)
+        self.client.force_login(self.requester)
+        data = self.client.get(reverse('donor_search'), {'blood_group': 'O+', 'city': 'Delhi'}).json()
+        self.assertEqual([d['name'] for d in data['results']], ['rested', 'never'])
+
+        data = self.client.get(reverse('donor_search'), {'blood_group': 'O+'}).json()
+        self.assertEqual([d['name'] for d in data['results']], ['rested', 'never'])
+
+    def test_batch_matching_skips_ineligible_donors(self):
+        """Test that match_pending_requests never loads donors who cannot donate"""
+        eligible = self.make_donor('eligible')
+        self.make_donor('recent', days_since_donation=1)
+        donation_request = DonationRequest.objects.create(
+            requester=self.requester, name='Patient', blood_group_needed='O+', city='Delhi',
+        )
+        self.assertEqual(match_pending_requests()[donation_request.id], [eligible])
+
+    def test_donor_lookups_use_the_partial_index(self):
+        """Test that search, batch matching and notifications read profile_eligible_idx"""
+        search = Profile.objects.filter(can_donate_q(), blood_group='O+', **city_key_filter('Delhi'))
+        self.assertIn('profile_eligible_idx (blood_group=? AND city_key=?)', search.order_by('-id')[:20].explain())
+
+        batch = Profile.objects.filter(can_donate_q(), blood_group='O+', city_key='delhi', id__gt=100)
+        plan = batch.order_by('id').values('id')[:500].explain()
+        self.assertIn('profile_eligible_idx (blood_group=? AND city_key=? AND id>?)', plan)
+
+        matching = Profile.objects.filter(can_donate_q(), blood_group__in=['O+', 'O-'], city_key__in=['delhi', 'agra'])
+        self.assertIn('profile_eligible_idx', matching.explain())
+
+    def test_next_eligible_date(self):
+        """Test the date a donor may give blood again"""
+        self.assertIsNone(self.make_donor('never').next_eligible_date)
+        self.assertIsNone(self.make_donor('rested', days_since_donation=60).next_eligible_date)
+        recent = self.make_donor('recent', days_since_donation=6)
+        self.assertEqual(recent.next_eligible_date, timezone.localdate() + timedelta(days=50))
+
+
+class StatusEventLogTest(TestCase):
+    """Test the request status event log and its rollups"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        self.donor = User.objects.create_user(username='donor@example.com', password='testpass123')
+        self.donation_request = DonationRequest.objects.create(
+            requester=self.requester, name='Patient', blood_group_needed='O+', city='Delhi',
+        )
+
+    def age(self, donation_request, **delta):
+        DonationRequest.objects.filter(id=donation_request.id).update(created_at=timezone.now() - timedelta(**delta))
+
+    def history(self, donation_request):
+        return list(donation_request.status_events.order_by('id').values_list('from_status', 'to_status', 'actor_id'))
+
+    def test_creation_is_logged(self):
+        """Test that a new request logs its initial status, credited to the requester"""
+        event = self.donation_request.status_events.get()
+        self.assertEqual((event.from_status, event.to_status, event.actor_id), ('', 'pending', self.requester.id))
+        self.assertEqual(event.blood_group, 'O+')
+        self.assertEqual(event.elapsed_seconds, 0)
+
+    def test_accept_and_reject_are_logged(self):
+        """Test that the conditional updates in the views log who acted and how long it took"""
+        other = DonationRequest.objects.create(requester=self.requester, name='Other', blood_group_needed='A-', city='Delhi')
+        self.age(self.donation_request, hours=3)
+        self.client.login(username='donor@example.com', password='testpass123')
+        self.client.post(reverse('accept_request', args=[self.donation_request.id]))
+        self.client.post(reverse('reject_request', args=[other.id]))
+
+        self.assertEqual(self.history(self.donation_request)[-1], ('pending', 'accepted', self.donor.id))
+        self.assertEqual(self.history(other)[-1], ('pending', 'cancelled', self.donor.id))
+        accepted = self.donation_request.status_events.get(to_status='accepted')
+        self.assertAlmostEqual(accepted.elapsed_seconds, 3 * 3600, delta=5)
+        self.assertEqual(accepted.blood_group, 'O+')
+
+    def test_expiry_is_logged(self):
+        """Test that expired requests log an event with no actor"""
+        self.age(self.donation_request, days=40)
+        sum(expire_stale_requests(expiry_cutoff(30)))
+        self.assertEqual(self.history(self.donation_request)[-1], ('pending', 'expired', None))
+
+    def test_admin_edit_is_logged(self):
+        """Test that a status change saved in the admin is credited to the staff user"""
+        staff = User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        request = RequestFactory().post('/')
+        request.user = staff
+        model_admin = admin.site._registry[DonationRequest]
+        self.donation_request.status = 'fulfilled'
+        model_admin.save_model(request, self.donation_request, None, True)
+        # Saving again without a status change logs nothing
+        model_admin.save_model(request, self.donation_request, None, True)
+        self.assertEqual(self.history(self.donation_request), [('', 'pending', self.requester.id),
+                                                               ('pending', 'fulfilled', staff.id)])
+
+        self.client.login(username='admin', password='testpass123')
+        response = self.client.get(reverse('admin:bloodshare_donationrequest_change', args=[self.donation_request.id]))
+        self.assertContains(response, 'fulfilled')
+
+    def test_events_outlive_their_request(self):
+        """Test that deleting a request keeps its history"""
+        request_id = self.donation_request.id
+        self.donation_request.delete()
+        self.assertEqual(RequestStatusEvent.objects.filter(donation_request_id=request_id).count(), 1)
+
+    def test_roll_up_is_incremental(self):
+        """Test that roll_up() folds each event into the buckets exactly once, a batch at a time"""
+        for i in range(4):
+            DonationRequest.objects.create(requester=self.requester, name=f'Patient {i}', blood_group_needed='A+', city='Delhi')
+
+        self.assertEqual(roll_up(batch_size=3), 3)
+        self.assertEqual(roll_up(batch_size=3), 2)
+        self.assertEqual(roll_up(batch_size=3), 0)
+        for model in (HourlyStatusRollup, DailyStatusRollup):
+            self.assertEqual(
+                dict(model.objects.values_list('blood_group', 'count')), {'O+': 1, 'A+': 4},
+            )
+
+        self.age(self.donation_request, seconds=100)
+        self.client.login(username='donor@example.com', password='testpass123')
+        self.client.post(reverse('accept_request', args=[self.donation_request.id]))
+        self.assertEqual(roll_up(), 1)
+
+        [accepted, pending] = summary('hour')
+        self.assertEqual((pending['to_status'], pending['count']), ('pending', 5))
+        self.assertEqual((accepted['to_status'], accepted['count']), ('accepted', 1))
+        self.assertAlmostEqual(accepted['mean_seconds'], 100, delta=5)
+        self.assertEqual(summary('day', to_status='pending', blood_group='O+')[0]['count'], 1)
+
+    def test_roll_up_command(self):
+        """Test that the command folds everything and reports the rate"""
+        out = StringIO()
+        call_command('rollup_status_events', '--batch-size', '1', stdout=out)
+        self.assertIn('1 status events rolled up in 1 batches', out.getvalue())
+
+
+class SupplyDemandTest(TestCase):
+    """Test the supply/demand cells and the report served from them"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', password='testpass123')
+        self.donor = User.objects.create_user(username='donor@example.com', password='testpass123')
+        self.profile = Profile.objects.create(user=self.donor, blood_group='O-', city='Delhi', is_available=True)
+
+    def stored(self):
+        return {
+            (city_key, blood_group): {'available_donors': donors, 'pending_requests': requests}
+            for city_key, blood_group, donors, requests in SupplyDemandCell.objects.values_list(
+                'city_key', 'blood_group', 'available_donors', 'pending_requests',
+            )
+            if donors or requests
+        }
+
+    def assertCellsExact(self):
+        self.assertEqual(self.stored(), dict(compute_cells()))
+
+    def add_request(self, **fields):
+        return DonationRequest.objects.create(
+            requester=self.requester, name='Patient', **{'blood_group_needed': 'O-', 'city': 'Delhi', **fields},
+        )
+
+    def test_profile_changes_move_donors_between_cells(self):
+        """Test that toggling availability or editing blood group and city keeps the cells exact"""
+        self.assertEqual(self.stored(), {('delhi', 'O-'): {'available_donors': 1, 'pending_requests': 0}})
+        self.profile.blood_group = 'A+'
+        self.profile.city = 'Bombay'
+        self.profile.save()
+        self.assertCellsExact()
+        self.assertEqual(list(self.stored()), [('mumbai', 'A+')])
+
+        self.client.login(username='donor@example.com', password='testpass123')
+        self.client.post(reverse('toggle_availability'))
+        self.assertEqual(self.stored(), {})
+        self.client.post(reverse('toggle_availability'))
+        Profile.objects.get(id=self.profile.id).delete()
+        self.assertEqual(self.stored(), {})
+
+    def test_request_status_changes_move_demand(self):
+        """Test that creating, accepting, expiring and deleting requests keep the cells exact"""
+        accepted, deleted = self.add_request(), self.add_request(blood_group_needed='B+')
+        stale = [self.add_request(), self.add_request(), self.add_request(city='Mumbai')]
+        self.add_request(city='Mumbai')
+        self.assertCellsExact()
+
+        self.client.login(username='donor@example.com', password='testpass123')
+        self.client.post(reverse('accept_request', args=[accepted.id]))
+        DonationRequest.objects.filter(id__in=[r.id for r in stale]).update(
+            created_at=timezone.now() - timedelta(days=40),
+        )
+        self.assertEqual(list(expire_stale_requests(expiry_cutoff(30), chunk_size=2)), [2, 1])
+        deleted.delete()
+        self.assertCellsExact()
+        self.assertEqual(self.stored()[('delhi', 'O-')], {'available_donors': 1, 'pending_requests': 0})
+
+    def test_rebuild_fixes_drift(self):
+        """Test that rows written without signals are picked up, and the drift reported, by a rebuild"""
+        DonationRequest.objects.bulk_create([
+            DonationRequest(requester=self.requester, name='Bulk', blood_group_needed='AB+', city='Delhi', city_key='delhi')
+            for _ in range(3)
+        ])
+        Profile.objects.filter(id=self.profile.id).update(is_available=False)
+        out = StringIO()
+        call_command('rebuild_supply_demand', stdout=out)
+        self.assertIn('delhi AB+: donors +0, requests +3', out.getvalue())
+        self.assertIn('delhi O-: donors -1, requests +0', out.getvalue())
+        self.assertCellsExact()
+        call_command('rebuild_supply_demand', stdout=out)
+        self.assertIn('0 corrected', out.getvalue())
+
+    def test_report_reads_cells(self):
+        """Test that the report is staff-only, ordered by shortfall and costs the same at any size"""
+        for _ in range(3):
+            self.add_request(blood_group_needed='A+')
+        self.add_request(city='Mumbai')
+
+        with self.assertNumQueries(2):
+            cells = report()
+        self.assertEqual(
+            [(cell['city'], cell['blood_group'], cell['available_donors'], cell['pending_requests']) for cell in cells],
+            [('Delhi', 'A+', 0, 3), ('Mumbai', 'O-', 0, 1), ('Delhi', 'O-', 1, 0)],
+        )
+        self.assertEqual([cell['blood_group'] for cell in report(city=' DELHI')], ['A+', 'O-'])
+
+        url = reverse('supply_demand_report')
+        self.client.login(username='donor@example.com', password='testpass123')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+        response = self.client.get(url, {'blood_group': 'A+'})
+        self.assertEqual(response.json()['results'][0]['shortfall'], 3)
+        self.assertEqual(self.client.get(url, {'blood_group': 'C+'}).status_code, 400)
+        response = self.client.get(reverse('admin:bloodshare_supplydemandcell_changelist'))
+        self.assertContains(response, 'Mumbai')
+
+
+class ExportTest(TestCase):
+    """Test the streaming CSV and JSON-lines exports"""
+
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester@example.com', email='requester@example.com')
+        for i in range(5):
+            DonationRequest.objects.create(
+                requester=self.requester, name=f'Patient {i}', blood_group_needed='O+' if i % 2 else 'A-',
+                city='Delhi' if i < 3 else 'Mumbai', details='Line one\nline two' if i == 0 else '',
+                status='accepted' if i == 4 else 'pending',
+            )
+
+    def test_rows_are_read_in_keyset_chunks(self):
+        """Test that every row comes out once, in id order, one query per chunk"""
+        with self.assertNumQueries(4):
+            chunks = list(iter_chunks(DonationRequest.objects.all(), ('name',), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([row[0] for chunk in chunks for row in chunk], [f'Patient {i}' for i in range(5)])
+
+    def test_command_applies_filters(self):
+        """Test that the command exports CSV and JSON lines with the changelist filters"""
+        out, err = StringIO(), StringIO()
+        call_command('export_data', 'requests', '--status', 'pending', '--city', 'delhi ', stdout=out, stderr=err)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual([row['name'] for row in rows], ['Patient 0', 'Patient 1', 'Patient 2'])
+        self.assertEqual(rows[0]['details'], 'Line one\nline two')
+        self.assertEqual(rows[0]['requester__email'], 'requester@example.com')
+        self.assertIn('3 rows exported', err.getvalue())
+
+        path = os.path.join(tempfile.mkdtemp(), 'requests.jsonl')
+        call_command('export_data', 'requests', '--format', 'jsonl', '--blood-group', 'O+', '-o', path, stderr=err)
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['name'] for row in rows], ['Patient 1', 'Patient 3'])
+
+    def test_admin_action_streams_the_filtered_changelist(self):
+        """Test that "select all" exports every row matching the changelist filter"""
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client.login(username='admin', password='testpass123')
+        url = reverse('admin:bloodshare_donationrequest_changelist') + '?status__exact=pending&blood_group_needed__exact=A-'
+        response = self.client.post(url, {
+            'action': 'export_jsonl',
+            'select_across': '1',
+            'index': '0',
+            '_selected_action': [DonationRequest.objects.values_list('id', flat=True).first()],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"Patient 2"', lines[1])
+
+    async def test_asgi_download_is_an_async_iterator(self):
+        """Test that under ASGI the export is fetched chunk by chunk instead of collected into a list"""
+        admin_user = await User.objects.acreate(username='admin', is_staff=True, is_superuser=True)
+        await sync_to_async(self.async_client.force_login)(admin_user)
+        response = await self.async_client.post(reverse('admin:bloodshare_donationrequest_changelist'), {
+            'action': 'export_csv',
+            'select_across': '1',
+            'index': '0',
+            '_selected_action': ['1'],
+        })
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(content.count('Patient'), 5)
+
+    def test_csv_cells_are_not_formulas(self):
+        """Test that CSV cells starting with a formula character are quoted, and JSON lines are not"""
+        DonationRequest.objects.filter(name='Patient 0').update(name='=HYPERLINK("http://evil")', details='@SUM(A1)')
+        queryset = DonationRequest.objects.filter(name__startswith='=')
+        row = next(csv.DictReader(StringIO(''.join(stream(queryset, 'csv')))))
+        self.assertEqual(row['name'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(row['details'], "'@SUM(A1)")
+        self.assertEqual(row['blood_group_needed'], 'A-')
+        self.assertEqual(json.loads(''.join(stream(queryset, 'jsonl')))['details'], '@SUM(A1)')
@@ -0,0 +1,47 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DonationRequest
+from .signals import request_status_changed
+
+
+def transition_request(request_id, from_status, to_status, actor=None, exclude_requester=None, **fields):
+    """
+    Move one donation request between statuses with a single conditional UPDATE.
+
+    The row only changes if it is still in ``from_status``, so when several
+    users race for the same request exactly one of them wins. Only
+    ``status``, ``updated_at`` and the given ``fields`` are written. Returns
+    True if this call performed the transition.
+    """
+    queryset = DonationRequest.objects.filter(id=request_id, status=from_status)
+    if exclude_requester is not None:
+        queryset = queryset.exclude(requester=exclude_requester)
+
+    with transaction.atomic():
+        updated = queryset.update(status=to_status, updated_at=timezone.now(), **fields)
+        if updated:
+            requester_ids = DonationRequest.objects.filter(id=request_id).values_list('requester_id', flat=True)
+            request_status_changed.send(
+                sender=DonationRequest,
+                request_ids=[request_id],
+                requester_ids=list(requester_ids),
+                old_status=from_status,
+                new_status=to_status,
+                actor=actor,
+            )
+    return bool(updated)
+
+
+async def atransition_request(request_id, from_status, to_status, actor=None, exclude_requester=None, **fields):
+    """
+    Async version of transition_request() for the ASGI API views.
+
+    The async ORM cannot open transactions yet, so the whole write path
+    runs in a worker thread, where the UPDATE and the status change
+    receivers (counters, cells, status event) commit together.
+    """
+    return await sync_to_async(transition_request)(
+        request_id, from_status, to_status, actor=actor, exclude_requester=exclude_requester, **fields,
+    )
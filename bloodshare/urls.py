@@ -1,26 +1,33 @@
-from django.urls import path
-from django.contrib.auth import views as auth_views
-from django.contrib.auth import logout
-from django.shortcuts import redirect
-from django.contrib import messages
-from . import views
-
-def logout_view(request):
-    """Custom logout view with message"""
-    logout(request)
-    messages.success(request, 'You have been successfully logged out.')
-    return redirect('landing')
-
-urlpatterns = [
-    path('', views.landing, name='landing'),
-    path('signup/', views.signup_view, name='signup'),
-    path('login/', views.login_view, name='login'),
-    path('logout/', logout_view, name='logout'),
-    path('dashboard/', views.dashboard, name='dashboard'),
-    path('profile/edit/', views.update_profile, name='profile_edit'),
-    path('api/profile/toggle-availability/', views.toggle_availability, name='toggle_availability'),
-    path('api/requests/<int:request_id>/accept/', views.accept_request, name='accept_request'),
-    path('api/requests/<int:request_id>/reject/', views.reject_request, name='reject_request'),
-    path('donor/', views.donor, name='donor'),
-]
-
+from django.urls import path
+from django.contrib.auth import views as auth_views
+from django.contrib.auth import logout
+from django.shortcuts import redirect
+from django.contrib import messages
+from . import views
+
+def logout_view(request):
+    """Custom logout view with message"""
+    logout(request)
+    messages.success(request, 'You have been successfully logged out.')
+    return redirect('landing')
+
+urlpatterns = [
+    path('', views.landing, name='landing'),
+    path('signup/', views.signup_view, name='signup'),
+    path('login/', views.login_view, name='login'),
+    path('logout/', logout_view, name='logout'),
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('profile/edit/', views.update_profile, name='profile_edit'),
+    path('api/profile/toggle-availability/', views.toggle_availability, name='toggle_availability'),
+    path('api/requests/feed/', views.request_feed, name='request_feed'),
+    path('api/requests/search/', views.request_search, name='request_search'),
+    path('api/requests/<int:request_id>/accept/', views.accept_request, name='accept_request'),
+    path('api/requests/<int:request_id>/reject/', views.reject_request, name='reject_request'),
+    path('api/requests/<int:request_id>/matches/', views.request_matches, name='request_matches'),
+    path('api/donors/search/', views.donor_search, name='donor_search'),
+    path('api/donors/nearby/', views.nearby_donor_search, name='nearby_donor_search'),
+    path('api/cities/suggest/', views.city_suggestions, name='city_suggestions'),
+    path('api/reports/supply-demand/', views.supply_demand_report, name='supply_demand_report'),
+    path('donor/', views.donor, name='donor'),
+]
+
@@ -1,187 +1,393 @@
-from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate
-from django.contrib.auth.decorators import login_required
-from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
-from .forms import SignUpForm, LoginForm, ProfileForm, DonationRequestForm
-from .models import Profile, DonationRequest
-
-
-def landing(request):
-    """Public landing page"""
-    # Mock stats for display
-    stats = {
-        'total_donors': 1250,
-        'lives_saved': 3420,
-        'active_requests': 45,
-    }
-    return render(request, 'bloodshare/landing.html', {'stats': stats})
-
-
-def signup_view(request):
-    """User registration view"""
-    if request.user.is_authenticated:
-        return redirect('dashboard')
-    
-    if request.method == 'POST':
-        form = SignUpForm(request.POST, request.FILES)
-        if form.is_valid():
-            user = form.save()
-            login(request, user)
-            messages.success(request, 'Account created successfully! Welcome to BloodShare.')
-            return redirect('dashboard')
-    else:
-        form = SignUpForm()
-    
-    return render(request, 'bloodshare/signup.html', {'form': form})
-
-
-def login_view(request):
-    """User login view"""
-    if request.user.is_authenticated:
-        return redirect('dashboard')
-    
-    if request.method == 'POST':
-        form = LoginForm(request.POST)
-        if form.is_valid():
-            email = form.cleaned_data['email']
-            password = form.cleaned_data['password']
-            remember_me = form.cleaned_data.get('remember_me', False)
-            
-            # Django uses username, but we're using email as username
-            try:
-                from django.contrib.auth.models import User
-                user = User.objects.get(email=email)
-                user = authenticate(request, username=user.username, password=password)
-                
-                if user is not None:
-                    login(request, user)
-                    if not remember_me:
-                        request.session.set_expiry(0)  # Session expires on browser close
-                    messages.success(request, f'Welcome back, {user.get_full_name() or user.username}!')
-                    next_url = request.GET.get('next', 'dashboard')
-                    return redirect(next_url)
-                else:
-                    messages.error(request, 'Invalid email or password.')
-            except User.DoesNotExist:
-                messages.error(request, 'Invalid email or password.')
-    else:
-        form = LoginForm()
-    
-    return render(request, 'bloodshare/login.html', {'form': form})
-
-
-@login_required
-def dashboard(request):
-    """Authenticated user dashboard"""
-    profile, created = Profile.objects.get_or_create(user=request.user)
-
-    # Get user's donation requests
-    user_requests = DonationRequest.objects.filter(requester=request.user)[:10]
-
-    # Get all active donation requests (for browsing)
-    all_requests = DonationRequest.objects.filter(status='pending').exclude(requester=request.user)[:20]
-
-    if request.method == 'POST':
-        # Handle donation request creation
-        request_form = DonationRequestForm(request.POST)
-        if request_form.is_valid():
-            donation_request = request_form.save(commit=False)
-            donation_request.requester = request.user
-            donation_request.save()
-            messages.success(request, 'Donation request created successfully!')
-            return redirect('dashboard')
-    else:
-        request_form = DonationRequestForm()
-
-    # Profile form for editing
-    profile_form = ProfileForm(instance=profile, user=request.user)
-
-    context = {
-        'profile': profile,
-        'profile_form': profile_form,
-        'request_form': request_form,
-        'user_requests': user_requests,
-        'all_requests': all_requests,
-    }
-    return render(request, 'bloodshare/dashboard.html', context)
-
-
-@login_required
-@require_http_methods(["POST"])
-def accept_request(request, request_id):
-    """Accept a donation request"""
-    try:
-        donation_request = DonationRequest.objects.get(id=request_id, status='pending')
-        if donation_request.requester == request.user:
-            return JsonResponse({'success': False, 'error': 'Cannot accept your own request'}, status=400)
-
-        donation_request.status = 'accepted'
-        donation_request.accepted_by = request.user
-        donation_request.save()
-
-        return JsonResponse({
-            'success': True,
-            'message': 'Request accepted successfully'
-        })
-    except DonationRequest.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Request not found'}, status=404)
-
-
-@login_required
-@require_http_methods(["POST"])
-def reject_request(request, request_id):
-    """Reject a donation request"""
-    try:
-        donation_request = DonationRequest.objects.get(id=request_id, status='pending')
-        if donation_request.requester == request.user:
-            return JsonResponse({'success': False, 'error': 'Cannot reject your own request'}, status=400)
-
-        donation_request.status = 'cancelled'
-        donation_request.save()
-
-        return JsonResponse({
-            'success': True,
-            'message': 'Request rejected'
-        })
-    except DonationRequest.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Request not found'}, status=404)
-
-
-@login_required
-@require_http_methods(["POST"])
-def toggle_availability(request):
-    """API endpoint to toggle donor availability"""
-    try:
-        profile = Profile.objects.get(user=request.user)
-        profile.is_available = not profile.is_available
-        profile.save()
-        return JsonResponse({
-            'success': True,
-            'is_available': profile.is_available,
-            'message': 'Availability updated successfully'
-        })
-    except Profile.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Profile not found'}, status=404)
-
-
-@login_required
-def update_profile(request):
-    """Update user profile"""
-    profile, created = Profile.objects.get_or_create(user=request.user)
-    
-    if request.method == 'POST':
-        form = ProfileForm(request.POST, request.FILES, instance=profile, user=request.user)
-        if form.is_valid():
-            form.save()
-            messages.success(request, 'Profile updated successfully!')
-            return redirect('dashboard')
-    else:
-        form = ProfileForm(instance=profile, user=request.user)
-    
-    return render(request, 'bloodshare/profile_edit.html', {'form': form, 'profile': profile})
-
-@login_required
-def donor(request):
-    return render(request, 'bloodshare/donor.html')
+from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.contrib.auth import login, authenticate
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.db import transaction
+from django.http import JsonResponse
+from django.urls import NoReverseMatch, reverse
+from django.views.decorators.http import require_http_methods
+from .forms import SignUpForm, LoginForm, ProfileForm, DonationRequestForm
+from .models import Profile, DonationRequest, BLOOD_GROUP_CHOICES
+from .cities import similar_cities
+from .counters import get_landing_stats
+from .feeds import browse_requests, request_card, request_cards
+from .fragments import BROWSE_GENERATION, cached_fragment, user_generation_key
+from .fulltext import search_requests
+from .matching import compatible_donors, nearest_compatible_donors
+from .pagination import InvalidCursor
+from .search import DONOR_CARD_FIELDS, distance_card, donor_card, nearby_donors, search_donors
+from .supply import report as supply_report
+from .transitions import transition_request
+
+
+def landing(request):
+    """Public landing page"""
+    return render(request, 'bloodshare/landing.html', {'stats': get_landing_stats()})
+
+
+def signup_view(request):
+    """User registration view"""
+    if request.user.is_authenticated:
+        return redirect('dashboard')
+    
+    if request.method == 'POST':
+        form = SignUpForm(request.POST, request.FILES)
+        if form.is_valid():
+            user = form.save()
+            login(request, user, backend='bloodshare.backends.EmailBackend')
+            messages.success(request, 'Account created successfully! Welcome to BloodShare.')
+            return redirect('dashboard')
+    else:
+        form = SignUpForm()
+    
+    return render(request, 'bloodshare/signup.html', {'form': form})
+
+
+def login_view(request):
+    """User login view"""
+    if request.user.is_authenticated:
+        return redirect('dashboard')
+    
+    if request.method == 'POST':
+        form = LoginForm(request.POST)
+        if form.is_valid():
+            email = form.cleaned_data['email']
+            password = form.cleaned_data['password']
+            remember_me = form.cleaned_data.get('remember_me', False)
+            
+            user = authenticate(request, email=email, password=password)
+            if user is not None:
+                login(request, user)
+                if not remember_me:
+                    request.session.set_expiry(0)  # Session expires on browser close
+                messages.success(request, f'Welcome back, {user.get_full_name() or user.username}!')
+                next_url = request.GET.get('next', 'dashboard')
+                return redirect(next_url)
+            else:
+                messages.error(request, 'Invalid email or password.')
+    else:
+        form = LoginForm()
+    
+    return render(request, 'bloodshare/login.html', {'form': form})
+
+
+@login_required
+def dashboard(request):
+    """Authenticated user dashboard"""
+    profile, created = Profile.objects.get_or_create(user=request.user)
+
+    if request.method == 'POST':
+        # Handle donation request creation
+        request_form = DonationRequestForm(request.POST)
+        if request_form.is_valid():
+            donation_request = request_form.save(commit=False)
+            donation_request.requester = request.user
+            with transaction.atomic():
+                # The notification outbox row is written by a post_save receiver
+                donation_request.save()
+            messages.success(request, 'Donation request created successfully!')
+            return redirect('dashboard')
+    else:
+        request_form = DonationRequestForm()
+
+    context = {
+        'profile': profile,
+        'request_form': request_form,
+        'events_url': _events_url(),
+    }
+
+    # The request lists are cached fragments; they only query on a miss
+    def render_user_requests():
+        context['user_requests'] = request_cards(DonationRequest.objects.filter(requester=request.user))[:10]
+        return render_to_string('bloodshare/fragments/user_requests.html', context, request)
+
+    def render_browse_requests():
+        context['all_requests'], context['next_cursor'] = browse_requests(request.user)
+        return render_to_string('bloodshare/fragments/browse_requests.html', context, request)
+
+    user_id = request.user.id
+    context['user_requests_html'] = cached_fragment(
+        'user_requests', [user_generation_key(user_id)],
+        render_user_requests, vary_on=[user_id],
+    )
+    context['browse_requests_html'] = cached_fragment(
+        'browse_requests', [BROWSE_GENERATION], render_browse_requests, vary_on=[user_id],
+    )
+    return render(request, 'bloodshare/dashboard.html', context)
+
+
+def _events_url():
+    """URL of the live update stream, or None when not served through ASGI"""
+    try:
+        return reverse('request_events')
+    except NoReverseMatch:
+        return None
+
+
+def _transition_failed(request, request_id, action):
+    """Explain why a conditional status update did not match any row"""
+    current = DonationRequest.objects.filter(id=request_id).values('requester_id', 'status').first()
+    if current is None:
+        return JsonResponse({'success': False, 'error': 'Request not found'}, status=404)
+    if current['requester_id'] == request.user.id:
+        return JsonResponse({'success': False, 'error': f'Cannot {action} your own request'}, status=400)
+    return JsonResponse({'success': False, 'error': 'Request is no longer pending'}, status=409)
+
+
+@login_required
+@require_http_methods(["POST"])
+def accept_request(request, request_id):
+    """Accept a donation request"""
+    accepted = transition_request(
+        request_id, 'pending', 'accepted',
+        actor=request.user,
+        exclude_requester=request.user,
+        accepted_by=request.user,
+    )
+    if not accepted:
+        return _transition_failed(request, request_id, 'accept')
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Request accepted successfully'
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def reject_request(request, request_id):
+    """Reject a donation request"""
+    rejected = transition_request(
+        request_id, 'pending', 'cancelled',
+        actor=request.user,
+        exclude_requester=request.user,
+    )
+    if not rejected:
+        return _transition_failed(request, request_id, 'reject')
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Request rejected'
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def toggle_availability(request):
+    """API endpoint to toggle donor availability"""
+    try:
+        profile = Profile.objects.get(user=request.user)
+        profile.is_available = not profile.is_available
+        profile.save()
+        return JsonResponse({
+            'success': True,
+            'is_available': profile.is_available,
+            'message': 'Availability updated successfully'
+        })
+    except Profile.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Profile not found'}, status=404)
+
+
+@login_required
+def update_profile(request):
+    """Update user profile"""
+    profile, created = Profile.objects.get_or_create(user=request.user)
+    
+    if request.method == 'POST':
+        form = ProfileForm(request.POST, request.FILES, instance=profile, user=request.user)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Profile updated successfully!')
+            return redirect('dashboard')
+    else:
+        form = ProfileForm(instance=profile, user=request.user)
+    
+    return render(request, 'bloodshare/profile_edit.html', {'form': form, 'profile': profile})
+
+@login_required
+def donor(request):
+    return render(request, 'bloodshare/donor.html', {'blood_groups': BLOOD_GROUP_CHOICES})
+
+
+@login_required
+@require_http_methods(["GET"])
+def donor_search(request):
+    """API endpoint to search available donors, one keyset page at a time"""
+    blood_group = request.GET.get('blood_group', '')
+    if blood_group and blood_group not in dict(BLOOD_GROUP_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid blood group'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+
+    try:
+        donors, next_cursor = search_donors(
+            blood_group=blood_group,
+            city=request.GET.get('city', ''),
+            cursor=request.GET.get('cursor') or None,
+            limit=max(limit, 1),
+        )
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'results': donors,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def nearby_donor_search(request):
+    """API endpoint listing the available donors nearest to a point"""
+    blood_group = request.GET.get('blood_group', '')
+    if blood_group and blood_group not in dict(BLOOD_GROUP_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid blood group'}, status=400)
+
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lng'])
+    except (KeyError, ValueError):
+        return JsonResponse({'success': False, 'error': 'lat and lng are required'}, status=400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return JsonResponse({'success': False, 'error': 'Invalid coordinates'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', 20))
+        radius_km = float(request.GET['radius_km']) if request.GET.get('radius_km') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit or radius'}, status=400)
+    if radius_km is not None and radius_km <= 0:
+        return JsonResponse({'success': False, 'error': 'Invalid limit or radius'}, status=400)
+
+    donors = nearby_donors(latitude, longitude, blood_group=blood_group, radius_km=radius_km, limit=max(limit, 1))
+    return JsonResponse({
+        'success': True,
+        'results': donors,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def city_suggestions(request):
+    """API endpoint suggesting known cities for a possibly misspelled name"""
+    query = request.GET.get('q', '')
+    return JsonResponse({
+        'success': True,
+        'results': [{'name': city.name, 'key': city.key} for _, city in similar_cities(query)],
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def request_feed(request):
+    """API endpoint paging through other users' requests, newest first"""
+    status = request.GET.get('status', 'pending')
+    if status not in dict(DonationRequest.STATUS_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
+    blood_group = request.GET.get('blood_group', '')
+    if blood_group and blood_group not in dict(BLOOD_GROUP_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid blood group'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+
+    try:
+        requests, next_cursor = browse_requests(
+            request.user,
+            status=status,
+            blood_group=blood_group,
+            city=request.GET.get('city', ''),
+            cursor=request.GET.get('cursor') or None,
+            limit=max(limit, 1),
+        )
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'results': [request_card(donation_request) for donation_request in requests],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def request_search(request):
+    """API endpoint for full-text search over requests, most relevant first"""
+    status = request.GET.get('status', 'pending')
+    if status and status not in dict(DonationRequest.STATUS_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
+    blood_group = request.GET.get('blood_group', '')
+    if blood_group and blood_group not in dict(BLOOD_GROUP_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid blood group'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', 20))
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit or offset'}, status=400)
+
+    requests, next_offset = search_requests(
+        request.GET.get('q', ''),
+        status=status,
+        blood_group=blood_group,
+        offset=max(offset, 0),
+        limit=max(limit, 1),
+    )
+    return JsonResponse({
+        'success': True,
+        'results': [request_card(donation_request) for donation_request in requests],
+        'next_offset': next_offset,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def request_matches(request, request_id):
+    """
+    API endpoint listing compatible donors for one of the user's requests.
+
+    When the request has coordinates the nearest eligible donors come first,
+    with their distance; the rest of the list is filled by compatible_donors().
+    """
+    try:
+        donation_request = DonationRequest.objects.only(
+            'id', 'requester_id', 'blood_group_needed', 'city_key', 'latitude', 'longitude', 'geohash',
+        ).get(id=request_id, requester=request.user)
+    except DonationRequest.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Request not found'}, status=404)
+
+    limit = 20
+    nearest = nearest_compatible_donors(donation_request, limit, fields=DONOR_CARD_FIELDS)
+    results = [distance_card(distance_km, row) for distance_km, row in nearest]
+    seen = {card['id'] for card in results}
+    for row in compatible_donors(donation_request, limit, fields=DONOR_CARD_FIELDS):
+        if len(results) == limit:
+            break
+        if row['id'] not in seen:
+            results.append(donor_card(row))
+    return JsonResponse({
+        'success': True,
+        'results': results,
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def supply_demand_report(request):
+    """Staff API endpoint: available donors against pending requests per city and blood group"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Staff only'}, status=403)
+    blood_group = request.GET.get('blood_group', '')
+    if blood_group and blood_group not in dict(BLOOD_GROUP_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid blood group'}, status=400)
+    return JsonResponse({
+        'success': True,
+        'results': supply_report(city=request.GET.get('city', ''), blood_group=blood_group),
+    })
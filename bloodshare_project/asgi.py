@@ -1,16 +1,18 @@
-"""
-ASGI config for bloodshare_project project.
-
-It exposes the ASGI callable as a module-level variable named ``application``.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
-"""
-
-import os
-
-from django.core.asgi import get_asgi_application
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodshare_project.settings')
-
-application = get_asgi_application()
+"""
+ASGI config for bloodshare_project project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodshare_project.settings')
+# Route the JSON API to its async views (see asgi_urls.py)
+os.environ.setdefault('BLOODSHARE_URLCONF', 'bloodshare_project.asgi_urls')
+
+application = get_asgi_application()
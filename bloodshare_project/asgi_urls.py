@@ -0,0 +1,21 @@
+"""
+URL configuration used when the project is served through ASGI.
+
+The JSON API endpoints the dashboard calls most often are swapped for the
+async implementations in bloodshare.async_views; every other route comes
+from the regular URLconf. The async routes are unnamed so reverse() keeps
+resolving to the same paths. The live update stream only exists here, so
+reverse('request_events') tells a view whether it can offer live updates.
+"""
+from django.urls import path
+
+from bloodshare import async_views
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/profile/toggle-availability/', async_views.toggle_availability),
+    path('api/requests/<int:request_id>/accept/', async_views.accept_request),
+    path('api/requests/<int:request_id>/reject/', async_views.reject_request),
+    path('api/requests/events/', async_views.request_events, name='request_events'),
+] + wsgi_urlpatterns
@@ -1,134 +1,223 @@
-"""
-Django settings for bloodshare_project project.
-
-Generated by 'django-admin startproject' using Django 4.2.26.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/4.2/topics/settings/
-
-For the full list of settings and their values, see
-https://docs.djangoproject.com/en/4.2/ref/settings/
-"""
-
-from pathlib import Path
-
-# Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-
-# Quick-start development settings - unsuitable for production
-# See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
-
-# SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-c=)db&xf9eb3^-dmwie#-am_d%s)(_71*6ocq8azmi%wk2dko%'
-
-# SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
-
-ALLOWED_HOSTS = []
-
-
-# Application definition
-
-INSTALLED_APPS = [
-    'django.contrib.admin',
-    'django.contrib.auth',
-    'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
-    'django.contrib.staticfiles',
-    'bloodshare',
-]
-
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-]
-
-ROOT_URLCONF = 'bloodshare_project.urls'
-
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
-]
-
-WSGI_APPLICATION = 'bloodshare_project.wsgi.application'
-
-
-# Database
-# https://docs.djangoproject.com/en/4.2/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
-
-
-# Password validation
-# https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
-
-AUTH_PASSWORD_VALIDATORS = [
-    {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
-    },
-]
-
-
-# Internationalization
-# https://docs.djangoproject.com/en/4.2/topics/i18n/
-
-LANGUAGE_CODE = 'en-us'
-
-TIME_ZONE = 'UTC'
-
-USE_I18N = True
-
-USE_TZ = True
-
-
-# Static files (CSS, JavaScript, Images)
-# https://docs.djangoproject.com/en/4.2/howto/static-files/
-
-STATIC_URL = 'static/'
-STATICFILES_DIRS = [BASE_DIR / 'static']
-STATIC_ROOT = BASE_DIR / 'staticfiles'
-
-MEDIA_URL = 'media/'
-MEDIA_ROOT = BASE_DIR / 'media'
-
-# Default primary key field type
-# https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
-
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-
-# Authentication
-LOGIN_URL = '/login/'
-LOGIN_REDIRECT_URL = '/dashboard/'
-LOGOUT_REDIRECT_URL = '/'
+"""
+Django settings for bloodshare_project project.
+
+Generated by 'django-admin startproject' using Django 4.2.26.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/4.2/ref/settings/
+"""
+
+import os
+from pathlib import Path
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'django-insecure-c=)db&xf9eb3^-dmwie#-am_d%s)(_71*6ocq8azmi%wk2dko%'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = True
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'bloodshare',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'bloodshare.routers.ReplicaPinningMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+# asgi.py switches this to bloodshare_project.asgi_urls
+ROOT_URLCONF = os.environ.get('BLOODSHARE_URLCONF', 'bloodshare_project.urls')
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'bloodshare_project.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        # django.db.backends.sqlite3 plus the 'pragmas' and 'transaction_mode' OPTIONS
+        'ENGINE': 'bloodshare.sqlite',
+        'NAME': os.environ.get('BLOODSHARE_DB_PATH', BASE_DIR / 'db.sqlite3'),
+        # File-backed test database so threaded tests see SQLite's normal
+        # busy-timeout locking instead of shared-cache "table is locked" errors
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# BLOODSHARE_DB_PROFILE=production tunes SQLite for many concurrent clients:
+# WAL lets readers run alongside the writer, writers queue on busy_timeout
+# instead of failing with "database is locked", and each worker thread
+# keeps its connection (and page cache) between requests.
+DB_PROFILE = os.environ.get('BLOODSHARE_DB_PROFILE', 'development')
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds a connection waits for the write lock
+            'timeout': 20,
+            # Take the write lock at BEGIN; a deferred transaction that
+            # reads first can't wait for it when it later writes
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'wal',
+                # Durable at checkpoints rather than every commit, which is
+                # safe with WAL: a crash can lose the last commits, not corrupt
+                'synchronous': 'normal',
+                'busy_timeout': 20000,
+                # 64 MiB page cache and up to 256 MiB memory-mapped per connection
+                'cache_size': -64000,
+                'mmap_size': 268435456,
+                'temp_store': 'memory',
+            },
+        },
+    })
+
+# Read replicas: BLOODSHARE_REPLICA_PATHS=/srv/replica-1.sqlite3,/srv/replica-2.sqlite3
+# adds replica_1, replica_2, ... for requests to read from. Something else must
+# keep them in step with the primary; `manage.py sync_replicas` does that for
+# trying it out locally.
+DATABASE_REPLICAS = []
+for index, path in enumerate(filter(None, os.environ.get('BLOODSHARE_REPLICA_PATHS', '').split(',')), 1):
+    options = DATABASES['default'].get('OPTIONS', {})
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'OPTIONS': {**options, 'pragmas': {**options.get('pragmas', {}), 'query_only': 'on'}},
+        # Tests run every alias against the test database
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['bloodshare.routers.PrimaryReplicaRouter']
+
+# After a write, the same browser reads from the primary for this many seconds,
+# which should cover the replicas' lag
+REPLICA_PIN_SECONDS = 10
+
+
+# Password validation
+# https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/4.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/4.2/howto/static-files/
+
+STATIC_URL = 'static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploaded avatars are validated and thumbnailed by a background thread pool.
+# Set AVATAR_PROCESSING_INLINE to do the work when the upload commits instead.
+AVATAR_WORKERS = int(os.environ.get('BLOODSHARE_AVATAR_WORKERS', 2))
+AVATAR_PROCESSING_INLINE = False
+
+# The dashboard caches its request lists and invalidates them by bumping
+# counters in the cache. With several worker processes the cache must be
+# shared, e.g. BLOODSHARE_CACHE_DIR=/var/cache/bloodshare for FileBasedCache.
+if os.environ.get('BLOODSHARE_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['BLOODSHARE_CACHE_DIR'],
+        }
+    }
+
+# Donor notifications are sent by `manage.py send_notifications`. The console
+# backend prints them; point EMAIL_BACKEND at SMTP in production.
+EMAIL_BACKEND = os.environ.get('BLOODSHARE_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('BLOODSHARE_FROM_EMAIL', 'BloodShare <noreply@bloodshare.local>')
+
+# Requests still pending this many days after they were created are expired
+# by `manage.py expire_requests`
+REQUEST_EXPIRY_DAYS = int(os.environ.get('BLOODSHARE_REQUEST_EXPIRY_DAYS', 30))
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Authentication
+AUTHENTICATION_BACKENDS = [
+    'bloodshare.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+LOGIN_URL = '/login/'
+LOGIN_REDIRECT_URL = '/dashboard/'
+LOGOUT_REDIRECT_URL = '/'